@@ -0,0 +1,12 @@
+# Entry point for `python -m HesapMakinesi` and `python HesapMakinesi`.
+# The modules in this folder import each other directly (e.g. `import calculator`),
+# so the folder itself is put on sys.path before loading the headless CLI.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+sys.exit(main())
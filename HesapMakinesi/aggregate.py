@@ -0,0 +1,472 @@
+# This is the aggregate.py file.
+# It contains streaming, numerically stable aggregates (sum, mean, variance, ...).
+
+# --- Streaming Aggregates ---
+# An Aggregate takes values one at a time (add), from any iterable or array
+# (extend) or from a file (aggregate_file) in one pass and constant memory:
+#   sum            - compensated (Neumaier) summation, so adding many small
+#                    values to a large total does not lose them
+#   mean, variance - Welford's algorithm on the values minus the first one
+#                    (so values like 1e9 + 0.001 keep their spread); chunks
+#                    are combined with Chan's formula, which also merges
+#                    partial results
+#   min, max       - NaN is kept (any NaN makes every statistic NaN)
+#   product        - the plain running product, and the sign and sum of
+#                    log|x| for when that overflows or underflows; costs a
+#                    logarithm per value, so it is kept only for
+#                    Aggregate(product=True)
+# Arrays (NumPy, array('d'), memoryview) and long iterables are processed in
+# chunks of CHUNK_SIZE values with NumPy: a chunk is summed with an error-free
+# TwoSum across 1024 lanes, whose lane totals are then added exactly with
+# math.fsum, and its variance is computed around its own mean before merging.
+# Without NumPy the values are added one by one. NumPy is imported on first
+# use, not when the calculator starts.
+# merge() combines Aggregates built from separate chunks, e.g. by worker
+# processes (aggregate_file(..., workers=N) splits a file into byte ranges).
+#
+# The expression functions sum, mean, variance, stdev, min, max and product
+# (see expression.default_context) take any number of values; NumPy arrays
+# are aggregated as a whole, so mean(x) of a column is its mean. Decimal and
+# Fraction values are aggregated exactly in their own type.
+#
+# Usage:
+#   aggregate = Aggregate(values)              # or .add(x) / .extend(chunk)
+#   aggregate.mean, aggregate.stdev
+#   aggregate_file("tutarlar.csv", column="tutar", workers=4).sum
+#   python HesapMakinesi/aggregate.py tutarlar.csv --column tutar --workers 4
+
+import argparse
+import csv
+import math
+import os
+import sys
+from array import array
+from decimal import Decimal
+from fractions import Fraction
+from itertools import islice
+
+import calculator as calc_logic
+
+CHUNK_SIZE = 1 << 16
+LANES = 1024 # Independent TwoSum accumulators per chunk
+
+_UNLOADED = object()
+np = _UNLOADED
+
+
+def _numpy():
+    """Returns the numpy module, or None if it is not installed."""
+    global np
+    if np is _UNLOADED:
+        try:
+            import numpy # Imported lazily: expression.py imports this module at startup
+        except ImportError:  # pragma: no cover - depends on the environment
+            numpy = None
+        np = numpy
+    return np
+
+def _is_numpy_array(value):
+    numpy = sys.modules.get('numpy') # An array can only exist if NumPy was imported
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+def _float_array(numpy, values):
+    """Converts a list to a float64 array, rejecting what float() would reject."""
+    try:
+        converted = numpy.array(values, dtype=numpy.float64)
+    except (TypeError, ValueError):
+        raise TypeError("Inputs must be numeric") from None
+    # NumPy turns None into NaN and nested lists into more dimensions.
+    if converted.ndim != 1 or any(values[i] is None for i in numpy.flatnonzero(numpy.isnan(converted))):
+        raise TypeError("Inputs must be numeric")
+    return converted
+
+def _neumaier(total, compensation, x):
+    """Adds x to the compensated sum (total, compensation); returns the new pair."""
+    t = total + x
+    if abs(total) >= abs(x):
+        compensation += (total - t) + x
+    else:
+        compensation += (x - t) + total
+    return t, compensation
+
+def _chunk_sum(values):
+    """Returns the sum of a float64 array with (nearly) no rounding error."""
+    if not np.isfinite(values).all():
+        return float(values.sum()) # inf/NaN decide the result anyway
+    rows = values.size // LANES
+    total = np.zeros(LANES)
+    error = np.zeros(LANES)
+    for row in values[:rows * LANES].reshape(rows, LANES):
+        t = total + row # TwoSum: t + err == total + row exactly
+        z = t - total
+        error += (total - (t - z)) + (row - z)
+        total = t
+    try:
+        return math.fsum(total.tolist() + error.tolist() + values[rows * LANES:].tolist())
+    except OverflowError:
+        return float(values.sum())
+
+
+class Aggregate:
+    """Count, sum, mean, variance, min, max (and optionally product) of a stream of numbers."""
+
+    def __init__(self, values=(), product=False):
+        self.count = 0
+        self._total = 0.0
+        self._compensation = 0.0
+        self._shift = None # Means are kept relative to the first finite value, which keeps
+        self._mean = 0.0   # their rounding error far below the spread of the data
+        self._m2 = 0.0 # Sum of squared differences from the mean
+        self._min = math.inf
+        self._max = -math.inf
+        self.tracks_product = product
+        self._product = 1.0 # Exact enough unless it overflows or underflows
+        self._log_total = 0.0
+        self._log_compensation = 0.0
+        self._negatives = 0
+        self._zeros = 0
+        self.extend(values)
+
+    def __repr__(self):
+        if not self.count:
+            return "Aggregate(count=0)"
+        return f"Aggregate(count={self.count}, sum={self.sum!r}, mean={self.mean!r})"
+
+    # --- Adding Values ---
+
+    def add(self, x):
+        """Adds one number."""
+        if type(x) is not float and not calc_logic._is_numeric(x):
+            raise TypeError("Input must be numeric")
+        self._add_float(float(x))
+
+    def _set_shift(self, x):
+        if self._shift is None and math.isfinite(x):
+            self._shift = x
+
+    def _add_float(self, x):
+        if self._shift is None:
+            self._set_shift(x)
+        self.count += 1
+        total = self._total
+        t = total + x # Neumaier, inlined: this is the per-value path
+        if abs(total) >= abs(x):
+            self._compensation += (total - t) + x
+        else:
+            self._compensation += (x - t) + total
+        self._total = t
+        d = x - (self._shift or 0.0)
+        delta = d - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (d - self._mean)
+        if x < self._min or x != x:
+            self._min = x if self._min == self._min else self._min
+        if x > self._max or x != x:
+            self._max = x if self._max == self._max else self._max
+        if self.tracks_product:
+            self._product *= x
+            if x == 0:
+                self._zeros += 1
+            else:
+                if x < 0:
+                    self._negatives += 1
+                self._log_total, self._log_compensation = _neumaier(
+                    self._log_total, self._log_compensation, math.log(abs(x)))
+
+    def extend(self, values):
+        """Adds every value of an iterable or array (values are converted with float())."""
+        if _is_numpy_array(values) or (isinstance(values, (array, memoryview)) and _numpy() is not None):
+            numpy = _numpy()
+            if getattr(values, 'dtype', None) == object:
+                values = _float_array(numpy, values.ravel().tolist())
+            values = numpy.asarray(values, dtype=numpy.float64).ravel()
+            for start in range(0, values.size, CHUNK_SIZE):
+                self._add_array(values[start:start + CHUNK_SIZE])
+            return self
+        iterator = iter(values)
+        numpy = _numpy()
+        while True:
+            chunk = list(islice(iterator, CHUNK_SIZE))
+            if not chunk:
+                return self
+            if numpy is not None:
+                self._add_array(_float_array(numpy, chunk))
+            else:
+                for value in chunk:
+                    try:
+                        value = float(value)
+                    except (TypeError, ValueError):
+                        raise TypeError("Inputs must be numeric") from None
+                    self._add_float(value)
+
+    def _add_array(self, values):
+        if values.size:
+            with np.errstate(all='ignore'): # Overflow gives inf, like the scalar path
+                self._add_chunk(values)
+
+    def _add_chunk(self, values):
+        n = values.size
+        chunk_total = _chunk_sum(values)
+        self._set_shift(float(values[0]))
+        shifted = values - (self._shift or 0.0)
+        chunk_mean = float(shifted.sum()) / n
+        shifted -= chunk_mean
+        self._merge_moments(n, chunk_mean, float(np.dot(shifted, shifted)))
+        self._total, self._compensation = _neumaier(self._total, self._compensation, chunk_total)
+        self._min = _lower(self._min, float(values.min()))
+        self._max = _higher(self._max, float(values.max()))
+        if self.tracks_product:
+            self._product *= float(np.prod(values))
+            nonzero = values[values != 0]
+            self._zeros += n - nonzero.size
+            self._negatives += int(np.count_nonzero(nonzero < 0))
+            self._log_total, self._log_compensation = _neumaier(
+                self._log_total, self._log_compensation, _chunk_sum(np.log(np.abs(nonzero))))
+
+    def _merge_moments(self, n, mean, m2):
+        """Chan et al.: combines this aggregate's mean/m2 with those of n other values."""
+        total = self.count + n
+        delta = mean - self._mean
+        self._mean += delta * n / total
+        self._m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def merge(self, other):
+        """Adds the values another Aggregate has seen (e.g. of another chunk); returns self."""
+        if not other.count:
+            return self
+        if other._shift is not None:
+            self._set_shift(other._shift)
+        self._merge_moments(other.count, other._mean + ((other._shift or 0.0) - (self._shift or 0.0)), other._m2)
+        for part in (other._total, other._compensation):
+            self._total, self._compensation = _neumaier(self._total, self._compensation, part)
+        self._min = _lower(self._min, other._min)
+        self._max = _higher(self._max, other._max)
+        self.tracks_product = self.tracks_product and other.tracks_product
+        self._product *= other._product
+        self._zeros += other._zeros
+        self._negatives += other._negatives
+        for part in (other._log_total, other._log_compensation):
+            self._log_total, self._log_compensation = _neumaier(
+                self._log_total, self._log_compensation, part)
+        return self
+
+    # --- Statistics ---
+
+    def _require(self, minimum, statistic):
+        if self.count < minimum:
+            raise ValueError(f"{statistic} requires at least {'one value' if minimum == 1 else 'two values'}")
+
+    @property
+    def sum(self):
+        if not math.isfinite(self._total):
+            return self._total
+        return self._total + self._compensation
+
+    @property
+    def mean(self):
+        self._require(1, "mean")
+        total = self.sum
+        # The compensated sum is the more accurate mean unless it overflowed
+        return total / self.count if math.isfinite(total) else self._mean + (self._shift or 0.0)
+
+    @property
+    def variance(self):
+        """Sample variance (divides by count - 1)."""
+        self._require(2, "variance")
+        return self._m2 / (self.count - 1)
+
+    @property
+    def pvariance(self):
+        """Population variance (divides by count)."""
+        self._require(1, "pvariance")
+        return self._m2 / self.count
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def pstdev(self):
+        return math.sqrt(self.pvariance)
+
+    @property
+    def min(self):
+        self._require(1, "min")
+        return self._min
+
+    @property
+    def max(self):
+        self._require(1, "max")
+        return self._max
+
+    @property
+    def log_product(self):
+        """log|product| (-inf if a value was zero); never overflows."""
+        self._require(1, "product")
+        if not self.tracks_product:
+            raise ValueError("This aggregate does not track the product (use Aggregate(product=True))")
+        return -math.inf if self._zeros else self._log_total + self._log_compensation
+
+    @property
+    def product(self):
+        """The product of the values (OverflowError if it does not fit in a float)."""
+        log_product = self.log_product
+        if self._zeros:
+            return 0.0
+        direct = self._product
+        if (math.isfinite(direct) and abs(direct) >= sys.float_info.min
+                and abs(math.log(abs(direct)) - log_product) < 1e-6): # Not rounded away on the way
+            return direct
+        magnitude = math.exp(log_product)
+        return -magnitude if self._negatives % 2 else magnitude
+
+    def summary(self):
+        """Returns {statistic: value} of count, sum, mean, stdev, min and max (NaN where undefined)."""
+        result = {'count': self.count, 'sum': self.sum}
+        for name in ('mean', 'stdev', 'min', 'max'):
+            try:
+                result[name] = getattr(self, name)
+            except ValueError:
+                result[name] = math.nan
+        return result
+
+
+def _lower(a, b):
+    return a if a < b or a != a else b
+
+def _higher(a, b):
+    return a if a > b or a != a else b
+
+def combine(aggregates):
+    """Merges Aggregates of separate chunks into a new one."""
+    result = None
+    for aggregate in aggregates:
+        if result is None:
+            result = Aggregate(product=aggregate.tracks_product)
+        result.merge(aggregate)
+    return result if result is not None else Aggregate()
+
+
+# --- Expression Functions ---
+
+def _exact(statistic, values):
+    """The statistic of Decimal/Fraction values, computed in their own type."""
+    if statistic in ('mean', 'variance', 'stdev'):
+        import statistics # Imported lazily: expression.py imports this module at startup
+        return getattr(statistics, statistic)(values)
+    return {'sum': sum, 'min': min, 'max': max, 'product': math.prod}[statistic](values)
+
+def _expression_function(statistic):
+    def function(*values):
+        if not values:
+            raise TypeError(f"{statistic}() takes at least one value")
+        if any(isinstance(value, (Decimal, Fraction)) for value in values):
+            if not all(calc_logic._is_numeric(value) for value in values):
+                raise TypeError("Inputs must be numeric")
+            return _exact(statistic, values)
+        aggregate = Aggregate(product=statistic == 'product')
+        for value in values:
+            if _is_numpy_array(value):
+                aggregate.extend(value)
+            else:
+                aggregate.add(value)
+        return getattr(aggregate, statistic)
+    function.__name__ = statistic
+    function.__doc__ = f"{statistic} of the given values (arrays count value by value)."
+    return function
+
+# name -> function, added to the calculator's context by expression.default_context()
+EXPRESSION_FUNCTIONS = {name: _expression_function(name)
+                        for name in ('sum', 'mean', 'variance', 'stdev', 'min', 'max', 'product')}
+
+
+# --- Files ---
+
+def _range_values(path, start, end, index, delimiter):
+    """Yields the values of the lines that start in the byte range [start, end)."""
+    with open(path, 'rb') as f:
+        if start:
+            f.seek(start - 1)
+            f.readline() # Skip to the first line starting at or after start
+        position = f.tell()
+        def lines():
+            nonlocal position
+            while position < end:
+                line = f.readline()
+                if not line:
+                    return
+                position += len(line)
+                yield line.decode('utf-8')
+        if index is None:
+            for line in lines():
+                line = line.strip()
+                if line:
+                    yield line
+        else:
+            for row in csv.reader(lines(), delimiter=delimiter):
+                if row:
+                    yield row[index]
+
+def _aggregate_range(path, start, end, index, delimiter, product):
+    return Aggregate(_range_values(path, start, end, index, delimiter), product=product)
+
+def aggregate_file(path, column=None, delimiter=',', workers=None, product=False):
+    """Aggregates the numbers of a text file in one pass.
+
+    Without `column` the file has one number per line; otherwise it is a
+    CSV file with a header row and `column` names the column to aggregate.
+    With `workers` > 1 the file is split into that many byte ranges that
+    are aggregated in parallel processes and merged.
+    """
+    index = None
+    data_start = 0
+    if column is not None:
+        with open(path, 'rb') as f:
+            header_line = f.readline()
+            data_start = f.tell()
+        header = next(csv.reader([header_line.decode('utf-8')], delimiter=delimiter), [])
+        try:
+            index = header.index(column)
+        except ValueError:
+            raise KeyError(f"CSV header {header} has no column {column!r}") from None
+    size = os.path.getsize(path)
+    workers = workers or 1
+    if workers == 1:
+        return _aggregate_range(path, data_start, size, index, delimiter, product)
+    from concurrent.futures import ProcessPoolExecutor # Imported lazily: only needed for workers
+    step = max(1, (size - data_start) // workers)
+    bounds = [data_start + i * step for i in range(workers)] + [size]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = [pool.submit(_aggregate_range, path, start, end, index, delimiter, product)
+                 for start, end in zip(bounds, bounds[1:])]
+        return combine(part.result() for part in parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate the numbers of a file in one pass.")
+    parser.add_argument("path", help="text file with one number per line, or a CSV file with --column")
+    parser.add_argument("--column", help="name of the CSV column to aggregate")
+    parser.add_argument("--delimiter", default=',', help="CSV delimiter (default: ,)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="aggregate byte ranges of the file in this many processes")
+    parser.add_argument("--product", action="store_true", help="also print the product")
+    args = parser.parse_args(argv)
+    try:
+        aggregate = aggregate_file(args.path, args.column, args.delimiter, args.workers, args.product)
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    results = aggregate.summary()
+    if args.product:
+        try:
+            results['product'] = aggregate.product
+        except (ValueError, OverflowError) as e:
+            results['product'] = f"({e})"
+    for name, value in results.items():
+        print(f"{name} = {value!r}" if isinstance(value, float) else f"{name} = {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,523 @@
+# This is the backends.py file.
+# It contains the pluggable numeric backends for expression evaluation.
+
+# --- Numeric Backends ---
+# A backend decides which number type expressions are evaluated with:
+#   FloatBackend    - native floats through calculator.py (the default path,
+#                     no conversion cost at all)
+#   DecimalBackend  - decimal.Decimal with a configurable precision/context
+#   FractionBackend - fractions.Fraction; + - * / and integer powers are exact,
+#                     irrational results (sqrt of non-squares, log, trig)
+#                     fall back to float
+#   ComplexBackend  - complex numbers through cmath; square roots and
+#                     logarithms of negative numbers are defined, `j` (or
+#                     `i`) is the imaginary unit unless the context defines
+#                     it, and evaluate_array() evaluates a whole column of
+#                     samples with NumPy complex128 arrays (vector.py)
+# Every backend has the same interface as guard.GuardedEvaluator:
+# evaluate(source, context), format_result(result) and a `zero` value, so it
+# can be given to CalculatorSession, the CLI or the parallel workers.
+# Number literals are converted once, when the expression is compiled, from
+# their shortest float representation (so "0.1" becomes exactly 1/10).
+# Numbers and calculator.py functions found in the context are converted to
+# the backend's equivalents per evaluation, only for the names the
+# expression uses.
+# Tolerances are set per backend: tangent_tolerance decides when a cosine
+# counts as zero (tan is undefined there; calculator.TANGENT_COS_TOLERANCE
+# by default), and the complex backend's imaginary_tolerance decides when an
+# imaginary part is rounding noise and the result is shown as real.
+
+import abc
+import cmath
+import decimal
+import math
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache, partial
+
+import calculator as calc_logic
+import expression as expr_engine
+
+# Same default tolerance as calculator.tangent uses for "cosine is effectively zero".
+TANGENT_COS_TOLERANCE = calc_logic.TANGENT_COS_TOLERANCE
+
+
+def convert_literals(tree, convert):
+    """Returns a copy of a parsed tree with every number literal passed through convert."""
+    kind = tree[0]
+    if kind == expr_engine.NUM:
+        return (expr_engine.NUM, convert(tree[1]))
+    if kind in (expr_engine.NEG, expr_engine.POS):
+        return (kind, convert_literals(tree[1], convert))
+    if kind == expr_engine.BINOP:
+        return (kind, tree[1], convert_literals(tree[2], convert), convert_literals(tree[3], convert))
+    if kind == expr_engine.CALL:
+        return (kind, tree[1], tuple(convert_literals(arg, convert) for arg in tree[2]))
+    return tree
+
+
+class FloatBackend:
+    """Native float evaluation; identical to the plain expression engine."""
+
+    name = 'float'
+    zero = 0.0
+
+    def __init__(self, tangent_tolerance=None):
+        self.tangent_tolerance = tangent_tolerance
+        self._tangent = (None if tangent_tolerance is None
+                         else partial(calc_logic.tangent, tolerance=tangent_tolerance))
+
+    def evaluate(self, source, context):
+        if self._tangent is not None:
+            context = {name: self._tangent if value is calc_logic.tangent else value
+                       for name, value in context.items()}
+        return expr_engine.evaluate(source, context)
+
+    def format_result(self, result):
+        return expr_engine.format_result(result)
+
+
+class _ConvertingBackend(abc.ABC):
+    """Shared compile/convert logic of the non-float backends."""
+
+    name = None
+    zero = None
+
+    def __init__(self, cache_size=expr_engine.CACHE_SIZE):
+        self._compile = lru_cache(maxsize=cache_size)(self._compile_normalized)
+        self._functions = self._function_table()
+
+    @abc.abstractmethod
+    def convert(self, value):
+        """Converts an int or float to the backend's number type."""
+
+    @abc.abstractmethod
+    def binary_functions(self):
+        """Returns the operator table ('+', '-', '*', '/', '**') used to compile expressions."""
+
+    @abc.abstractmethod
+    def _function_table(self):
+        """Maps calculator.py functions to their backend versions."""
+
+    def _compile_normalized(self, key):
+        compiled = expr_engine.compile_expression(key)
+        tree = convert_literals(compiled.tree, self.convert)
+        return expr_engine.compile_tree(tree, self.binary_functions()), compiled.names
+
+    def convert_value(self, value):
+        """Converts a context entry: numbers to the backend type, calculator functions to their backend versions."""
+        if callable(value):
+            return self._functions.get(value, value)
+        if isinstance(value, (int, float)):
+            return self.convert(value)
+        return value
+
+    def evaluate(self, source, context):
+        func, names = self._compile(expr_engine.normalize(source))
+        ns = {name: self.convert_value(context[name]) for name in names if name in context}
+        return self._run(func, ns)
+
+    def _run(self, func, ns):
+        return func(ns)
+
+
+# --- Decimal Backend ---
+
+# pi per decimal precision, so trigonometric functions do not recompute it.
+_PI_BY_PRECISION = {}
+
+def _decimal_pi():
+    """Computes pi to the current decimal precision (recipe from the decimal docs)."""
+    precision = decimal.getcontext().prec
+    cached = _PI_BY_PRECISION.get(precision)
+    if cached is not None:
+        return +cached
+    decimal.getcontext().prec += 2
+    three = Decimal(3)
+    lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+    while s != lasts:
+        lasts = s
+        n, na = n + na, na + 8
+        d, da = d + da, da + 32
+        t = (t * n) / d
+        s += t
+    decimal.getcontext().prec -= 2
+    _PI_BY_PRECISION[precision] = +s
+    return +s
+
+def _decimal_sin_cos(x, cosine):
+    """Taylor series for sin/cos at the current decimal precision (recipe from the decimal docs)."""
+    # Reduce the argument to [-pi, pi] first so the series converges quickly.
+    pi = _decimal_pi()
+    x = x.remainder_near(2 * pi)
+    decimal.getcontext().prec += 2
+    if cosine:
+        i, lasts, s, fact, num, sign = 0, 0, Decimal(1), 1, Decimal(1), 1
+    else:
+        i, lasts, s, fact, num, sign = 1, 0, x, 1, x, 1
+    while s != lasts:
+        lasts = s
+        i += 2
+        fact *= i * (i - 1)
+        num *= x * x
+        sign *= -1
+        s += num / fact * sign
+    decimal.getcontext().prec -= 2
+    return +s
+
+def _check_decimal(x):
+    if not isinstance(x, (int, Decimal)):
+        raise TypeError("Input must be numeric")
+    return Decimal(x)
+
+def _decimal_power(x, y):
+    if not (isinstance(x, (int, Decimal)) and isinstance(y, (int, Decimal))):
+        raise TypeError("Inputs must be numeric")
+    x, y = Decimal(x), Decimal(y)
+    # Same domain as math.pow.
+    if x == 0 and y < 0:
+        raise ValueError("math domain error")
+    if x < 0 and y != y.to_integral_value():
+        raise ValueError("math domain error")
+    return x ** y
+
+def _decimal_sqrt(x):
+    x = _check_decimal(x)
+    if x < 0:
+        raise ValueError("Cannot calculate square root of a negative number")
+    return x.sqrt()
+
+def _decimal_ln(x):
+    x = _check_decimal(x)
+    if x <= 0:
+        raise ValueError("Cannot calculate logarithm of a non-positive number")
+    return x.ln()
+
+def _decimal_log10(x):
+    x = _check_decimal(x)
+    if x <= 0:
+        raise ValueError("Cannot calculate logarithm of a non-positive number")
+    return x.log10()
+
+def _decimal_sin(x):
+    return _decimal_sin_cos(_check_decimal(x), cosine=False)
+
+def _decimal_cos(x):
+    return _decimal_sin_cos(_check_decimal(x), cosine=True)
+
+def _decimal_tan(x, tolerance=TANGENT_COS_TOLERANCE):
+    x = _check_decimal(x)
+    cos = _decimal_sin_cos(x, cosine=True)
+    if abs(cos) <= Decimal(tolerance):
+        raise ValueError(
+            "Tangent is undefined for angles where cosine is zero (e.g., pi/2 + k*pi)"
+        )
+    return _decimal_sin_cos(x, cosine=False) / cos
+
+
+class DecimalBackend(_ConvertingBackend):
+    """decimal.Decimal evaluation with its own decimal context (default 28 digits)."""
+
+    name = 'decimal'
+    zero = Decimal(0)
+
+    def __init__(self, precision=None, context=None, cache_size=expr_engine.CACHE_SIZE,
+                 tangent_tolerance=TANGENT_COS_TOLERANCE):
+        if context is None:
+            context = decimal.Context(prec=precision or decimal.DefaultContext.prec)
+        self.decimal_context = context
+        self.tangent_tolerance = tangent_tolerance
+        self._constants = {}
+        super().__init__(cache_size)
+
+    def convert(self, value):
+        if isinstance(value, Decimal):
+            return value
+        if value is math.pi:
+            return self._constant('pi')
+        if value is math.e:
+            return self._constant('e')
+        if isinstance(value, float):
+            return Decimal(repr(value))
+        return Decimal(value)
+
+    def _constant(self, name):
+        """Returns pi or e computed to this backend's precision."""
+        value = self._constants.get(name)
+        if value is None:
+            with decimal.localcontext(self.decimal_context):
+                value = _decimal_pi() if name == 'pi' else Decimal(1).exp()
+            self._constants[name] = value
+        return value
+
+    def binary_functions(self):
+        return dict(expr_engine.BINARY_FUNCTIONS, **{'**': _decimal_power})
+
+    def _function_table(self):
+        return {
+            calc_logic.square_root: _decimal_sqrt,
+            calc_logic.log_natural: _decimal_ln,
+            calc_logic.log_base10: _decimal_log10,
+            calc_logic.sine: _decimal_sin,
+            calc_logic.cosine: _decimal_cos,
+            calc_logic.tangent: partial(_decimal_tan, tolerance=self.tangent_tolerance),
+            calc_logic.power: _decimal_power,
+        }
+
+    def _run(self, func, ns):
+        with decimal.localcontext(self.decimal_context):
+            return func(ns)
+
+    def format_result(self, result):
+        if not isinstance(result, Decimal):
+            return expr_engine.format_result(result)
+        result = result.normalize(self.decimal_context)
+        if result == result.to_integral_value():
+            return format(result, 'f') # 1E+2 -> "100"
+        return str(result)
+
+
+# --- Fraction Backend ---
+
+def _is_integral(value):
+    return isinstance(value, int) or (isinstance(value, Fraction) and value.denominator == 1)
+
+def _fraction_power(x, y):
+    if _is_integral(y) and isinstance(x, (int, Fraction)):
+        if x == 0 and y < 0:
+            raise ValueError("math domain error")
+        return Fraction(x) ** int(y)
+    return calc_logic.power(float(x), float(y)) # Irrational in general: float fallback
+
+def _exact_sqrt(n):
+    root = math.isqrt(n)
+    return root if root * root == n else None
+
+def _fraction_sqrt(x):
+    if isinstance(x, Fraction) and x >= 0:
+        num, den = _exact_sqrt(x.numerator), _exact_sqrt(x.denominator)
+        if num is not None and den is not None:
+            return Fraction(num, den)
+    if isinstance(x, Fraction):
+        x = float(x)
+    return calc_logic.square_root(x)
+
+def _float_fallback(func):
+    def call(x):
+        return func(float(x) if isinstance(x, Fraction) else x)
+    return call
+
+
+class FractionBackend(_ConvertingBackend):
+    """Exact rational evaluation with fractions.Fraction."""
+
+    name = 'fraction'
+    zero = Fraction(0)
+
+    def __init__(self, cache_size=expr_engine.CACHE_SIZE, tangent_tolerance=TANGENT_COS_TOLERANCE):
+        self.tangent_tolerance = tangent_tolerance
+        super().__init__(cache_size)
+
+    def convert(self, value):
+        if isinstance(value, float):
+            return Fraction(repr(value))
+        return Fraction(value)
+
+    def binary_functions(self):
+        return dict(expr_engine.BINARY_FUNCTIONS, **{'**': _fraction_power})
+
+    def _function_table(self):
+        table = {func: _float_fallback(func) for func in (
+            calc_logic.log_natural, calc_logic.log_base10, calc_logic.sine, calc_logic.cosine)}
+        table[calc_logic.tangent] = _float_fallback(
+            partial(calc_logic.tangent, tolerance=self.tangent_tolerance))
+        table[calc_logic.square_root] = _fraction_sqrt
+        table[calc_logic.power] = _fraction_power
+        return table
+
+    def format_result(self, result):
+        if isinstance(result, Fraction):
+            return str(result) # "3" or "1/3"
+        return expr_engine.format_result(result)
+
+
+# --- Complex Backend ---
+
+# Imaginary parts below this fraction of a result's magnitude are rounding
+# noise (e.g. exp(pi * j) = -1 + 1.2e-16j) and are not displayed.
+IMAGINARY_TOLERANCE = 1e-12
+
+# Names of the imaginary unit in complex mode (when the context does not define them).
+IMAGINARY_UNITS = {'j': 1j, 'i': 1j}
+
+def _is_complex_numeric(val):
+    return isinstance(val, (int, float, complex))
+
+def _complex_add(x, y):
+    if not (_is_complex_numeric(x) and _is_complex_numeric(y)):
+        raise TypeError("Inputs must be numeric")
+    return x + y
+
+def _complex_subtract(x, y):
+    if not (_is_complex_numeric(x) and _is_complex_numeric(y)):
+        raise TypeError("Inputs must be numeric")
+    return x - y
+
+def _complex_multiply(x, y):
+    if not (_is_complex_numeric(x) and _is_complex_numeric(y)):
+        raise TypeError("Inputs must be numeric")
+    return x * y
+
+def _complex_divide(x, y):
+    if not (_is_complex_numeric(x) and _is_complex_numeric(y)):
+        raise TypeError("Inputs must be numeric")
+    if y == 0:
+        raise ZeroDivisionError("Cannot divide by zero")
+    return x / y
+
+def _complex_power(x, y):
+    if not (_is_complex_numeric(x) and _is_complex_numeric(y)):
+        raise TypeError("Inputs must be numeric")
+    if x == 0 and (y.real < 0 or (y.real == 0 and y.imag != 0)):
+        raise ValueError("math domain error") # Same as math.pow(0, -1)
+    if isinstance(x, complex) or isinstance(y, complex):
+        return complex(x) ** y
+    # Infinite and NaN exponents stay with math.pow, like the float backend.
+    if x < 0 and isinstance(y, float) and math.isfinite(y) and not y.is_integer():
+        return complex(x) ** y # (-8) ** (1/3) is the principal complex root
+    return math.pow(x, y)
+
+def _complex_unary(func, check_zero=False):
+    def call(x):
+        if not _is_complex_numeric(x):
+            raise TypeError("Input must be numeric")
+        if check_zero and x == 0:
+            raise ValueError("Cannot calculate logarithm of zero")
+        return func(x)
+    return call
+
+def _complex_tan(x, tolerance=TANGENT_COS_TOLERANCE):
+    if not _is_complex_numeric(x):
+        raise TypeError("Input must be numeric")
+    if abs(cmath.cos(x)) <= tolerance:
+        raise ValueError(
+            "Tangent is undefined for angles where cosine is zero (e.g., pi/2 + k*pi)"
+        )
+    return cmath.tan(x)
+
+_COMPLEX_BINARY_FUNCTIONS = {
+    '+': _complex_add,
+    '-': _complex_subtract,
+    '*': _complex_multiply,
+    '/': _complex_divide,
+    '**': _complex_power,
+}
+
+
+class ComplexBackend(_ConvertingBackend):
+    """Complex evaluation with cmath; a scalar path and a NumPy path for whole columns."""
+
+    name = 'complex'
+    zero = 0j
+
+    def __init__(self, cache_size=expr_engine.CACHE_SIZE, tangent_tolerance=TANGENT_COS_TOLERANCE,
+                 imaginary_tolerance=IMAGINARY_TOLERANCE):
+        self.tangent_tolerance = tangent_tolerance
+        self.imaginary_tolerance = imaginary_tolerance
+        super().__init__(cache_size)
+        self._compile_vector = lru_cache(maxsize=cache_size)(self._compile_vector_normalized)
+
+    def convert(self, value):
+        return value # cmath accepts ints and floats as they are
+
+    def binary_functions(self):
+        return _COMPLEX_BINARY_FUNCTIONS
+
+    def _function_table(self):
+        return {
+            calc_logic.add: _complex_add,
+            calc_logic.subtract: _complex_subtract,
+            calc_logic.multiply: _complex_multiply,
+            calc_logic.divide: _complex_divide,
+            calc_logic.power: _complex_power,
+            calc_logic.square_root: _complex_unary(cmath.sqrt),
+            calc_logic.log_natural: _complex_unary(cmath.log, check_zero=True),
+            calc_logic.log_base10: _complex_unary(cmath.log10, check_zero=True),
+            calc_logic.sine: _complex_unary(cmath.sin),
+            calc_logic.cosine: _complex_unary(cmath.cos),
+            calc_logic.tangent: partial(_complex_tan, tolerance=self.tangent_tolerance),
+        }
+
+    def evaluate(self, source, context):
+        func, names = self._compile(expr_engine.normalize(source))
+        ns = {}
+        for name in names:
+            if name in context:
+                ns[name] = self.convert_value(context[name])
+            elif name in IMAGINARY_UNITS:
+                ns[name] = IMAGINARY_UNITS[name]
+        return func(ns)
+
+    def _compile_vector_normalized(self, key):
+        import vector # Imported lazily: NumPy is optional
+        compiled = expr_engine.compile_expression(key)
+        return vector.compile_tree(compiled.tree, complex_mode=True), compiled.names
+
+    def evaluate_array(self, source, context=None, **columns):
+        """Evaluates source over whole columns of samples (complex128); failing elements become NaN."""
+        import vector
+        if context is None:
+            context = expr_engine.default_context()
+        func, names = self._compile_vector(expr_engine.normalize(source))
+        ns = {}
+        for name in names:
+            if name in columns:
+                ns[name] = columns[name]
+            elif name in context:
+                value = context[name]
+                if value is calc_logic.tangent:
+                    ns[name] = partial(vector.complex_tangent, tolerance=self.tangent_tolerance)
+                else:
+                    ns[name] = vector.COMPLEX_SCALAR_TO_VECTOR.get(value, value) if callable(value) else value
+            elif name in IMAGINARY_UNITS:
+                ns[name] = IMAGINARY_UNITS[name]
+        return func(ns)
+
+    def is_real(self, result):
+        """True if the imaginary part of result is zero or within imaginary_tolerance."""
+        return abs(result.imag) <= self.imaginary_tolerance * abs(result)
+
+    def format_result(self, result):
+        if not isinstance(result, complex):
+            return expr_engine.format_result(result)
+        if self.is_real(result):
+            return expr_engine.format_result(result.real)
+        imaginary = expr_engine.format_result(result.imag)
+        if abs(result.real) <= self.imaginary_tolerance * abs(result): # Purely imaginary
+            return imaginary + "j"
+        sign = "" if imaginary.startswith("-") else "+"
+        return f"{expr_engine.format_result(result.real)}{sign}{imaginary}j"
+
+
+BACKENDS = {
+    'float': FloatBackend,
+    'decimal': DecimalBackend,
+    'fraction': FractionBackend,
+    'complex': ComplexBackend,
+}
+
+def get_backend(name='float', precision=None, **options):
+    """Creates a backend by name ('float', 'decimal', 'fraction' or 'complex').
+
+    `precision` only applies to the decimal backend. Further keyword options
+    (e.g. tangent_tolerance) go to the backend class.
+    """
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown backend {name!r}; choose from {sorted(BACKENDS)}") from None
+    if backend_class is DecimalBackend:
+        return DecimalBackend(precision, **options)
+    if precision is not None:
+        raise ValueError(f"precision only applies to the decimal backend, not {name!r}")
+    return backend_class(**options)
@@ -0,0 +1,412 @@
+# This is the benchmark.py file.
+# It contains the performance benchmarks of the calculator.
+
+# --- Benchmark Harness ---
+# These groups of benchmarks are defined:
+#   primitives - one calculator.py function (or helper) per benchmark
+#   expression - end-to-end evaluation of expressions of growing depth/length,
+#                through the compiled engine, the optimizer (optimize.py)
+#                and the old eval() path, plus live-preview typing
+#   session    - memory button presses, with and without accumulate mode
+#   calculus   - Newton's method solving x ** 2 = a, one equation at a time
+#                and (with NumPy) all equations in one vectorized solve
+#   aggregate  - streaming sum/mean/variance of values added one at a time
+#                and (with NumPy) of an array processed in chunks
+#   batch      - throughput of the headless batch path for growing batch sizes,
+#                and (with NumPy) of memory-mapped column files (columns.py)
+#   startup    - import time of gui_calculator and time until the first frame
+#                is drawn, each measured in a fresh interpreter (--startup);
+#                the first frame is skipped when no display is available
+# Results are written as JSON and can be compared against a saved baseline;
+# a benchmark counts as a regression when it is slower than the baseline by
+# more than the threshold (relative, default 10%). Startup measurements also
+# have absolute targets (STARTUP_TARGETS_MS) and fail the run when missed.
+#
+# Usage:
+#   python HesapMakinesi/benchmark.py -o results.json
+#   python HesapMakinesi/benchmark.py --baseline results.json --threshold 0.15
+#   python HesapMakinesi/benchmark.py --filter primitives --quick
+#   python HesapMakinesi/benchmark.py --startup --filter startup
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import calculator as calc_logic
+import expression as expr_engine
+import optimize
+from preview import IncrementalEvaluator
+from cli import evaluate_lines
+from session import CalculatorSession
+from formula import Formula
+from units import UnitFormula
+import aggregate
+import calculus
+import columns
+
+DEFAULT_REPEAT = 5
+QUICK_REPEAT = 2
+DEFAULT_THRESHOLD = 0.10
+EXPRESSION_DEPTHS = (1, 4, 16, 64)
+BATCH_SIZES = (10, 100, 1000, 10000)
+# Startup targets for kiosk launches, in milliseconds.
+STARTUP_TARGETS_MS = {'startup_import': 100.0, 'startup_first_frame': 400.0}
+
+
+# --- Benchmark Definitions ---
+# Every benchmark is (name, group, setup) where setup() returns a zero-argument
+# callable and the number of operations one call of it performs.
+
+def _primitive(func, *args):
+    return lambda: ((lambda: func(*args)), 1)
+
+def _nested_expression(depth):
+    """Builds an expression with `depth` nested function calls and operators."""
+    source = "1.5"
+    for i in range(depth):
+        func = ("sqrt", "sin", "cos", "log10")[i % 4]
+        source = f"{func}({source} * 2 + {i + 1})"
+    return source
+
+def _compiled_setup(source):
+    def setup():
+        context = expr_engine.default_context()
+        expr_engine.evaluate(source, context) # warm the compile cache
+        return (lambda: expr_engine.evaluate(source, context)), 1
+    return setup
+
+def _optimized_setup(source):
+    def setup():
+        context = expr_engine.default_context()
+        optimize.evaluate(source, context)
+        return (lambda: optimize.evaluate(source, context)), 1
+    return setup
+
+def _uncached_setup(source):
+    def setup():
+        context = expr_engine.default_context()
+        def run():
+            expr_engine.clear_cache()
+            return expr_engine.evaluate(source, context)
+        return run, 1
+    return setup
+
+def _legacy_eval_setup(source):
+    # The evaluation path CalculatorGUI used before the compiled engine.
+    def setup():
+        context = expr_engine.default_context()
+        builtins = {"__builtins__": {}}
+        return (lambda: eval(source.replace("pow", "**"), builtins, context)), 1
+    return setup
+
+def _preview_typing_setup(terms):
+    # One op = one keystroke: the text grows by a character and is previewed.
+    def setup():
+        text = " + ".join(f"sqrt({i}) * 2" for i in range(terms))
+        context = expr_engine.default_context()
+        def run():
+            incremental = IncrementalEvaluator(context)
+            for end in range(1, len(text) + 1):
+                incremental.update(text[:end])
+                incremental.preview()
+        return run, len(text)
+    return setup
+
+def _formula_setup(units):
+    # One op = one call of a compiled formula. The unit-aware version checks
+    # dimensions when it is created and must cost the same per call.
+    def setup():
+        source = "sqrt(x * x + y * y) / t"
+        if units:
+            formula = UnitFormula(source, {'x': 'm', 'y': 'm', 't': 's'})
+        else:
+            formula = Formula(source, ['x', 'y', 't'])
+        values = [(float(i), float(i + 1), float(i % 7 + 1)) for i in range(1000)]
+        def run():
+            for x, y, t in values:
+                formula(x, y, t)
+        return run, len(values)
+    return setup
+
+def _memory_setup(accumulate):
+    # One op = one M+ press with a long expression in the display.
+    def setup():
+        session = CalculatorSession(accumulate=accumulate)
+        def run():
+            session.expression = " + ".join(f"sqrt({i})" for i in range(50))
+            for _ in range(100):
+                session.press('M+', 'memory')
+        return run, 100
+    return setup
+
+def _newton_setup(vectorized):
+    # One op = one equation x ** 2 = a solved to full precision.
+    def setup():
+        equation = calculus.Equation("x ** 2 - a", params=['a'])
+        if vectorized:
+            column = calculus.np.arange(1.0, 1001.0)
+            def run():
+                equation.newton(column, a=column)
+            return run, len(column)
+        values = [float(a) for a in range(1, 101)]
+        def run():
+            for a in values:
+                equation.newton(a, a=a)
+        return run, len(values)
+    return setup
+
+def _aggregate_setup(vectorized):
+    # One op = one value added to an Aggregate.
+    def setup():
+        if vectorized:
+            numpy = aggregate._numpy()
+            column = numpy.random.default_rng(0).random(10**6)
+            def run():
+                aggregate.Aggregate(column).variance
+            return run, column.size
+        values = [i * 0.001 for i in range(1000)]
+        def run():
+            result = aggregate.Aggregate()
+            for value in values:
+                result.add(value)
+            result.variance
+        return run, len(values)
+    return setup
+
+def _batch_setup(size):
+    def setup():
+        lines = [f"{i} * 2 + sqrt({i})" for i in range(size)]
+        context = expr_engine.default_context()
+        def run():
+            for _ in evaluate_lines(lines, context):
+                pass
+        return run, size
+    return setup
+
+def _mapped_setup(rows):
+    # One op = one row read from two column files and written with its error bit.
+    def setup():
+        directory = tempfile.TemporaryDirectory() # Removed when run is garbage collected
+        inputs = {}
+        for name, column in (('x', columns.np.linspace(-1, 1, rows)), ('y', columns.np.arange(rows))):
+            inputs[name] = os.path.join(directory.name, f"{name}.npy")
+            columns.np.save(inputs[name], column)
+        output = os.path.join(directory.name, "r.f64")
+        errors = os.path.join(directory.name, "r.errors")
+        def run():
+            columns.evaluate_mapped("sqrt(x) + log10(y) / 2", inputs, output, errors)
+        run.directory = directory
+        return run, rows
+    return setup
+
+def build_benchmarks():
+    benchmarks = [
+        ('is_numeric', 'primitives', _primitive(calc_logic._is_numeric, 1.5)),
+        ('add', 'primitives', _primitive(calc_logic.add, 1.5, 2.5)),
+        ('subtract', 'primitives', _primitive(calc_logic.subtract, 1.5, 2.5)),
+        ('multiply', 'primitives', _primitive(calc_logic.multiply, 1.5, 2.5)),
+        ('divide', 'primitives', _primitive(calc_logic.divide, 1.5, 2.5)),
+        ('power', 'primitives', _primitive(calc_logic.power, 1.5, 2.5)),
+        ('square_root', 'primitives', _primitive(calc_logic.square_root, 2.0)),
+        ('log_natural', 'primitives', _primitive(calc_logic.log_natural, 2.0)),
+        ('log_base10', 'primitives', _primitive(calc_logic.log_base10, 2.0)),
+        ('sine', 'primitives', _primitive(calc_logic.sine, 0.5)),
+        ('cosine', 'primitives', _primitive(calc_logic.cosine, 0.5)),
+        ('tangent', 'primitives', _primitive(calc_logic.tangent, 0.5)),
+    ]
+    for depth in EXPRESSION_DEPTHS:
+        source = _nested_expression(depth)
+        benchmarks.append((f'compiled_depth_{depth}', 'expression', _compiled_setup(source)))
+        benchmarks.append((f'optimized_depth_{depth}', 'expression', _optimized_setup(source)))
+        benchmarks.append((f'uncached_depth_{depth}', 'expression', _uncached_setup(source)))
+        benchmarks.append((f'legacy_eval_depth_{depth}', 'expression', _legacy_eval_setup(source)))
+    benchmarks.append(('preview_typing_100', 'expression', _preview_typing_setup(100)))
+    benchmarks.append(('formula_call', 'expression', _formula_setup(False)))
+    benchmarks.append(('unit_formula_call', 'expression', _formula_setup(True)))
+    benchmarks.append(('memory_add', 'session', _memory_setup(False)))
+    benchmarks.append(('memory_add_accumulate', 'session', _memory_setup(True)))
+    benchmarks.append(('newton_scalar', 'calculus', _newton_setup(False)))
+    if calculus.np is not None:
+        benchmarks.append(('newton_vectorized', 'calculus', _newton_setup(True)))
+    benchmarks.append(('aggregate_scalar', 'aggregate', _aggregate_setup(False)))
+    if aggregate._numpy() is not None:
+        benchmarks.append(('aggregate_array', 'aggregate', _aggregate_setup(True)))
+    for size in BATCH_SIZES:
+        benchmarks.append((f'batch_{size}', 'batch', _batch_setup(size)))
+    if columns.np is not None:
+        benchmarks.append(('mapped_columns', 'batch', _mapped_setup(10**6)))
+    return benchmarks
+
+
+# --- Startup ---
+
+_STARTUP_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {directory!r})
+import gui_calculator
+imported = time.perf_counter()
+result = {{'startup_import': imported - started, 'tk_imported': 'tkinter' in sys.modules}}
+if {first_frame!r}:
+    try:
+        root, gui = gui_calculator.create_app()
+        root.update()
+        result['startup_first_frame'] = time.perf_counter() - started
+        root.destroy()
+    except gui_calculator.tk.TclError: # No display
+        pass
+print(json.dumps(result))
+'''
+
+def measure_startup(repeat=DEFAULT_REPEAT, first_frame=True):
+    """Measures startup in fresh interpreters; returns {name: seconds samples}."""
+    script = _STARTUP_SCRIPT.format(directory=os.path.dirname(os.path.abspath(__file__)),
+                                    first_frame=first_frame)
+    samples = {}
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True,
+                                text=True, check=True).stdout
+        result = json.loads(output)
+        if result.pop('tk_imported'):
+            raise RuntimeError("Importing gui_calculator must not import tkinter")
+        for name, seconds in result.items():
+            samples.setdefault(name, []).append(seconds)
+    return samples
+
+def _startup_entries(repeat):
+    entries = {}
+    for name, seconds in measure_startup(repeat).items():
+        samples = [s * 1e9 for s in seconds]
+        entries[name] = {
+            'ns_per_op': min(samples),
+            'median_ns_per_op': statistics.median(samples),
+            'ops_per_sec': 1e9 / min(samples),
+            'number': 1,
+            'repeat': repeat,
+            'group': 'startup',
+            'target_ms': STARTUP_TARGETS_MS.get(name),
+        }
+    return entries
+
+def missed_targets(document):
+    """Returns [(name, measured_ms, target_ms)] for results slower than their target."""
+    missed = []
+    for name, entry in document['results'].items():
+        target = entry.get('target_ms')
+        if target is not None and entry['ns_per_op'] / 1e6 > target:
+            missed.append((name, entry['ns_per_op'] / 1e6, target))
+    return missed
+
+
+# --- Running and Comparing ---
+
+def measure(func, ops_per_call=1, repeat=DEFAULT_REPEAT, number=None):
+    """Times func and returns per-operation statistics in nanoseconds."""
+    timer = timeit.Timer(func)
+    if number is None:
+        number, _ = timer.autorange()
+    samples = [t / (number * ops_per_call) * 1e9 for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'ns_per_op': min(samples),
+        'median_ns_per_op': statistics.median(samples),
+        'ops_per_sec': 1e9 / min(samples),
+        'number': number,
+        'repeat': repeat,
+    }
+
+def run_benchmarks(name_filter=None, repeat=DEFAULT_REPEAT, number=None, startup=False):
+    """Runs every benchmark whose name or group contains name_filter.
+
+    The startup group is only run when `startup` is true (it starts new
+    interpreters).
+    """
+    results = {}
+    for name, group, setup in build_benchmarks():
+        if name_filter and name_filter not in name and name_filter != group:
+            continue
+        func, ops_per_call = setup()
+        entry = measure(func, ops_per_call, repeat=repeat, number=number)
+        entry['group'] = group
+        results[name] = entry
+    if startup:
+        for name, entry in _startup_entries(repeat).items():
+            if not name_filter or name_filter in name or name_filter == 'startup':
+                results[name] = entry
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+        },
+        'results': results,
+    }
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compares two result documents; returns a list of rows for common benchmarks.
+
+    Each row is (name, baseline_ns, current_ns, relative_change, is_regression).
+    """
+    rows = []
+    for name, entry in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        change = entry['ns_per_op'] / base['ns_per_op'] - 1
+        rows.append((name, base['ns_per_op'], entry['ns_per_op'], change, change > threshold))
+    return rows
+
+def format_results(document):
+    lines = [f"{'benchmark':<26}{'ns/op':>14}{'ops/s':>16}"]
+    for name, entry in document['results'].items():
+        lines.append(f"{name:<26}{entry['ns_per_op']:>14.1f}{entry['ops_per_sec']:>16,.0f}")
+    return "\n".join(lines)
+
+def format_comparison(rows):
+    lines = [f"{'benchmark':<26}{'baseline':>12}{'current':>12}{'change':>10}"]
+    for name, base_ns, current_ns, change, regression in rows:
+        flag = "  REGRESSION" if regression else ""
+        lines.append(f"{name:<26}{base_ns:>12.1f}{current_ns:>12.1f}{change:>+10.1%}{flag}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the calculator benchmarks.")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown counted as a regression (default 0.10)")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this text, or a group name")
+    parser.add_argument("--quick", action="store_true", help="fewer repeats, for a fast rough run")
+    parser.add_argument("--startup", action="store_true",
+                        help="also measure import time and time to first frame")
+    args = parser.parse_args(argv)
+
+    document = run_benchmarks(args.filter, repeat=QUICK_REPEAT if args.quick else DEFAULT_REPEAT,
+                              startup=args.startup)
+    print(format_results(document))
+    missed = missed_targets(document)
+    for name, measured_ms, target_ms in missed:
+        print(f"{name}: {measured_ms:.1f} ms exceeds the target of {target_ms:.0f} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(document, baseline, args.threshold)
+        print()
+        print(format_comparison(rows))
+        if any(row[4] for row in rows):
+            return 1
+    return 1 if missed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
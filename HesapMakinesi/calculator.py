@@ -7,10 +7,16 @@
 # user input directly or print to the console, making them suitable for import.
 
 import math
+from decimal import Decimal
+from fractions import Fraction
+
+# Default tolerance for "cosine is effectively zero" in tangent. Backends and
+# the vectorized functions accept their own value (see backends.py).
+TANGENT_COS_TOLERANCE = 1e-9
 
 def _is_numeric(val):
-    """Helper function to check if a value is numeric (int or float)."""
-    return isinstance(val, (int, float))
+    """Helper function to check if a value is numeric (int, float, Decimal or Fraction)."""
+    return isinstance(val, (int, float, Decimal, Fraction))
 
 def add(x, y):
   """Adds two numbers."""
@@ -80,14 +86,14 @@ def cosine(x):
     raise TypeError("Input must be numeric")
   return math.cos(x)
 
-def tangent(x):
+def tangent(x, tolerance=TANGENT_COS_TOLERANCE):
   """Calculates the tangent of x (x in radians)."""
   if not _is_numeric(x):
     raise TypeError("Input must be numeric")
   # tan(pi/2 + k*pi) is undefined; use a small absolute tolerance
   # when checking if cosine is effectively zero to account for
   # floating point inaccuracies.
-  if math.isclose(math.cos(x), 0, abs_tol=1e-9):
+  if math.isclose(math.cos(x), 0, abs_tol=tolerance):
       raise ValueError(
           "Tangent is undefined for angles where cosine is zero (e.g., pi/2 + k*pi)"
       )
@@ -0,0 +1,490 @@
+# This is the calculus.py file.
+# It contains symbolic differentiation, root finding and integration of expressions.
+
+# --- Symbolic Differentiation ---
+# derivative_tree() differentiates a parsed tree (see expression.py) with
+# respect to one variable using the sum, product, quotient, power and chain
+# rules and the derivatives of the calculator.py functions (sqrt, log, log10,
+# sin, cos, tan). Functions are recognized by identity in the context, like
+# the optimizer does, so the derivative calls them by the names the context
+# uses. Terms that are known to be 0 or 1 are dropped while the tree is built;
+# everything else is left to the optimizer. format_tree() turns a tree back
+# into expression source with the minimal parentheses, so a derivative can be
+# shown, stored or compiled like any other expression.
+#
+# --- Solving and Integrating ---
+# An Equation compiles an expression f(x, params...) and its derivative once
+# as formula.Formula objects; the solvers then only call the compiled forms:
+#   newton(x0)     - Newton's method with the symbolic derivative
+#   bisect(a, b)   - bisection on a sign change
+#   brent(a, b)    - Brent's method (bisection, secant and inverse quadratic
+#                    interpolation), usually much faster than bisection
+#   integrate(a, b, n) - composite Simpson rule over n intervals
+# "Root" means f(x) = 0. If any starting value or parameter is a NumPy array,
+# newton() and bisect() solve all the equations at once: every iteration is
+# one vectorized pass, elements that fail or do not converge become NaN.
+# brent() solves them one after another (each still without parsing), and
+# integrate() evaluates its whole grid in one vectorized pass when NumPy is
+# installed (falling back to the scalar loop if a point fails, so errors are
+# raised the same way with and without NumPy).
+#
+# Usage:
+#   derivative("sin(x) * x ** 2")                      -> "cos(x) * x ** 2 + sin(x) * (2 * x)"
+#   Equation("x ** 2 - a", params=["a"]).newton(1.0, a=2.0)   -> 1.414213562...
+#   Equation("x ** 2 - a", params=["a"]).newton(1.0, a=np.arange(1, 100001))
+#   Equation("sin(x)").integrate(0, pi)                -> 2.0
+
+import math
+
+import calculator as calc_logic
+import expression as expr_engine
+from formula import Formula
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+NUM, NAME, NEG, POS, BINOP, CALL = (
+    expr_engine.NUM, expr_engine.NAME, expr_engine.NEG, expr_engine.POS,
+    expr_engine.BINOP, expr_engine.CALL)
+
+ZERO = (NUM, 0)
+ONE = (NUM, 1)
+
+DEFAULT_TOLERANCE = 1e-12
+DEFAULT_MAX_ITERATIONS = 100
+DEFAULT_INTERVALS = 1000
+
+_EPSILON = 2.220446049250313e-16 # float machine epsilon
+
+
+class ConvergenceError(ArithmeticError):
+    """Raised when a solver does not reach the requested tolerance."""
+
+
+# --- Tree Construction ---
+# Each helper drops the terms that are known to vanish.
+
+def _add(a, b):
+    if a == ZERO:
+        return b
+    if b == ZERO:
+        return a
+    return (BINOP, '+', a, b)
+
+def _subtract(a, b):
+    if b == ZERO:
+        return a
+    if a == ZERO:
+        return _negate(b)
+    return (BINOP, '-', a, b)
+
+def _multiply(a, b):
+    if a == ZERO or b == ZERO:
+        return ZERO
+    if a == ONE:
+        return b
+    if b == ONE:
+        return a
+    return (BINOP, '*', a, b)
+
+def _divide(a, b):
+    if a == ZERO:
+        return ZERO
+    if b == ONE:
+        return a
+    return (BINOP, '/', a, b)
+
+def _power(a, b):
+    if b == ZERO:
+        return ONE
+    if b == ONE:
+        return a
+    return (BINOP, '**', a, b)
+
+def _negate(a):
+    if a == ZERO:
+        return ZERO
+    if a[0] == NEG:
+        return a[1]
+    return (NEG, a)
+
+def _depends_on(node, variable):
+    return variable in expr_engine.free_names(node)
+
+
+# --- Differentiation ---
+
+def _function_names(context):
+    """Maps each calculator function to the (first) name it has in the context."""
+    names = {}
+    for name, value in context.items():
+        if callable(value) and value not in names:
+            names[value] = name
+    return names
+
+def _call(names, func, arg):
+    try:
+        return (CALL, names[func], (arg,))
+    except KeyError:
+        raise ValueError(f"The context has no name for {func.__name__}, "
+                         "which the derivative needs") from None
+
+# Outer derivatives f'(u) of the calculator functions (the caller multiplies by du).
+def _d_sqrt(u, names):
+    return _divide(ONE, _multiply((NUM, 2), _call(names, calc_logic.square_root, u)))
+
+def _d_log(u, names):
+    return _divide(ONE, u)
+
+def _d_log10(u, names):
+    return _divide(ONE, _multiply(u, (NUM, math.log(10))))
+
+def _d_sin(u, names):
+    return _call(names, calc_logic.cosine, u)
+
+def _d_cos(u, names):
+    return _negate(_call(names, calc_logic.sine, u))
+
+def _d_tan(u, names):
+    cos = _call(names, calc_logic.cosine, u)
+    return _divide(ONE, _multiply(cos, cos))
+
+DERIVATIVES = {
+    calc_logic.square_root: _d_sqrt,
+    calc_logic.log_natural: _d_log,
+    calc_logic.log_base10: _d_log10,
+    calc_logic.sine: _d_sin,
+    calc_logic.cosine: _d_cos,
+    calc_logic.tangent: _d_tan,
+}
+
+def derivative_tree(tree, variable, context=None):
+    """Returns the parsed tree of d(tree)/d(variable)."""
+    context = expr_engine.default_context() if context is None else context
+    names = _function_names(context)
+
+    def d(node):
+        kind = node[0]
+        if kind == NUM:
+            return ZERO
+        if kind == NAME:
+            return ONE if node[1] == variable else ZERO
+        if kind == NEG:
+            return _negate(d(node[1]))
+        if kind == POS:
+            return d(node[1])
+        if kind == BINOP:
+            op, u, v = node[1], node[2], node[3]
+            if op == '+':
+                return _add(d(u), d(v))
+            if op == '-':
+                return _subtract(d(u), d(v))
+            if op == '*':
+                return _add(_multiply(d(u), v), _multiply(u, d(v)))
+            if op == '/':
+                return _divide(_subtract(_multiply(d(u), v), _multiply(u, d(v))), _multiply(v, v))
+            if op == '**':
+                return d_power(u, v)
+        if kind == CALL and len(node[2]) == 1:
+            rule = DERIVATIVES.get(context.get(node[1]))
+            if rule is not None:
+                u = node[2][0]
+                return _multiply(rule(u, names), d(u))
+            if not _depends_on(node, variable):
+                return ZERO
+        if kind == CALL:
+            if not _depends_on(node, variable):
+                return ZERO
+            raise ValueError(f"Cannot differentiate {node[1]}()")
+        raise ValueError(f"Cannot differentiate a {kind!r} node")
+
+    def d_power(u, v):
+        if not _depends_on(v, variable):
+            # u ** n -> n * u ** (n - 1) * du
+            exponent = (NUM, v[1] - 1) if v[0] == NUM else (BINOP, '-', v, ONE)
+            return _multiply(_multiply(v, _power(u, exponent)), d(u))
+        log = calc_logic.log_natural
+        if not _depends_on(u, variable):
+            # a ** v -> a ** v * log(a) * dv
+            return _multiply(_multiply((BINOP, '**', u, v), _call(names, log, u)), d(v))
+        # u ** v -> u ** v * (dv * log(u) + v * du / u)
+        inner = _add(_multiply(d(v), _call(names, log, u)), _divide(_multiply(v, d(u)), u))
+        return _multiply((BINOP, '**', u, v), inner)
+
+    return d(tree)
+
+
+# --- Source Formatting ---
+
+_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '**': 4}
+_UNARY = 3
+_ATOM = 5
+
+def format_tree(tree):
+    """Returns expression source for a parsed tree (parentheses only where needed)."""
+    return _format(tree)[0]
+
+def _wrap(part, minimum):
+    text, precedence = part
+    return text if precedence >= minimum else f"({text})"
+
+def _format(node):
+    """Returns (text, precedence) of a node."""
+    kind = node[0]
+    if kind == NUM:
+        value = node[1]
+        if isinstance(value, float) and not math.isfinite(value):
+            raise ValueError(f"{value} cannot be written as a number literal")
+        text = repr(value)
+        return text, (_UNARY if text.startswith('-') else _ATOM)
+    if kind == NAME:
+        return node[1], _ATOM
+    if kind in (NEG, POS):
+        sign = '-' if kind == NEG else '+'
+        return sign + _wrap(_format(node[1]), _UNARY), _UNARY
+    if kind == BINOP:
+        op = node[1]
+        precedence = _PRECEDENCE[op]
+        left, right = _format(node[2]), _format(node[3])
+        if op == '**': # Right associative; the exponent may carry a unary sign
+            return f"{_wrap(left, _ATOM)} ** {_wrap(right, _UNARY)}", precedence
+        return f"{_wrap(left, precedence)} {op} {_wrap(right, precedence + 1)}", precedence
+    if kind == CALL:
+        return f"{node[1]}({', '.join(format_tree(arg) for arg in node[2])})", _ATOM
+    raise ValueError(f"Cannot format a {kind!r} node")
+
+def derivative(source, variable='x', context=None):
+    """Returns the source of d(source)/d(variable)."""
+    tree = expr_engine.compile_expression(source).tree
+    return format_tree(derivative_tree(tree, variable, context))
+
+
+# --- Equations ---
+
+def _is_array(value):
+    return np is not None and isinstance(value, np.ndarray)
+
+
+class Equation:
+    """f(variable, *params) = 0, compiled once together with its derivative."""
+
+    def __init__(self, source, variable='x', params=(), context=None):
+        self.source = source
+        self.variable = variable
+        self.params = tuple(params)
+        self.context = expr_engine.default_context() if context is None else context
+        self.function = Formula(source, (variable,) + self.params, self.context)
+        self._derivative = None
+
+    def __repr__(self):
+        return f"Equation({self.source!r}, {self.variable!r}, {list(self.params)!r})"
+
+    @property
+    def derivative(self):
+        """The derivative with respect to the variable, as a Formula (built on first use)."""
+        if self._derivative is None:
+            source = derivative(self.source, self.variable, self.context)
+            self._derivative = Formula(source, (self.variable,) + self.params, self.context)
+        return self._derivative
+
+    def _bound(self, formula, values):
+        """Returns f(x) with the parameters fixed, calling the compiled function directly."""
+        func, ns, variable = formula._func, formula._ns, self.variable
+        ns.update(zip(self.params, values))
+        def evaluate(x):
+            ns[variable] = x
+            return func(ns)
+        return evaluate
+
+    def _param_values(self, params):
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise TypeError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+        missing = [name for name in self.params if name not in params]
+        if missing:
+            raise TypeError(f"Missing values for parameters: {', '.join(missing)}")
+        return [params[name] for name in self.params]
+
+    # --- Scalar Solvers ---
+
+    def newton(self, x0, /, tol=DEFAULT_TOLERANCE, max_iter=DEFAULT_MAX_ITERATIONS, **params):
+        """Finds a root near x0 with Newton's method."""
+        values = self._param_values(params)
+        if _is_array(x0) or any(map(_is_array, values)):
+            return self._newton_vectorized(x0, values, tol, max_iter)
+        f, df = self._bound(self.function, values), self._bound(self.derivative, values)
+        x = x0
+        for _ in range(max_iter):
+            fx = f(x)
+            if fx == 0:
+                return x
+            slope = df(x)
+            if slope == 0:
+                raise ConvergenceError(f"Derivative is zero at {self.variable} = {x!r}")
+            step = fx / slope
+            x -= step
+            if abs(step) <= tol * (1 + abs(x)):
+                return x
+        raise ConvergenceError(f"Newton's method did not converge in {max_iter} iterations")
+
+    def bisect(self, a, b, /, tol=DEFAULT_TOLERANCE, max_iter=DEFAULT_MAX_ITERATIONS, **params):
+        """Finds a root in [a, b], where f(a) and f(b) have opposite signs."""
+        values = self._param_values(params)
+        if _is_array(a) or _is_array(b) or any(map(_is_array, values)):
+            return self._bisect_vectorized(a, b, values, tol, max_iter)
+        f = self._bound(self.function, values)
+        fa, fb = f(a), f(b)
+        if fa == 0:
+            return a
+        if fb == 0:
+            return b
+        if (fa < 0) == (fb < 0):
+            raise ValueError("f(a) and f(b) must have opposite signs")
+        for _ in range(max_iter):
+            m = (a + b) / 2
+            fm = f(m)
+            if fm == 0 or abs(b - a) / 2 <= tol * (1 + abs(m)):
+                return m
+            if (fm < 0) == (fa < 0):
+                a, fa = m, fm
+            else:
+                b = m
+        raise ConvergenceError(f"Bisection did not converge in {max_iter} iterations")
+
+    def brent(self, a, b, /, tol=DEFAULT_TOLERANCE, max_iter=DEFAULT_MAX_ITERATIONS, **params):
+        """Finds a root in [a, b] with Brent's method (f(a) and f(b) must have opposite signs)."""
+        values = self._param_values(params)
+        if _is_array(a) or _is_array(b) or any(map(_is_array, values)):
+            columns = np.broadcast_arrays(np.asarray(a, dtype=np.float64),
+                                          np.asarray(b, dtype=np.float64),
+                                          *[np.asarray(v, dtype=np.float64) for v in values])
+            roots = np.empty(columns[0].shape)
+            for index in np.ndindex(roots.shape):
+                row = [float(column[index]) for column in columns]
+                try:
+                    roots[index] = self._brent(row[0], row[1], row[2:], tol, max_iter)
+                except (ArithmeticError, ValueError, TypeError):
+                    roots[index] = np.nan
+            return roots
+        return self._brent(a, b, values, tol, max_iter)
+
+    def _brent(self, a, b, values, tol, max_iter):
+        f = self._bound(self.function, values)
+        fa, fb = f(a), f(b)
+        if fa == 0:
+            return a
+        if fb == 0:
+            return b
+        if (fa < 0) == (fb < 0):
+            raise ValueError("f(a) and f(b) must have opposite signs")
+        c, fc = a, fa
+        d = e = b - a
+        for _ in range(max_iter):
+            if (fb < 0) == (fc < 0): # Keep the root between b and c
+                c, fc = a, fa
+                d = e = b - a
+            if abs(fc) < abs(fb):
+                a, b, c = b, c, b
+                fa, fb, fc = fb, fc, fb
+            tol1 = 2 * _EPSILON * abs(b) + 0.5 * tol
+            m = 0.5 * (c - b)
+            if abs(m) <= tol1 or fb == 0:
+                return b
+            if abs(e) >= tol1 and abs(fa) > abs(fb):
+                s = fb / fa
+                if a == c: # Secant step
+                    p, q = 2 * m * s, 1 - s
+                else: # Inverse quadratic interpolation
+                    q, r = fa / fc, fb / fc
+                    p = s * (2 * m * q * (q - r) - (b - a) * (r - 1))
+                    q = (q - 1) * (r - 1) * (s - 1)
+                if p > 0:
+                    q = -q
+                else:
+                    p = -p
+                if 2 * p < min(3 * m * q - abs(tol1 * q), abs(e * q)):
+                    e, d = d, p / q
+                else: # Interpolation is not good enough: bisect
+                    d = e = m
+            else:
+                d = e = m
+            a, fa = b, fb
+            b += d if abs(d) > tol1 else math.copysign(tol1, m)
+            fb = f(b)
+        raise ConvergenceError(f"Brent's method did not converge in {max_iter} iterations")
+
+    # --- Vectorized Solvers ---
+
+    def _columns(self, values, *starts):
+        arrays = np.broadcast_arrays(*[np.asarray(v, dtype=np.float64) for v in starts + tuple(values)])
+        arrays = [np.array(array, dtype=np.float64).ravel() for array in arrays]
+        return arrays[:len(starts)], arrays[len(starts):]
+
+    def _newton_vectorized(self, x0, values, tol, max_iter):
+        (x,), columns = self._columns(values, x0)
+        f, df = self.function, self.derivative
+        done = np.zeros(x.shape, dtype=bool)
+        with np.errstate(all='ignore'):
+            for _ in range(max_iter):
+                fx = f.evaluate_columns(x, *columns, errors='nan')
+                step = fx / df.evaluate_columns(x, *columns, errors='nan')
+                step[done | (fx == 0)] = 0
+                x -= step
+                done |= np.abs(step) <= tol * (1 + np.abs(x))
+                if done.all():
+                    break
+        x[~done | ~np.isfinite(x)] = np.nan
+        return x
+
+    def _bisect_vectorized(self, a, b, values, tol, max_iter):
+        (a, b), columns = self._columns(values, a, b)
+        f = self.function
+        fa = f.evaluate_columns(a, *columns, errors='nan')
+        fb = f.evaluate_columns(b, *columns, errors='nan')
+        valid = ((fa < 0) != (fb < 0)) | (fa == 0) | (fb == 0)
+        failed = ~np.isfinite(fa) | ~np.isfinite(fb)
+        # Endpoints that are roots are answered up front, like the scalar
+        # path; so are midpoints that hit a root exactly.
+        found = (fa == 0) | (fb == 0)
+        roots = np.where(fa == 0, a, b)
+        m = (a + b) / 2
+        for _ in range(max_iter):
+            m = (a + b) / 2
+            if np.all(found | (np.abs(b - a) / 2 <= tol * (1 + np.abs(m)))):
+                break
+            fm = f.evaluate_columns(m, *columns, errors='nan')
+            failed |= ~found & ~np.isfinite(fm)
+            exact = ~found & (fm == 0)
+            roots[exact] = m[exact]
+            found |= exact
+            left = (fm < 0) == (fa < 0)
+            a, fa = np.where(left, m, a), np.where(left, fm, fa)
+            b, fb = np.where(left, b, m), np.where(left, fb, fm)
+        m = np.where(found, roots, m)
+        m[~valid | failed] = np.nan
+        return m
+
+    # --- Integration ---
+
+    def integrate(self, a, b, /, n=DEFAULT_INTERVALS, **params):
+        """Integrates f from a to b with the composite Simpson rule over n intervals (rounded up to even).
+
+        Raises the calculator's error if f fails at a grid point, with or without NumPy.
+        """
+        values = self._param_values(params)
+        n += n % 2
+        h = (b - a) / n
+        if np is not None:
+            with np.errstate(all='ignore'):
+                ys = self.function.evaluate_columns(np.linspace(a, b, n + 1), *values, errors='nan')
+            # A NaN or infinity may hide a failed point; the scalar loop below
+            # then raises the same error as without NumPy.
+            if np.isfinite(ys).all():
+                return float(h / 3 * (ys[0] + ys[-1] + 4 * ys[1:-1:2].sum() + 2 * ys[2:-1:2].sum()))
+        f = self._bound(self.function, values)
+        total = f(a) + f(b)
+        for i in range(1, n):
+            total += (4 if i % 2 else 2) * f(a + i * h)
+        return h / 3 * total
@@ -0,0 +1,186 @@
+# This is the cli.py file.
+# It contains the headless batch evaluator (no Tk required).
+
+# --- Headless Batch Evaluation ---
+# Reads newline-delimited expressions from a file or stdin and writes one
+# result line per input line, using the same context and result formatting
+# as the GUI. Input is consumed lazily line by line, so memory use does not
+# depend on the size of the input file.
+#
+# Usage:
+#   python -m HesapMakinesi [INPUT] [-o OUTPUT] [--echo] [--fail-fast] [--workers N]
+#   echo "sqrt(16) + 2 pow 3" | python -m HesapMakinesi
+
+import argparse
+import contextlib
+import sys
+
+import expression as expr_engine
+from result_cache import ResultCache
+from guard import GuardedEvaluator, Limits
+import backends
+from instrument import InstrumentedEvaluator, Metrics, ProfileCapture
+from history import HistoryJournal
+
+
+def evaluate_line(line, context, cache=None, evaluator=None):
+    """Evaluates one input line and returns (result_str, error).
+
+    Blank lines give ("", None) so output lines stay aligned with input lines.
+    `cache` is an optional result_cache.ResultCache and `evaluator` an
+    optional guard.GuardedEvaluator or numeric backend (backends.py).
+    """
+    source = line.strip()
+    if not source:
+        return "", None
+    try:
+        if cache is not None:
+            result = cache.evaluate(source, context, evaluator)
+        elif evaluator is not None:
+            result = evaluator.evaluate(source, context)
+        else:
+            result = expr_engine.evaluate(source, context)
+        if evaluator is not None:
+            return evaluator.format_result(result), None
+        return expr_engine.format_result(result), None
+    except Exception as e:
+        return expr_engine.describe_error(e), e
+
+def evaluate_lines(lines, context=None, cache=None, evaluator=None):
+    """Lazily yields (line, result_str, error) for each line of an iterable."""
+    if context is None:
+        context = expr_engine.default_context()
+    for line in lines:
+        line = line.rstrip("\r\n")
+        result_str, error = evaluate_line(line, context, cache, evaluator)
+        yield line, result_str, error
+
+def run(lines, out, echo=False, fail_fast=False, line_buffered=False,
+        workers=None, chunk_size=None, cache_size=None, limits=None, backend=None,
+        metrics=None, history=None):
+    """Streams results for `lines` into the text stream `out`. Returns the error count.
+
+    With `workers` set, lines are evaluated by a process pool (see parallel.py)
+    and results are still written in input order. With `cache_size` set,
+    repeated expressions are answered from a ResultCache (one per process).
+    With `limits` (a guard.Limits) every evaluation is resource-limited.
+    `backend` is a (name, precision) pair selecting a numeric backend.
+    With `metrics` (an instrument.Metrics) stage timings, function calls and
+    errors are recorded; this is not supported together with `workers`.
+    With `history` (a history.HistoryJournal) every non-blank line and its
+    result are appended to the journal.
+    """
+    if workers:
+        import parallel # Imported lazily: parallel imports this module
+        results = ((line.rstrip("\r\n"), result_str, error) for _, line, result_str, error
+                   in parallel.evaluate_parallel(
+                       lines, workers=workers,
+                       chunk_size=chunk_size or parallel.DEFAULT_CHUNK_SIZE,
+                       cache_size=cache_size, limits=limits, backend=backend))
+    else:
+        cache = ResultCache(cache_size) if cache_size else None
+        if backend is not None:
+            evaluator = backends.get_backend(*backend)
+        elif limits is not None:
+            evaluator = GuardedEvaluator(limits)
+        else:
+            evaluator = None
+        if metrics is not None:
+            evaluator = InstrumentedEvaluator(evaluator, metrics)
+        results = evaluate_lines(lines, cache=cache, evaluator=evaluator)
+    errors = 0
+    for line, result_str, error in results:
+        if echo and line.strip():
+            out.write(f"{line.strip()} = {result_str}\n")
+        else:
+            out.write(result_str + "\n")
+        if line_buffered:
+            out.flush()
+        if history is not None and line.strip():
+            if error is None:
+                history.append(line.strip(), result_str)
+            else:
+                history.append(line.strip(), error=type(error).__name__)
+        if error is not None:
+            errors += 1
+            if fail_fast:
+                break
+    return errors
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m HesapMakinesi",
+        description="Evaluate newline-delimited calculator expressions without the GUI.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="file with one expression per line ('-' or omitted for stdin)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file to write results to ('-' or omitted for stdout)")
+    parser.add_argument("--echo", action="store_true",
+                        help="write 'expression = result' instead of only the result")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="stop at the first expression that fails")
+    parser.add_argument("--line-buffered", action="store_true",
+                        help="flush after every result (useful for interactive pipes)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="evaluate with this many worker processes")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="expressions per work item when --workers is used")
+    parser.add_argument("--cache-size", type=int, default=None,
+                        help="remember the results of up to this many distinct expressions")
+    parser.add_argument("--guarded", action="store_true",
+                        help="apply resource limits (size, depth, magnitude, exponent, time)")
+    parser.add_argument("--timeout", type=float, default=1.0,
+                        help="seconds allowed per expression with --guarded (default 1)")
+    parser.add_argument("--backend", choices=sorted(backends.BACKENDS), default="float",
+                        help="number type used for evaluation (default float)")
+    parser.add_argument("--precision", type=int, default=None,
+                        help="significant digits for --backend decimal (default 28)")
+    parser.add_argument("--stats", metavar="PATH", default=None,
+                        help="write evaluation metrics to PATH (Prometheus text for *.prom, else JSON)")
+    parser.add_argument("--profile", metavar="PATH", default=None,
+                        help="write a cProfile and tracemalloc report of the run to PATH")
+    parser.add_argument("--history", metavar="PATH", default=None,
+                        help="append every expression and its result to the history journal PATH")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.guarded and args.backend != "float":
+        parser.error("--guarded only applies to the float backend")
+    if args.precision is not None and args.backend != "decimal":
+        parser.error("--precision only applies to the decimal backend")
+    if args.workers and (args.stats or args.profile):
+        parser.error("--stats and --profile cannot be combined with --workers")
+    metrics = Metrics() if args.stats else None
+    capture = ProfileCapture(cpu=True, memory=True) if args.profile else None
+    backend = None if args.backend == "float" else (args.backend, args.precision)
+    in_stream = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    out_stream = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    history = HistoryJournal(args.history, batch_size=1024) if args.history else None
+    try:
+        with capture if capture is not None else contextlib.nullcontext():
+            errors = run(in_stream, out_stream, echo=args.echo, fail_fast=args.fail_fast,
+                         line_buffered=args.line_buffered, workers=args.workers,
+                         chunk_size=args.chunk_size, cache_size=args.cache_size,
+                         limits=Limits(timeout=args.timeout) if args.guarded else None,
+                         backend=backend, metrics=metrics, history=history)
+    finally:
+        if history is not None:
+            history.close()
+        if in_stream is not sys.stdin:
+            in_stream.close()
+        if out_stream is not sys.stdout:
+            out_stream.close()
+        else:
+            out_stream.flush()
+    if capture is not None:
+        with open(args.profile, "w", encoding="utf-8") as f:
+            f.write(capture.report())
+    if metrics is not None:
+        metrics.write(args.stats)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# This is the columns.py file.
+# It contains memory-mapped binary column input/output for batch evaluation.
+
+# --- Binary Columns ---
+# A column is either a NumPy .npy file or a raw file of native-endian values
+# whose type comes from the extension: .f64 (float64, also the default for
+# other extensions) or .i64 (int64). Columns are memory-mapped, never read
+# into Python objects: evaluate_mapped() runs a formula over slices of the
+# input maps, CHUNK_SIZE rows at a time, and writes the results straight
+# into a preallocated memory-mapped output column, so inputs and outputs can
+# be larger than RAM. Rows where a calculator function rejects its input
+# (square root of a negative number, division by zero, log of a
+# non-positive number, tangent at a pole, ...) get NaN, and their bit is set
+# in an optional error bitmask: bit i % 8 of byte i // 8 for row i, i.e.
+# numpy.packbits(failed, bitorder='little'). read_error_mask() unpacks it.
+# Aggregate functions (mean, sum, ...) would only see one chunk at a time,
+# so formulas using them are rejected; aggregate.py streams whole columns.
+# Requires NumPy, like vector.py.
+#
+# Usage:
+#   failed = evaluate_mapped("sqrt(x * x + y * y)", {"x": "x.f64", "y": "y.npy"},
+#                            "r.npy", error_mask="r.errors")
+#   python HesapMakinesi/columns.py "sqrt(x * x + y * y)" x=x.f64 y=y.npy -o r.npy --errors r.errors
+
+import argparse
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+import aggregate
+from formula import Formula
+from vector import MaskedEvaluator
+
+CHUNK_SIZE = 1 << 18 # Rows per chunk; a multiple of 8 so chunks fill whole mask bytes
+
+RAW_DTYPES = {
+    '.f64': 'float64',
+    '.i64': 'int64',
+}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("The columns module requires NumPy (pip install numpy)")
+
+def _is_npy(path):
+    return os.path.splitext(path)[1].lower() == '.npy'
+
+def open_column(path, dtype=None):
+    """Memory-maps a .npy or raw column file for reading (dtype overrides the extension)."""
+    _require_numpy()
+    if _is_npy(path):
+        column = np.load(path, mmap_mode='r')
+    else:
+        dtype = np.dtype(dtype or RAW_DTYPES.get(os.path.splitext(path)[1].lower(), 'float64'))
+        if os.path.getsize(path) % dtype.itemsize:
+            raise ValueError(f"{path} is not a whole number of {dtype} values")
+        if not os.path.getsize(path):
+            return np.empty(0, dtype=dtype) # mmap cannot map an empty file
+        column = np.memmap(path, dtype=dtype, mode='r')
+    if column.ndim != 1 or column.dtype.kind not in 'iuf':
+        raise ValueError(f"{path} is not a column of numbers ({column.dtype}, shape {column.shape})")
+    return column
+
+def create_column(path, length, dtype='float64'):
+    """Creates a column file of `length` values and returns it memory-mapped for writing."""
+    _require_numpy()
+    if _is_npy(path):
+        return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(length,))
+    if not length:
+        open(path, 'wb').close()
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='w+', shape=(length,))
+
+def read_error_mask(source, length):
+    """Returns the boolean failed-row column of an error bitmask (a path or a uint8 array)."""
+    _require_numpy()
+    packed = open_column(source, 'uint8') if isinstance(source, str) else source
+    return np.unpackbits(packed, count=length, bitorder='little').astype(bool)
+
+
+# --- Batch Evaluation ---
+
+def _open_input(column):
+    if isinstance(column, str):
+        return open_column(column)
+    return np.asarray(column)
+
+def _open_output(target, length, dtype):
+    if isinstance(target, str):
+        return create_column(target, length, dtype)
+    if np.shape(target) != (length,):
+        raise ValueError(f"Output needs shape {(length,)}, got {np.shape(target)}")
+    return target
+
+def evaluate_mapped(formula, inputs, output, error_mask=None, chunk_size=CHUNK_SIZE):
+    """Evaluates a formula over column files and writes one result per row.
+
+    `formula` is a Formula or a source string (its parameters are then the
+    names of `inputs`). `inputs` maps parameter names to column paths or
+    arrays; `output` and `error_mask` are paths of files to create or
+    preallocated arrays (float64 and uint8 of (rows + 7) // 8 bytes).
+    Returns the number of rows that failed.
+    """
+    _require_numpy()
+    if chunk_size <= 0 or chunk_size % 8:
+        raise ValueError(f"chunk_size must be a positive multiple of 8, got {chunk_size}")
+    if not isinstance(formula, Formula):
+        formula = Formula(formula, list(inputs))
+    whole_column = sorted(name for name in formula.compiled.names
+                          if formula.context.get(name) in aggregate.EXPRESSION_FUNCTIONS.values())
+    if whole_column:
+        raise ValueError(f"{', '.join(whole_column)} would only see one chunk of the columns; "
+                         "use aggregate.py for whole-column statistics")
+    missing = set(formula.params) - set(inputs)
+    if missing:
+        raise KeyError(f"No input column for {', '.join(sorted(missing))}")
+    columns = {name: _open_input(inputs[name]) for name in formula.params}
+    lengths = {column.shape[0] for column in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Input columns have different lengths: {sorted(lengths)}")
+    length = lengths.pop() if lengths else 1
+    results = _open_output(output, length, 'float64')
+    mask = None if error_mask is None else _open_output(error_mask, (length + 7) // 8, 'uint8')
+    evaluator = MaskedEvaluator(formula.compiled.tree, formula.context)
+    failed = 0
+    for start in range(0, length, chunk_size):
+        stop = min(start + chunk_size, length)
+        chunk = {name: column[start:stop] for name, column in columns.items()}
+        values, invalid = evaluator.evaluate(chunk, stop - start)
+        results[start:stop] = values
+        failed += int(np.count_nonzero(invalid))
+        if mask is not None:
+            mask[start // 8:(stop + 7) // 8] = np.packbits(invalid, bitorder='little')
+    for target in (results, mask):
+        if isinstance(target, np.memmap):
+            target.flush()
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a formula over memory-mapped binary columns.")
+    parser.add_argument("formula", help="expression over the input column names")
+    parser.add_argument("inputs", nargs="+", metavar="NAME=PATH",
+                        help="input column (.npy, .f64 or .i64 file) for each name of the formula")
+    parser.add_argument("-o", "--output", required=True, help="result column to create (.npy or raw float64)")
+    parser.add_argument("--errors", help="error bitmask to create (bit set for each failed row)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per chunk (multiple of 8)")
+    args = parser.parse_args(argv)
+    inputs = {}
+    for item in args.inputs:
+        name, separator, path = item.partition('=')
+        if not separator or not name:
+            parser.error(f"Inputs must look like NAME=PATH, got {item!r}")
+        inputs[name] = path
+    try:
+        failed = evaluate_mapped(args.formula, inputs, args.output, args.errors, args.chunk_size)
+    except (OSError, ImportError, KeyError, NameError, SyntaxError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{failed} failed rows", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+# This is the expression.py file.
+# It contains the expression engine used to evaluate calculator input.
+
+# --- Expression Engine ---
+# Expressions are tokenized and parsed once into a small tree of tuples and
+# then compiled into nested closures. Compiled expressions are cached by
+# their normalized source string, so evaluating the same formula again only
+# runs the closures against the given context. Arithmetic is delegated to the
+# functions in calculator.py so the error semantics stay the same.
+
+import math
+import re
+from functools import lru_cache
+
+import aggregate
+import calculator as calc_logic
+
+# Node kinds of the parsed expression tree.
+NUM = 'num'        # ('num', value)
+NAME = 'name'      # ('name', identifier)
+NEG = 'neg'        # ('neg', operand)
+POS = 'pos'        # ('pos', operand)
+BINOP = 'binop'    # ('binop', operator, left, right)
+CALL = 'call'      # ('call', function_name, (arg, ...))
+ERROR = 'error'    # ('error', exception_type, args): raises when evaluated (see optimize.py)
+
+# Binary operators and the calculator.py functions that implement them.
+BINARY_FUNCTIONS = {
+    '+': calc_logic.add,
+    '-': calc_logic.subtract,
+    '*': calc_logic.multiply,
+    '/': calc_logic.divide,
+    '**': calc_logic.power,
+}
+
+CACHE_SIZE = 1024
+
+# Physical constants available in expressions (their units for dimensional
+# analysis are in units.CONSTANT_UNITS).
+SPEED_OF_LIGHT = 299792458  # m/s
+PLANCK_CONSTANT = 6.62607015e-34  # J*s
+GRAVITATIONAL_CONSTANT = 6.67430e-11  # N*m^2/kg^2
+
+_TOKEN_RE = re.compile(r"""
+    (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?[jJ]?)
+  | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+  | (?P<op>\*\*|[-+*/(),])
+  | (?P<space>\s+)
+""", re.VERBOSE)
+
+
+# --- Tokenizer ---
+
+def normalize(source):
+    """Returns the cache key for an expression: whitespace collapsed to single spaces."""
+    return " ".join(source.split())
+
+def iter_tokens(source, pos=0):
+    """Yields (kind, value, start, end) for every token of source from position pos on.
+
+    Kinds are 'num', 'name' and 'op'. The GUI's 'pow' operator is turned
+    into '**' here, so it never needs a string replace on the whole input.
+    Numbers ending in 'j' (e.g. "2j", the complex backend's display format)
+    are complex.
+    """
+    length = len(source)
+    while pos < length:
+        match = _TOKEN_RE.match(source, pos)
+        if match is None:
+            raise SyntaxError(f"Unexpected character {source[pos]!r} at position {pos}")
+        kind = match.lastgroup
+        text = match.group()
+        start, pos = pos, match.end()
+        if kind == 'space':
+            continue
+        if kind == 'num':
+            if text[-1] in 'jJ': # Imaginary literal; only the complex backend accepts it
+                yield 'num', complex(text), start, pos
+            elif '.' in text or 'e' in text or 'E' in text:
+                yield 'num', float(text), start, pos
+            else:
+                yield 'num', int(text), start, pos
+        elif kind == 'name' and text == 'pow':
+            yield 'op', '**', start, pos
+        else:
+            yield kind, text, start, pos
+
+def tokenize(source):
+    """Splits an expression into a list of (kind, value) tokens (see iter_tokens)."""
+    return [(kind, value) for kind, value, _, _ in iter_tokens(source)]
+
+
+# --- Parser ---
+
+class _Parser:
+    """Recursive descent parser following Python's precedence rules."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def accept_op(self, *ops):
+        kind, value = self.peek()
+        if kind == 'op' and value in ops:
+            self.pos += 1
+            return value
+        return None
+
+    def expect_op(self, op):
+        if self.accept_op(op) is None:
+            raise SyntaxError(f"Expected {op!r} but found {self._describe()}")
+
+    def _describe(self):
+        kind, value = self.peek()
+        return "end of expression" if kind is None else repr(str(value))
+
+    def parse(self):
+        if not self.tokens:
+            raise SyntaxError("Empty expression")
+        node = self.expr()
+        if self.pos != len(self.tokens):
+            raise SyntaxError(f"Unexpected token {self._describe()}")
+        return node
+
+    def expr(self):
+        node = self.term()
+        while True:
+            op = self.accept_op('+', '-')
+            if op is None:
+                return node
+            node = (BINOP, op, node, self.term())
+
+    def term(self):
+        node = self.unary()
+        while True:
+            op = self.accept_op('*', '/')
+            if op is None:
+                return node
+            node = (BINOP, op, node, self.unary())
+
+    def unary(self):
+        op = self.accept_op('+', '-')
+        if op == '-':
+            return (NEG, self.unary())
+        if op == '+':
+            return (POS, self.unary())
+        return self.power()
+
+    def power(self):
+        node = self.atom()
+        if self.accept_op('**') is not None:
+            # Right associative and binds tighter than a unary minus on its left.
+            node = (BINOP, '**', node, self.unary())
+        return node
+
+    def atom(self):
+        kind, value = self.peek()
+        if kind == 'num':
+            self.pos += 1
+            return (NUM, value)
+        if kind == 'name':
+            self.pos += 1
+            if self.accept_op('(') is not None:
+                args = []
+                if self.accept_op(')') is None:
+                    args.append(self.expr())
+                    while self.accept_op(',') is not None:
+                        args.append(self.expr())
+                    self.expect_op(')')
+                return (CALL, value, tuple(args))
+            return (NAME, value)
+        if self.accept_op('(') is not None:
+            node = self.expr()
+            self.expect_op(')')
+            return node
+        raise SyntaxError(f"Unexpected token {self._describe()}")
+
+def parse(source):
+    """Parses an expression string into a tree of tuples."""
+    return _Parser(tokenize(source)).parse()
+
+
+# --- Compiler ---
+
+def _compile_node(node, functions):
+    """Turns a tree node into a function taking the evaluation context."""
+    kind = node[0]
+    if kind == NUM:
+        value = node[1]
+        return lambda ns: value
+    if kind == NAME:
+        name = node[1]
+        def load(ns):
+            try:
+                return ns[name]
+            except KeyError:
+                raise NameError(f"name '{name}' is not defined") from None
+        return load
+    if kind == NEG:
+        operand = _compile_node(node[1], functions)
+        return lambda ns: -operand(ns)
+    if kind == POS:
+        operand = _compile_node(node[1], functions)
+        return lambda ns: +operand(ns)
+    if kind == BINOP:
+        func = functions[node[1]]
+        left = _compile_node(node[2], functions)
+        right = _compile_node(node[3], functions)
+        return lambda ns: func(left(ns), right(ns))
+    if kind == CALL:
+        load = _compile_node((NAME, node[1]), functions)
+        args = tuple(_compile_node(arg, functions) for arg in node[2])
+        if len(args) == 1:
+            arg = args[0]
+            return lambda ns: load(ns)(arg(ns))
+        return lambda ns: load(ns)(*[arg(ns) for arg in args])
+    if kind == ERROR:
+        exc_type, exc_args = node[1], node[2]
+        def fail(ns):
+            raise exc_type(*exc_args)
+        return fail
+    raise ValueError(f"Unknown node kind: {kind!r}")
+
+def compile_tree(tree, binary_functions=None):
+    """Compiles a parsed tree into a function of the evaluation context.
+
+    `binary_functions` replaces BINARY_FUNCTIONS, e.g. with checked or
+    alternative-number implementations of the operators.
+    """
+    return _compile_node(tree, BINARY_FUNCTIONS if binary_functions is None else binary_functions)
+
+def free_names(node):
+    """Returns the set of constant and function names a tree refers to."""
+    kind = node[0]
+    if kind == NAME:
+        return {node[1]}
+    if kind in (NEG, POS):
+        return free_names(node[1])
+    if kind == BINOP:
+        return free_names(node[2]) | free_names(node[3])
+    if kind == CALL:
+        names = {node[1]}
+        for arg in node[2]:
+            names |= free_names(arg)
+        return names
+    return set()
+
+class CompiledExpression:
+    """A parsed and compiled expression that can be evaluated many times."""
+
+    __slots__ = ('source', 'tree', 'names', '_func')
+
+    def __init__(self, source, tree):
+        self.source = source
+        self.tree = tree
+        self.names = frozenset(free_names(tree))
+        self._func = compile_tree(tree)
+
+    def evaluate(self, context):
+        """Evaluates the expression, resolving names in the context mapping."""
+        return self._func(context)
+
+    __call__ = evaluate
+
+    def __repr__(self):
+        return f"CompiledExpression({self.source!r})"
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_normalized(key):
+    return CompiledExpression(key, parse(key))
+
+def compile_expression(source):
+    """Returns the compiled form of an expression, reusing cached compilations."""
+    return _compile_normalized(normalize(source))
+
+def evaluate(source, context):
+    """Compiles (or fetches from cache) and evaluates an expression string."""
+    return compile_expression(source).evaluate(context)
+
+def clear_cache():
+    """Drops every cached compiled expression."""
+    _compile_normalized.cache_clear()
+
+def cache_info():
+    """Returns hit/miss statistics of the compile cache."""
+    return _compile_normalized.cache_info()
+
+
+# --- Evaluation Context and Formatting ---
+
+def default_context():
+    """Returns a new dict of the functions and constants the calculator understands."""
+    return {
+        # Custom functions from calc_logic
+        'sqrt': calc_logic.square_root,
+        'log': calc_logic.log_natural, # 'log' maps to natural log
+        'ln': calc_logic.log_natural,
+        'log10': calc_logic.log_base10,
+        'sin': calc_logic.sine,
+        'cos': calc_logic.cosine,
+        'tan': calc_logic.tangent,
+        # sum, mean, variance, stdev, min, max, product of any number of values
+        **aggregate.EXPRESSION_FUNCTIONS,
+        # Standard math and physical constants
+        'pi': math.pi,
+        'e': math.e,
+        'c_light': SPEED_OF_LIGHT,
+        'h_planck': PLANCK_CONSTANT,
+        'G_grav': GRAVITATIONAL_CONSTANT,
+    }
+
+def format_result(result):
+    """Formats a result the way the calculator display shows it."""
+    if isinstance(result, float) and result.is_integer():
+        return str(int(result))
+    return f"{result:.10g}"
+
+def describe_error(exc):
+    """Returns the short display message for an evaluation error."""
+    if isinstance(exc, ZeroDivisionError):
+        return "Error: Division by zero"
+    if isinstance(exc, (SyntaxError, NameError)):
+        return "Error: Invalid syntax"
+    if isinstance(exc, (ValueError, TypeError)):
+        return "Error: Math domain/type"
+    return "Error: Unknown"
@@ -0,0 +1,179 @@
+# This is the formula.py file.
+# It contains parameterized formulas that are compiled once and evaluated many times.
+
+# --- Formulas ---
+# A Formula is an expression with declared parameters, e.g.
+#     hyp = Formula("sqrt(x*x + y*y)", ["x", "y"])
+#     hyp(3, 4)                          -> 5.0
+#     hyp.map([3, 5], [4, 12])           -> [5.0, 13.0]
+#     hyp.evaluate_rows([{"x": 3, "y": 4}])
+#     hyp.evaluate_columns(x=xs, y=ys)   -> one vectorized pass for NumPy arrays
+#     hyp.evaluate_csv("points.csv")     -> lazily, one result per CSV row
+# The expression is parsed and compiled when the Formula is created; binding
+# values only updates the namespace the compiled form reads from, so no
+# strings are built or parsed per row. Names that are neither parameters nor
+# in the context raise NameError at definition time. A Formula is callable,
+# so it can be put into a context and used by name in other expressions.
+# Constant subtrees (including constants from the context) are folded ahead
+# of time by optimize.py unless optimize=False is given.
+# A Formula reuses one namespace dict, so it should not be shared between
+# threads.
+
+import csv
+
+import expression as expr_engine
+from optimize import OptimizedExpression
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+ERROR_POLICIES = ('raise', 'nan')
+
+
+class Formula:
+    """An expression with named parameters, compiled once."""
+
+    def __init__(self, source, params=(), context=None, optimize=True):
+        self.source = source
+        self.params = tuple(params)
+        if len(set(self.params)) != len(self.params):
+            raise ValueError(f"Duplicate parameter names in {self.params}")
+        self.context = expr_engine.default_context() if context is None else context
+        self.compiled = expr_engine.compile_expression(source)
+        unknown = self.compiled.names - set(self.params) - set(self.context)
+        if unknown:
+            raise NameError(f"Unknown names in formula: {', '.join(sorted(unknown))}")
+        if optimize:
+            # The namespace below is a snapshot of the context, so every
+            # context name except the parameters can be folded.
+            constants = {name: value for name, value in self.context.items()
+                         if name not in self.params}
+            self._func = OptimizedExpression(source, constants).function
+        else:
+            self._func = self.compiled.evaluate
+        self._ns = dict(self.context)
+        self._vector_func = None
+        self._masked = None
+
+    def __repr__(self):
+        return f"Formula({self.source!r}, {list(self.params)!r})"
+
+    def _bind(self, args, kwargs):
+        if len(args) > len(self.params):
+            raise TypeError(f"Formula takes {len(self.params)} arguments but {len(args)} were given")
+        ns = self._ns
+        for name, value in zip(self.params, args):
+            ns[name] = value
+        for name, value in kwargs.items():
+            if name not in self.params:
+                raise TypeError(f"Unknown parameter {name!r}")
+            ns[name] = value
+        missing = [name for name in self.params[len(args):] if name not in kwargs]
+        if missing:
+            raise TypeError(f"Missing values for parameters: {', '.join(missing)}")
+        return ns
+
+    def __call__(self, *args, **kwargs):
+        """Evaluates the formula for scalar parameter values."""
+        return self._func(self._bind(args, kwargs))
+
+    def map(self, *columns, errors='raise'):
+        """Lazily evaluates the formula for each row of parallel columns (one per parameter)."""
+        if len(columns) != len(self.params):
+            raise TypeError(f"Expected {len(self.params)} columns, got {len(columns)}")
+        return self._evaluate_each(zip(*columns), errors)
+
+    def evaluate_rows(self, rows, errors='raise'):
+        """Evaluates the formula for rows given as mappings or as sequences in parameter order."""
+        params = self.params
+        rows = ([row[name] for name in params] if hasattr(row, 'keys') else row for row in rows)
+        return list(self._evaluate_each(rows, errors))
+
+    def evaluate_columns(self, *columns, errors='raise', **named_columns):
+        """Evaluates the formula over whole columns.
+
+        Columns are given positionally (in parameter order) or by parameter
+        name. If NumPy is installed and any column is an array, the formula
+        is evaluated in one vectorized pass; otherwise a list is returned.
+        Either way errors='raise' raises the error of the first failing row
+        and errors='nan' turns failing rows into NaN.
+        """
+        _check_policy(errors)
+        if named_columns:
+            columns = columns + tuple(named_columns[name] for name in self.params[len(columns):])
+        if np is not None and any(isinstance(c, np.ndarray) for c in columns):
+            return self._evaluate_vectorized(columns, errors)
+        return list(self.map(*columns, errors=errors))
+
+    def _evaluate_vectorized(self, columns, errors):
+        import vector
+        arrays = {name: np.asarray(column, dtype=np.float64) for name, column in zip(self.params, columns)}
+        size = max(np.size(c) for c in columns) if columns else 1
+        if errors == 'raise':
+            if self._masked is None:
+                self._masked = vector.MaskedEvaluator(self.compiled.tree, self.context)
+            result, invalid = self._masked.evaluate(arrays, size)
+            if invalid.any():
+                self._raise_row(arrays, size, int(np.argmax(invalid)))
+            return result.copy()
+        if self._vector_func is None:
+            self._vector_func = vector.compile_tree(self.compiled.tree)
+            self._vector_ns = vector.namespace(self.context)
+        ns = self._vector_ns
+        ns.update(arrays)
+        result = self._vector_func(ns)
+        return np.broadcast_to(np.asarray(result, dtype=np.float64), (size,)).copy()
+
+    def _raise_row(self, arrays, size, row):
+        """Evaluates one failed row with the scalar form, which raises the calculator's error."""
+        values = {name: float(np.broadcast_to(array, (size,))[row]) for name, array in arrays.items()}
+        self(**values)
+        raise ValueError(f"Formula {self.source!r} failed for row {row}")
+
+    def evaluate_csv(self, source, columns=None, errors='nan', delimiter=','):
+        """Lazily evaluates the formula for every row of a CSV file with a header row.
+
+        `source` is a path or an open text file. `columns` maps parameter names
+        to CSV column names (default: the same names).
+        """
+        columns = columns or {}
+        names = [columns.get(param, param) for param in self.params]
+        if isinstance(source, str):
+            with open(source, newline='', encoding='utf-8') as f:
+                yield from self._evaluate_csv_file(f, names, errors, delimiter)
+        else:
+            yield from self._evaluate_csv_file(source, names, errors, delimiter)
+
+    def _evaluate_csv_file(self, f, names, errors, delimiter):
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, [])
+        try:
+            indexes = [header.index(name) for name in names]
+        except ValueError:
+            raise KeyError(f"CSV header {header} lacks one of the columns {names}") from None
+        rows = ([float(row[i]) for i in indexes] for row in reader if row)
+        yield from self._evaluate_each(rows, errors)
+
+    def _evaluate_each(self, rows, errors):
+        """Yields one result per row of parameter values; errors='nan' turns failures into NaN."""
+        _check_policy(errors)
+        func = self._func
+        ns = self._ns
+        params = self.params
+        for row in rows:
+            for name, value in zip(params, row):
+                ns[name] = value
+            if errors == 'raise':
+                yield func(ns)
+                continue
+            try:
+                yield func(ns)
+            except (ArithmeticError, ValueError, TypeError):
+                yield float('nan')
+
+
+def _check_policy(errors):
+    if errors not in ERROR_POLICIES:
+        raise ValueError(f"errors must be one of {ERROR_POLICIES}, got {errors!r}")
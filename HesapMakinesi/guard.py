@@ -0,0 +1,213 @@
+# This is the guard.py file.
+# It contains guarded evaluation with resource limits.
+
+# --- Guarded Evaluation ---
+# GuardedEvaluator evaluates expressions under configurable Limits:
+#   max_length    - characters in the source string
+#   max_depth     - nesting depth of parentheses and of the parsed tree
+#   max_magnitude - absolute value of number literals and operator results
+#   max_exponent  - absolute value of the exponent given to pow / **
+#   timeout       - wall-clock seconds for one evaluation (None disables it)
+# Size and depth are checked once when an expression is compiled; magnitude,
+# exponent, the deadline and cancellation are checked by the operators of the
+# compiled form, so a pathological input fails with LimitExceeded instead of
+# pinning the CPU. submit() runs work on a background thread and returns a
+# GuardedTask that can be cancelled, which keeps long evaluations off the
+# Tk main loop.
+
+import sys
+import threading
+import time
+from functools import lru_cache
+
+import expression as expr_engine
+
+
+class LimitExceeded(ValueError):
+    """Raised when an expression exceeds one of the configured limits."""
+
+class EvaluationTimeout(LimitExceeded):
+    """Raised when an evaluation runs longer than the configured timeout."""
+
+class EvaluationCancelled(LimitExceeded):
+    """Raised inside an evaluation whose GuardedTask was cancelled."""
+
+
+class Limits:
+    """Resource limits applied by GuardedEvaluator."""
+
+    def __init__(self, max_length=10000, max_depth=200, max_magnitude=sys.float_info.max,
+                 max_exponent=10000, timeout=1.0):
+        self.max_length = max_length
+        self.max_depth = max_depth
+        self.max_magnitude = max_magnitude
+        self.max_exponent = max_exponent
+        self.timeout = timeout
+
+    def __repr__(self):
+        return (f"Limits(max_length={self.max_length}, max_depth={self.max_depth}, "
+                f"max_magnitude={self.max_magnitude}, max_exponent={self.max_exponent}, "
+                f"timeout={self.timeout})")
+
+
+# Deadline and cancel event of the evaluation running on the current thread.
+_state = threading.local()
+
+def _check_interrupt():
+    deadline = getattr(_state, 'deadline', None)
+    if deadline is not None and time.perf_counter() > deadline:
+        raise EvaluationTimeout("Evaluation took longer than the time limit")
+    cancel = getattr(_state, 'cancel', None)
+    if cancel is not None and cancel.is_set():
+        raise EvaluationCancelled("Evaluation was cancelled")
+
+def tree_depth(tree):
+    """Returns the depth of a parsed expression tree (iteratively, no recursion limit)."""
+    depth = 0
+    stack = [(tree, 1)]
+    while stack:
+        node, level = stack.pop()
+        depth = max(depth, level)
+        kind = node[0]
+        if kind in (expr_engine.NEG, expr_engine.POS):
+            stack.append((node[1], level + 1))
+        elif kind == expr_engine.BINOP:
+            stack.append((node[2], level + 1))
+            stack.append((node[3], level + 1))
+        elif kind == expr_engine.CALL:
+            stack.extend((arg, level + 1) for arg in node[2])
+    return depth
+
+def _literals(tree):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        kind = node[0]
+        if kind == expr_engine.NUM:
+            yield node[1]
+        elif kind in (expr_engine.NEG, expr_engine.POS):
+            stack.append(node[1])
+        elif kind == expr_engine.BINOP:
+            stack.extend((node[2], node[3]))
+        elif kind == expr_engine.CALL:
+            stack.extend(node[2])
+
+
+class GuardedTask:
+    """Handle of an evaluation running on the evaluator's background thread."""
+
+    def __init__(self, future, cancel_event):
+        self._future = future
+        self._cancel = cancel_event
+
+    def cancel(self):
+        """Asks the evaluation to stop at its next operator."""
+        self._cancel.set()
+        self._future.cancel()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def done(self):
+        return self._future.done()
+
+    def result(self, timeout=None):
+        return self._future.result(timeout)
+
+
+class GuardedEvaluator:
+    """Evaluates expressions under Limits; compiled forms are cached per evaluator."""
+
+    zero = 0.0 # Numbers stay native floats (see backends.py for other number types)
+
+    def __init__(self, limits=None, cache_size=expr_engine.CACHE_SIZE):
+        self.limits = Limits() if limits is None else limits
+        self._functions = self._guarded_functions()
+        self._compile = lru_cache(maxsize=cache_size)(self._compile_normalized)
+        self._executor = None
+
+    def _guarded_functions(self):
+        limits = self.limits
+        max_magnitude = limits.max_magnitude
+        max_exponent = limits.max_exponent
+
+        def guard(name, func):
+            def op(x, y):
+                _check_interrupt()
+                if name == '**' and abs(y) > max_exponent:
+                    raise LimitExceeded(f"Exponent {y!r} exceeds the limit of {max_exponent}")
+                result = func(x, y)
+                if abs(result) > max_magnitude:
+                    raise LimitExceeded(f"Result magnitude exceeds the limit of {max_magnitude}")
+                return result
+            return op
+
+        return {name: guard(name, func) for name, func in expr_engine.BINARY_FUNCTIONS.items()}
+
+    def _compile_normalized(self, key):
+        limits = self.limits
+        if len(key) > limits.max_length:
+            raise LimitExceeded(f"Expression is longer than {limits.max_length} characters")
+        tokens = expr_engine.tokenize(key)
+        nesting = 0
+        for kind, value in tokens:
+            if kind == 'op' and value == '(':
+                nesting += 1
+                if nesting > limits.max_depth:
+                    raise LimitExceeded(f"Expression is nested deeper than {limits.max_depth} levels")
+            elif kind == 'op' and value == ')':
+                nesting -= 1
+        try:
+            tree = expr_engine.parse(key)
+        except RecursionError:
+            raise LimitExceeded("Expression is nested too deeply to parse") from None
+        if tree_depth(tree) > limits.max_depth:
+            raise LimitExceeded(f"Expression is nested deeper than {limits.max_depth} levels")
+        for literal in _literals(tree):
+            if abs(literal) > limits.max_magnitude:
+                raise LimitExceeded(f"Number {literal!r} exceeds the limit of {limits.max_magnitude}")
+        return expr_engine.compile_tree(tree, self._functions)
+
+    def compile(self, source):
+        """Checks the static limits and returns the guarded compiled function."""
+        return self._compile(expr_engine.normalize(source))
+
+    def evaluate(self, source, context):
+        """Evaluates an expression under the limits, raising LimitExceeded if one is hit."""
+        func = self.compile(source)
+        timeout = self.limits.timeout
+        previous = getattr(_state, 'deadline', None)
+        _state.deadline = None if timeout is None else time.perf_counter() + timeout
+        try:
+            return func(context)
+        finally:
+            _state.deadline = previous
+
+    def format_result(self, result):
+        return expr_engine.format_result(result)
+
+    def submit(self, func, *args):
+        """Runs func(*args) on the background thread; returns a cancellable GuardedTask.
+
+        Guarded evaluations started by func (e.g. CalculatorSession.press with
+        this evaluator) stop with EvaluationCancelled once the task is cancelled.
+        """
+        if self._executor is None:
+            # Imported lazily: only the GUI's background evaluation needs it
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="guarded-eval")
+        cancel_event = threading.Event()
+
+        def run():
+            _state.cancel = cancel_event
+            try:
+                return func(*args)
+            finally:
+                _state.cancel = None
+
+        return GuardedTask(self._executor.submit(run), cancel_event)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,45 +1,157 @@
-import tkinter as tk
-from tkinter import messagebox
-import math # For math.pi and potentially other functions if not in calc_logic
-import calculator as calc_logic # Core calculator functions
-
-# Define physical constants at the module level BEFORE the class definition
-SPEED_OF_LIGHT = 299792458  # m/s
-PLANCK_CONSTANT = 6.62607015e-34  # J*s
-GRAVITATIONAL_CONSTANT = 6.67430e-11  # N*m^2/kg^2
+import os
+import sys
+import time
+from session import CalculatorSession # Tk-free input state machine
+from guard import GuardedEvaluator, Limits # Resource-limited evaluation off the UI thread
+from instrument import InstrumentedEvaluator # Optional timing/counter instrumentation
+from history import HistoryJournal # Persistent calculation history
+
+# Physical constants are defined with the expression engine so they can be used without Tk
+from expression import SPEED_OF_LIGHT, PLANCK_CONSTANT, GRAVITATIONAL_CONSTANT
+
+# Tk is imported on first use (load_tk), so importing this module for its
+# constants or evaluation logic does not pay for the GUI toolkit.
+tk = None
+messagebox = None
+
+def load_tk():
+    """Imports tkinter and its messagebox into this module's globals (once)."""
+    global tk, messagebox
+    if tk is None:
+        import tkinter
+        from tkinter import messagebox as tk_messagebox
+        tk, messagebox = tkinter, tk_messagebox
+    return tk
+
+# Button layout: (text, row, col, type, [optional: value passed to on_button_click])
+# Memory row and row 8 have 5 buttons. Other rows have 4 buttons; the 5th column stays empty.
+BUTTONS = (
+    # Memory Row (row 0) - 5 columns
+    ('MC', 0, 0, 'memory'), ('MR', 0, 1, 'memory'), ('MS', 0, 2, 'memory'),
+    ('M+', 0, 3, 'memory'), ('M-', 0, 4, 'memory'),
+    # Row 1 (Control and first functions/operators) - 4 main columns, 5th empty
+    ('C', 1, 0, 'clr'), ('CE', 1, 1, 'clr_entry'), ('sqrt', 1, 2, 'func'), ('pow', 1, 3, 'op'),
+    # Row 2
+    ('7', 2, 0, 'num'), ('8', 2, 1, 'num'), ('9', 2, 2, 'num'), ('/', 2, 3, 'op'),
+    # Row 3
+    ('4', 3, 0, 'num'), ('5', 3, 1, 'num'), ('6', 3, 2, 'num'), ('*', 3, 3, 'op'),
+    # Row 4
+    ('1', 4, 0, 'num'), ('2', 4, 1, 'num'), ('3', 4, 2, 'num'), ('-', 4, 3, 'op'),
+    # Row 5
+    ('0', 5, 0, 'num'), ('.', 5, 1, 'num'), ('=', 5, 2, 'eq'), ('+', 5, 3, 'op'),
+    # Row 6 (Advanced functions)
+    ('log', 6, 0, 'func'), ('log10', 6, 1, 'func'), ('sin', 6, 2, 'func'), ('cos', 6, 3, 'func'),
+    # Row 7 - Parentheses and constants
+    ('(', 7, 0, 'char'),
+    (')', 7, 1, 'char'),
+    ('π', 7, 2, 'const', 'pi'),
+    ('e', 7, 3, 'const', 'e'),
+    # Row 8 (Additional scientific constants)
+    ('c', 8, 0, 'const', 'c_light'),   # Speed of Light
+    ('h', 8, 1, 'const', 'h_planck'),  # Planck's Constant
+    ('G', 8, 2, 'const', 'G_grav'),   # Gravitational Constant
+    ('x', 8, 3, 'const'),              # Variable of plotted expressions
+    ('plot', 8, 4, 'plot'),            # Plot the expression over x (see plot.py)
+    # Row 9 (Windows)
+    ('sheet', 9, 0, 'sheet'),          # Worksheet of named cells (see worksheet.py)
+)
+BUTTON_ROWS = 10
+BUTTON_COLUMNS = 5
+
+BUTTON_FONT = ('Arial', 12)
+BUTTON_BOLD_FONT = ('Arial', 12, 'bold')
+
+# Styling per button type: (background, foreground, font)
+BUTTON_STYLES = {
+    'num': ('#f7f7f7', 'black', BUTTON_FONT),             # Off-white for numbers
+    'op': ('#e0e0e0', 'black', BUTTON_BOLD_FONT),         # Light grey for operators
+    'func': ('#d3d3d3', 'black', BUTTON_BOLD_FONT),       # Slightly darker grey for functions
+    'eq': ('#4CAF50', 'white', BUTTON_BOLD_FONT),         # Green for equals
+    'clr': ('#f44336', 'white', BUTTON_BOLD_FONT),        # Red for clear buttons
+    'clr_entry': ('#f44336', 'white', BUTTON_BOLD_FONT),
+    'char': ('#e0e0e0', 'black', BUTTON_BOLD_FONT),       # Parentheses
+    'const': ('#e0e0e0', 'black', BUTTON_BOLD_FONT),      # Pi and other constants
+    'memory': ('#FF9800', 'white', BUTTON_BOLD_FONT),     # Orange for memory buttons
+    'plot': ('#2196F3', 'white', BUTTON_BOLD_FONT),       # Blue for the plot window
+    'sheet': ('#2196F3', 'white', BUTTON_BOLD_FONT),      # and the worksheet window
+}
+
+# Everything a button needs, computed once at import:
+# (text, row, col, type, value passed to on_button_click, background, foreground, font)
+BUTTON_SPECS = tuple(
+    (info[0], info[1], info[2], info[3], info[4] if len(info) > 4 else info[0])
+    + BUTTON_STYLES[info[3]]
+    for info in BUTTONS
+)
+
+# Keyboard input: keys that act like a button, by keysym, then by character.
+# Other printable characters (letters, ',', ...) are inserted as text.
+KEY_PRESSES = {
+    'Return': ('=', 'eq'),
+    'KP_Enter': ('=', 'eq'),
+    'BackSpace': ('CE', 'clr_entry'),
+    'Escape': ('C', 'clr'),
+    'Delete': ('C', 'clr'),
+}
+CHAR_PRESSES = {
+    **{char: (char, 'num') for char in '0123456789.'},
+    **{char: (char, 'op') for char in '+-*/'},
+    '^': ('pow', 'op'),
+    '(': ('(', 'char'),
+    ')': (')', 'char'),
+    '=': ('=', 'eq'),
+}
+TEXT_CHARACTERS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_,")
+
+def key_event(keysym, char):
+    """Maps a key to ('press', value, btn_type), ('text', char) or None (ignored)."""
+    press = KEY_PRESSES.get(keysym) or CHAR_PRESSES.get(char)
+    if press is not None:
+        return ('press',) + press
+    if char and char in TEXT_CHARACTERS:
+        return ('text', char)
+    return None
+
+# At most one display refresh per frame; presses in between are coalesced.
+DISPLAY_INTERVAL_MS = 16
+
+# Calculation history journal used by main() (see history.py)
+HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".hesapmakinesi_history")
 
 class CalculatorGUI:
-    def __init__(self, master):
+    # Button types that evaluate the expression (run off the UI thread in guarded mode)
+    EVALUATING_TYPES = ('eq', 'memory')
+    POLL_INTERVAL_MS = 20
+
+    def __init__(self, master, result_cache=None, limits=None, metrics=None, debug=False,
+                 history=None):
+        load_tk()
         self.master = master
         master.title("Calculator") # Simplified title
-        master.geometry("420x620") # Slightly adjusted for more padding/consistent look
+        master.geometry("420x680") # Slightly adjusted for more padding/consistent look
         master.resizable(False, False) 
 
         # Configure root window's background color (optional)
         # master.configure(bg="#f0f0f0") # Light gray background
 
-        # Expression string
-        self.expression = ""
-        self.memory = 0.0
-
-        # Setup for eval context
-        self.eval_context = {
-            # Custom functions from calc_logic
-            'sqrt': calc_logic.square_root,
-            'log': calc_logic.log_natural, # GUI 'log' maps to natural log
-            'ln': calc_logic.log_natural,  # Allow 'ln' as well if typed or from future button
-            'log10': calc_logic.log_base10,
-            'sin': calc_logic.sine,
-            'cos': calc_logic.cosine,
-            'tan': calc_logic.tangent,
-            # Standard math constants/functions
-            'pi': math.pi,
-            'e': math.e,
-            'c_light': SPEED_OF_LIGHT, # Defined at module level
-            'h_planck': PLANCK_CONSTANT, # Defined at module level
-            'G_grav': GRAVITATIONAL_CONSTANT, # Defined at module level
-            # Note: 'pow' is handled by replacing "pow" with "**" in the expression string
-        }
+        # Expression, memory and eval context live in the session (see session.py)
+        # result_cache is an optional result_cache.ResultCache
+        # limits is an optional guard.Limits; when given, evaluations are resource-limited
+        # and run on a background thread so a pathological expression cannot freeze the window
+        # metrics is an optional instrument.Metrics recording stage timings and counters
+        # debug=True prints every button press (off by default: it costs I/O per keypress)
+        # history is an optional history.HistoryJournal; Up/Down step through it
+        self.evaluator = GuardedEvaluator(limits) if limits is not None else None
+        self.pending_task = None
+        session_evaluator = self.evaluator
+        if metrics is not None:
+            session_evaluator = InstrumentedEvaluator(self.evaluator, metrics)
+        self.session = CalculatorSession(result_cache=result_cache,
+                                         log=print if debug else None,
+                                         evaluator=session_evaluator, preview=True,
+                                         history=history)
+        self.eval_context = self.session.eval_context
+        self.worksheet = None # Created when the worksheet window is first opened
 
         # Display Entry widget (Increased font size, padding, and defined background)
         self.display_var = tk.StringVar()
@@ -48,330 +160,208 @@ class CalculatorGUI:
                                  bd=10, relief=tk.SUNKEN, width=14, # Using relief for a bit of depth
                                  state='readonly', justify='right', bg="#ffffff", fg="#000000") # White bg, black text
         # columnspan adjusted to 5 as we will have 5 columns for memory buttons
-        display_entry.grid(row=0, column=0, columnspan=5, pady=15, padx=10, sticky="nsew") # Reduced pady for display slightly
+        display_entry.grid(row=0, column=0, columnspan=5, pady=(15, 0), padx=10, sticky="nsew") # Reduced pady for display slightly
+        # Long expressions scroll horizontally; the end (where typing happens) is kept in view
+        display_scroll = tk.Scrollbar(master, orient=tk.HORIZONTAL, command=display_entry.xview)
+        display_entry.configure(xscrollcommand=display_scroll.set)
+        display_scroll.grid(row=1, column=0, columnspan=5, padx=10, sticky="ew")
+        self.display_entry = display_entry
+
+        # Live preview of the value being typed (see CalculatorSession.preview)
+        self.preview_var = tk.StringVar()
+        preview_label = tk.Label(master, textvariable=self.preview_var, font=('Arial', 12),
+                                 anchor='e', fg="#808080")
+        preview_label.grid(row=2, column=0, columnspan=5, padx=14, sticky="nsew")
 
 
         # --- Button Frame and Definitions ---
         button_frame = tk.Frame(master) 
-        button_frame.grid(row=1, column=0, columnspan=5, padx=5, pady=5, sticky="nsew") # Reduced padx for button_frame
-
-        # Define button texts, their grid positions (row, col), type, and any specific styling
-        # (text, row, col, type, [optional: colspan])
-        # Memory row now has 5 buttons. Other rows will have 4 buttons, centered or spanned.
-        # For simplicity, we'll let the 5th column be empty for rows with 4 buttons.
-        buttons = [
-            # Memory Row (row 0) - 5 columns
-            ('MC', 0, 0, 'memory'), ('MR', 0, 1, 'memory'), ('MS', 0, 2, 'memory'), 
-            ('M+', 0, 3, 'memory'), ('M-', 0, 4, 'memory'),
-            # Row 1 (Control and first functions/operators) - 4 main columns, 5th empty
-            ('C', 1, 0, 'clr'), ('CE', 1, 1, 'clr_entry'), ('sqrt', 1, 2, 'func'), ('pow', 1, 3, 'op'),
-            # Empty for (1,4) or a new button could go here if needed
-            # Row 2 (was 1)
-            ('7', 2, 0, 'num'), ('8', 2, 1, 'num'), ('9', 2, 2, 'num'), ('/', 2, 3, 'op'),
-            # Row 3 (was 2)
-            ('4', 3, 0, 'num'), ('5', 3, 1, 'num'), ('6', 3, 2, 'num'), ('*', 3, 3, 'op'),
-            # Row 4 (was 3)
-            ('1', 4, 0, 'num'), ('2', 4, 1, 'num'), ('3', 4, 2, 'num'), ('-', 4, 3, 'op'),
-            # Row 5 (was 4)
-            ('0', 5, 0, 'num'), ('.', 5, 1, 'num'), ('=', 5, 2, 'eq'), ('+', 5, 3, 'op'),
-            # Row 6 (was 5 - Advanced functions)
-            ('log', 6, 0, 'func'), ('log10', 6, 1, 'func'), ('sin', 6, 2, 'func'), ('cos', 6, 3, 'func'),
-            # Row 7 (was 6) - Parentheses and existing constants
-            ('(', 7, 0, 'char'), 
-            (')', 7, 1, 'char'), 
-            ('π', 7, 2, 'const', 'pi'), 
-            ('e', 7, 3, 'const', 'e'),
-            # Row 8 (New row for additional scientific constants)
-            ('c', 8, 0, 'const', 'c_light'),   # Speed of Light
-            ('h', 8, 1, 'const', 'h_planck'),  # Planck's Constant
-            ('G', 8, 2, 'const', 'G_grav'),   # Gravitational Constant
-            # Potentially 2 empty slots here in column 3 and 4 for this new row
-        ]
-        
-        button_font = ('Arial', 12) # Further reduced font size for more rows
-        button_bold_font = ('Arial', 12, 'bold') 
-
-        # Create and place buttons in the button_frame
-        for i, btn_info in enumerate(buttons):
-            text_on_btn = btn_info[0]
-            r, c, btn_type = btn_info[1], btn_info[2], btn_info[3]
-            
-            # Determine value passed to on_button_click: use text_on_btn by default
-            value_for_command = text_on_btn
-            if len(btn_info) > 4: # If a specific value for command is provided (like "pi" for 'π')
-                value_for_command = btn_info[4]
-
-            # Default styling
-            fg_color = 'black'
-            bg_color = '#f7f7f7' # Off-white for numbers
-            font_style = button_font
-
-            if btn_type == 'op':
-                bg_color = '#e0e0e0' # Light grey for operators
-                font_style = button_bold_font
-            elif btn_type == 'func':
-                bg_color = '#d3d3d3' # Slightly darker grey for functions
-                font_style = button_bold_font
-            elif btn_type == 'eq':
-                bg_color = '#4CAF50' # Green for equals
-                fg_color = 'white'
-                font_style = button_bold_font
-            elif btn_type == 'clr' or btn_type == 'clr_entry':
-                bg_color = '#f44336' # Red for clear buttons
-                fg_color = 'white'
-                font_style = button_bold_font
-            elif btn_type == 'char' or btn_type == 'const': # Parentheses, Pi
-                bg_color = '#e0e0e0' 
-                font_style = button_bold_font
-            elif btn_type == 'memory':
-                bg_color = '#FF9800' # Orange for memory buttons
-                fg_color = 'white'
-                font_style = button_bold_font
-
-            # Consistent padding and make buttons expand
-            # relief=tk.RAISED for a bit of 3D effect on buttons
-            current_colspan = 1
-            # if len(btn_info) > 4 and isinstance(btn_info[4], int) : # Check if colspan is provided
-            #     current_colspan = btn_info[4]
-                
-            button = tk.Button(button_frame, text=text_on_btn, font=font_style, fg=fg_color, bg=bg_color,
+        button_frame.grid(row=3, column=0, columnspan=5, padx=5, pady=5, sticky="nsew") # Reduced padx for button_frame
+
+        # Buttons are created from the precomputed BUTTON_SPECS table; relief=tk.RAISED
+        # gives a bit of 3D effect and sticky="nsew" makes them expand
+        click = self.on_button_click
+        for text, r, c, btn_type, value, bg_color, fg_color, font_style in BUTTON_SPECS:
+            button = tk.Button(button_frame, text=text, font=font_style, fg=fg_color, bg=bg_color,
                                relief=tk.RAISED, bd=2,
-                               command=lambda v=value_for_command, bt=btn_type: self.on_button_click(v, bt))
-            button.grid(row=r, column=c, columnspan=current_colspan, sticky="nsew", padx=2, pady=2) # Reduced padx/pady for buttons
+                               command=lambda v=value, bt=btn_type: click(v, bt))
+            button.grid(row=r, column=c, sticky="nsew", padx=2, pady=2) # Reduced padx/pady for buttons
 
 
         # Configure column and row weights for button_frame for uniform button sizing
-        # Now we have 5 columns for the button_frame due to memory buttons
-        for i in range(5): 
+        # 5 columns for the button_frame due to memory buttons, 10 rows of buttons (0-9)
+        for i in range(BUTTON_COLUMNS):
             button_frame.grid_columnconfigure(i, weight=1)
-        # And 9 rows of buttons now (0-8)
-        for i in range(9): 
+        for i in range(BUTTON_ROWS):
             button_frame.grid_rowconfigure(i, weight=1)
             
-        # Configure master window's row weights (display row 0, button_frame row 1)
+        # Configure master window's row weights (display row 0, its scrollbar row 1,
+        # preview row 2, button_frame row 3)
         master.grid_rowconfigure(0, weight=0) # Display row should not expand as much
-        master.grid_rowconfigure(1, weight=1) # Button frame row takes remaining space
+        master.grid_rowconfigure(1, weight=0)
+        master.grid_rowconfigure(2, weight=0)
+        master.grid_rowconfigure(3, weight=1) # Button frame row takes remaining space
         master.grid_columnconfigure(0, weight=1) # Ensure master column expands
 
+        # Up/Down recall earlier expressions from the history
+        master.bind('<Up>', lambda event: self._browse_history(self.session.previous_history))
+        master.bind('<Down>', lambda event: self._browse_history(self.session.next_history))
+        # Typing works like the buttons (see key_event); Ctrl+V / Shift+Insert paste text
+        master.bind('<Key>', self._on_key)
+        for sequence in ('<Control-v>', '<Control-V>', '<Shift-Insert>'):
+            master.bind(sequence, self.paste)
+
+        # Display refreshes are coalesced: presses only mark the display stale
+        # (see _schedule_display), so typing or pasting a long expression
+        # redraws at most once per DISPLAY_INTERVAL_MS
+        self._display_job = None
+        self._last_display_refresh = 0.0
+        self._preview_job = None
+
+        # Buffered history entries are written within history.max_delay, even while idle
+        if history is not None:
+            self._flush_history()
+
         # Initialize display
-        self.display_var.set("0")
-        self.just_calculated = False # Flag to clear expression on new number input after '='
-
-    def _evaluate_expression(self, expression_str):
-        """Helper to evaluate an expression string, returns number or raises exception."""
-        if not expression_str:
-            # Attempting to evaluate an empty string often happens with MS/M+/M- if display is "0" or "Error"
-            # We can either return 0.0 or raise a specific error.
-            # Let's try to evaluate what's literally in the display if expression_str is empty
-            # This is relevant if user clears expression then hits MS with "0" in display.
-            current_display = self.display_var.get()
-            if current_display == "Error" : # Add more specific error checks if needed
-                 raise ValueError("Cannot store/use error message in memory.")
-            try:
-                 return float(current_display) # Try to convert display directly if expression is empty
-            except ValueError:
-                 raise ValueError("Invalid value in display for memory operation.")
-
-
-        eval_expression = expression_str.replace("pow", "**")
-        # pi is handled by eval_context
-        
-        # Important: Security with eval. Restrict builtins.
-        # Allowing specific math functions from calc_logic via eval_context.
-        result = eval(eval_expression, {"__builtins__": {}}, self.eval_context)
-        return result
+        self.display_var.set(self.session.display)
 
     def on_button_click(self, value, btn_type):
-        current_display_text = self.display_var.get()
-
-        if btn_type == 'clr': # 'C'
-            self.expression = ""
-            self.display_var.set("0")
-            self.just_calculated = False
-        
-        elif btn_type == 'clr_entry': # 'CE' - Simplified: clear last character
-            if self.expression:
-                self.expression = self.expression[:-1]
-            self.display_var.set(self.expression if self.expression else "0")
-            self.just_calculated = False
-
-        elif btn_type == 'eq':
-            if not self.expression:
-                self.display_var.set("0")
-                return
-            try:
-                result = self._evaluate_expression(self.expression)
-                if isinstance(result, float) and result.is_integer():
-                    result_str = str(int(result))
-                else:
-                    result_str = f"{result:.10g}"
-                self.display_var.set(result_str)
-                self.expression = result_str
-                self.just_calculated = True
-            except ZeroDivisionError:
-                self.display_var.set("Error: Division by zero")
-                messagebox.showerror("Calculation Error", "Cannot divide by zero.")
-                self.expression = "" 
-                self.just_calculated = True
-            except (SyntaxError, NameError) as e:
-                self.display_var.set("Error: Invalid syntax")
-                messagebox.showerror("Calculation Error", f"Invalid expression syntax or unknown function: {e}")
-                self.expression = ""
-                self.just_calculated = True
-            except (ValueError, TypeError) as e: 
-                self.display_var.set("Error: Math domain/type")
-                messagebox.showerror("Calculation Error", f"Mathematical error: {e}")
-                self.expression = ""
-                self.just_calculated = True
-            except Exception as e:
-                self.display_var.set("Error: Unknown")
-                messagebox.showerror("Calculation Error", f"An unexpected error occurred: {e}")
-                self.expression = ""
-                self.just_calculated = True
-            return 
-
-        elif btn_type == 'memory':
-            try:
-                if value == 'MC':
-                    self.memory = 0.0
-                    print("Memory Cleared") # For debugging, no direct display change
-                elif value == 'MR':
-                    # Treat MR like number input
-                    mem_str = str(self.memory)
-                    if mem_str.endswith(".0"): mem_str = mem_str[:-2] # Clean display for whole numbers
-                    
-                    if self.just_calculated or (current_display_text == "0" and self.expression == "0"):
-                        self.expression = mem_str
-                    else:
-                         # If last char in expression is a digit or ')', add '*' for implicit multiplication
-                        if self.expression and (self.expression[-1].isdigit() or self.expression[-1] == ')'):
-                            self.expression += " * " + mem_str
-                        else: # Otherwise, just append (e.g. after an operator or '(')
-                            self.expression += mem_str
-                    self.display_var.set(self.expression)
-                    self.just_calculated = False
-                
-                elif value == 'MS':
-                    # Use current expression on display for MS
-                    # If display is "0" and expression is empty, store 0.
-                    # If display is an error, do not store.
-                    if current_display_text == "Error": # Add more specific error checks if needed
-                        messagebox.showerror("Memory Error", "Cannot store error value.")
-                        return
-                    
-                    # We want to store the evaluated value of the current expression, or current number on display
-                    # If expression is empty, it means user might have typed '0' or it's the initial state.
-                    # Or if an error just occurred and display shows "Error"
-                    val_to_store_str = self.expression if self.expression else current_display_text
-                    if not val_to_store_str and current_display_text == "0": # Store 0 if expression is empty and display is 0
-                        self.memory = 0.0
-                    else:
-                        self.memory = self._evaluate_expression(val_to_store_str)
-                    print(f"Memory Stored: {self.memory}") # Debug
-                    self.just_calculated = True 
-
-                elif value == 'M+':
-                    val_to_add = self._evaluate_expression(self.expression if self.expression else current_display_text)
-                    self.memory += val_to_add
-                    print(f"Memory Add: {self.memory}") # Debug
-                    self.just_calculated = True 
-                
-                elif value == 'M-':
-                    val_to_subtract = self._evaluate_expression(self.expression if self.expression else current_display_text)
-                    self.memory -= val_to_subtract
-                    print(f"Memory Subtract: {self.memory}") # Debug
-                    self.just_calculated = True
-
-            except ValueError as e: 
-                messagebox.showerror("Memory Operation Error", str(e))
-            except Exception as e: # Catch other eval errors for M ops
-                messagebox.showerror("Memory Operation Error", f"Could not perform memory operation: {e}")
-            # No display_var.set here for MC/MS/M+/M- unless we want to show memory content,
-            # which is not standard. MR handles display.
-            return # Skip default print at end of on_button_click for memory ops
-
-        elif btn_type == 'num':
-            if self.just_calculated or current_display_text == "0" and value != ".":
-                self.expression = value # Start new expression
-                self.just_calculated = False
-            elif value == '.':
-                # Prevent multiple decimal points in the current number segment
-                # This requires finding the last number segment
-                last_segment = ""
-                for char in reversed(self.expression):
-                    if char in " +/-*()": # Stop at operator or parenthesis
-                        break
-                    last_segment = char + last_segment
-                if '.' not in last_segment:
-                    self.expression += value
-            else:
-                self.expression += value
-            self.display_var.set(self.expression)
-
-        elif btn_type == 'op': # Includes 'pow'
-            if self.expression: # Allow starting with '-' for negative numbers
-                # Add space around operators for better parsing later (unless it's a starting negative)
-                if value == '-' and not self.expression:
-                     self.expression += value
-                # Avoid double operators, or operator after opening parenthesis if not '-'
-                elif self.expression[-1] not in [' ', '(', '+', '*', '/', 'w']: # 'w' from 'pow'
-                    self.expression += f" {value} "
-                elif value == '-' and self.expression.endswith('('): # Allow func(-
-                    self.expression += value
-
-            elif value == '-': # Allow starting expression with a negative number
-                self.expression = value
-            
-            self.display_var.set(self.expression if self.expression else "0")
-            self.just_calculated = False
-
-        elif btn_type == 'func': # sqrt, log, log10, sin, cos, tan
-            if self.just_calculated: # Start new expression if after '='
-                self.expression = value + "("
-            elif not self.expression or self.expression.endswith((' ', '(', '+', '-', '*', '/', 'w')):
-                self.expression += value + "("
-            else: # If there's a number before, multiply (e.g. 2sqrt(4) -> 2 * sqrt(4)) - advanced
-                  # For now, just append, implies user must use operators explicitly
-                  # Or, we can decide to overwrite or show error.
-                  # Let's assume for now it's appended if it's after a number, though this isn't ideal.
-                  # A better way might be to enforce an operator or start new.
-                  # Simplified: if expression is not empty and doesn't end with operator/paren, add "*"
-                if self.expression and not self.expression.endswith(tuple(' +/-*()')):
-                     self.expression += " * " + value + "("
-                else:
-                    self.expression += value + "("
-
-            self.display_var.set(self.expression if self.expression else "0")
-            self.just_calculated = False
-            
-        elif btn_type == 'char': # Parentheses
-            if self.just_calculated:
-                self.expression = value
-                self.just_calculated = False
-            else:
-                self.expression += value
-            self.display_var.set(self.expression if self.expression else "0")
-
-        elif btn_type == 'const': # 'pi', 'e'
-            # 'value' here will be "pi" or "e"
-            if self.just_calculated or (current_display_text == "0" and self.expression == "0"):
-                self.expression = value 
-            elif self.expression and not self.expression.endswith(tuple(' +/-*().')):
-                self.expression += " * " + value 
-            else:
-                self.expression += value 
-            self.display_var.set(self.expression)
-            self.just_calculated = False
-        
-        # Final display update, if not handled by specific cases like '='
-        # This was mostly integrated into each condition block to ensure "0" is shown when expression is empty.
-        # However, a fallback might be useful if a new button type doesn't set display_var.
-        # For now, existing logic should cover it.
-
-        print(f"Button '{value}' (type: {btn_type}) clicked. Expression: '{self.expression}'")
+        # All input handling lives in CalculatorSession; the GUI only mirrors
+        # the display text and shows errors reported by the session.
+        if self.pending_task is not None:
+            # An evaluation is running in the background: 'C' cancels it, other keys wait
+            if btn_type == 'clr':
+                self.pending_task.cancel()
+            return
+        if btn_type == 'plot':
+            self.open_plot()
+            return
+        if btn_type == 'sheet':
+            self.open_worksheet()
+            return
+        if self.evaluator is not None and btn_type in self.EVALUATING_TYPES:
+            self.display_var.set("...")
+            self.pending_task = self.evaluator.submit(self.session.press, value, btn_type)
+            self.master.after(self.POLL_INTERVAL_MS, self._poll_pending_task)
+            return
+        self._show_result(self.session.press(value, btn_type))
+
+    def open_plot(self):
+        """Opens a window plotting the current expression as a function of x."""
+        import plot # Imported lazily: loads NumPy, which startup does not need
+        try:
+            plot.PlotWindow(self.master, self.session.expression, context=self.eval_context)
+        except (SyntaxError, NameError, ImportError) as e:
+            messagebox.showerror("Plot Error", str(e))
+
+    def open_worksheet(self):
+        """Opens the worksheet window; its cells are kept while the calculator runs."""
+        import worksheet # Imported lazily: only needed once the window is opened
+        if self.worksheet is None:
+            self.worksheet = worksheet.Worksheet(self.eval_context)
+        worksheet.WorksheetWindow(self.master, self.worksheet)
+
+    def _flush_history(self):
+        history = self.session.history
+        history.flush_if_due()
+        self.master.after(max(int(history.max_delay * 1000), self.POLL_INTERVAL_MS), self._flush_history)
+
+    def _browse_history(self, step):
+        if self.pending_task is None and step():
+            self._show_result(None)
+
+    def _poll_pending_task(self):
+        if not self.pending_task.done():
+            self.master.after(self.POLL_INTERVAL_MS, self._poll_pending_task)
+            return
+        task, self.pending_task = self.pending_task, None
+        from concurrent.futures import CancelledError # Loaded by guard's executor already
+        try:
+            error = task.result()
+        except CancelledError: # Cancelled before it started; nothing changed
+            error = None
+        self._show_result(error)
+
+    def _on_key(self, event):
+        if event.state & 0x4: # Control held: shortcuts such as Ctrl+V have their own bindings
+            return None
+        action = key_event(event.keysym, event.char)
+        if action is None:
+            return None
+        if action[0] == 'press':
+            self.on_button_click(action[1], action[2])
+        else:
+            self.insert_text(action[1])
+        return "break"
+
+    def paste(self, event=None):
+        """Inserts the clipboard text into the expression in one step."""
+        try:
+            text = self.master.clipboard_get()
+        except tk.TclError: # Empty clipboard, or not text
+            return "break"
+        self.insert_text(text)
+        return "break"
+
+    def insert_text(self, text):
+        if self.pending_task is None:
+            self._show_result(self.session.insert_text(text))
+
+    def _show_result(self, error):
+        if error is not None:
+            self._refresh_display() # Show the new state before the modal dialog
+            messagebox.showerror(*error)
+        else:
+            self._schedule_display()
+
+    def _schedule_display(self):
+        if self._display_job is not None:
+            return # A refresh is already due; it will show the latest state
+        wait = DISPLAY_INTERVAL_MS - (time.perf_counter() - self._last_display_refresh) * 1000
+        if wait > 0:
+            self._display_job = self.master.after(int(wait) + 1, self._refresh_display)
+        else:
+            self._display_job = self.master.after_idle(self._refresh_display)
+
+    def _refresh_display(self):
+        if self._display_job is not None:
+            self.master.after_cancel(self._display_job)
+            self._display_job = None
+        self._last_display_refresh = time.perf_counter()
+        display = self.session.display
+        if display != self.display_var.get():
+            self.display_var.set(display)
+            self.display_entry.xview_moveto(1.0)
+        self._show_preview()
+
+    def _show_preview(self):
+        self.preview_var.set(f"= {self.session.preview}" if self.session.preview else "")
+        if self.session.preview_pending and self._preview_job is None:
+            # A very long expression did not fit in one frame: continue when idle
+            self._preview_job = self.master.after_idle(self._continue_preview)
+
+    def _continue_preview(self):
+        self._preview_job = None
+        if self.pending_task is None:
+            self.session.refresh_preview(self.session.preview_budget)
+            self._show_preview()
+
+
+def create_app(limits=None, debug=False, **options):
+    """Creates the Tk root window and the calculator in it; returns (root, gui)."""
+    load_tk()
+    root = tk.Tk()
+    return root, CalculatorGUI(root, limits=limits, debug=debug, **options)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    history = HistoryJournal(HISTORY_PATH)
+    try:
+        root, gui = create_app(limits=Limits(), debug="--debug" in argv, history=history)
+        root.mainloop()
+    finally:
+        history.close()
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    gui = CalculatorGUI(root)
-    root.mainloop()
+    main()
@@ -0,0 +1,375 @@
+# This is the history.py file.
+# It contains the persistent calculation history (an append-only journal).
+
+# --- History Journal ---
+# HistoryJournal stores one entry per evaluation: timestamp, expression,
+# formatted result and the name of the exception type if it failed. Two files
+# are kept side by side:
+#   PATH       - the journal, one JSON object per line, only ever appended to
+#   PATH.idx   - the index, the byte offset of every journal line as a
+#                little-endian unsigned 64-bit integer (8 bytes per entry)
+# Appends are buffered in memory and written in batches (every `batch_size`
+# entries, on flush() and close(), and once the oldest buffered entry is
+# `max_delay` seconds old when the next entry is appended or flush_if_due()
+# is called; the GUI calls it on a timer). The journal is written before the
+# index, so after a crash the index can only lag behind; the missing tail is
+# re-indexed when the journal is next opened or written.
+#
+# Several processes (e.g. two calculator windows) may share the files: every
+# write holds an exclusive lock on the journal (fcntl, or msvcrt on Windows)
+# and takes the offsets from the real end of the files, and readers pick up
+# the entries other processes have written. Entry numbers returned by
+# append() are then only final once the entry is flushed. Within a process
+# the journal may be used from several threads (the GUI appends from its
+# evaluation thread and flushes from its timer); a lock serializes them.
+#
+# Opening a journal reads nothing but the file sizes. Entries are read through
+# memory maps of both files: journal[i] looks up one offset in the index and
+# decodes one line, recent(n) decodes n lines, and search(text) scans the
+# journal backwards with mmap.rfind (C speed) and only decodes lines that
+# contain the text. Millions of entries therefore do not slow down startup.
+#
+# replay() evaluates every recorded expression again and yields the entries
+# whose result or error differs, e.g. to re-verify results after changing the
+# engine or a backend.
+#
+# Usage:
+#   python HesapMakinesi/history.py PATH [--recent N] [--search TEXT] [--replay]
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+import expression as expr_engine
+
+_OFFSET = struct.Struct('<Q')
+
+# msvcrt locks are mandatory, so the lock byte lies far past any journal data
+# (locking beyond the end of a file is allowed) to keep readers unblocked.
+_WINDOWS_LOCK_OFFSET = 1 << 62
+
+
+class HistoryJournal:
+    """Append-only on-disk history of evaluations with an offset index."""
+
+    def __init__(self, path, batch_size=64, max_delay=1.0, clock=time.time):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.path = path
+        self.index_path = path + '.idx'
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._clock = clock
+        self._journal = open(path, 'ab')
+        self._index = open(self.index_path, 'ab')
+        self._size = -1 # Journal bytes and index entries as of the last _sync()
+        self._count = 0
+        self._pending = []          # entries (dicts) not yet written
+        self._pending_since = None  # clock() when the oldest pending entry was added
+        self._journal_view = None
+        self._index_view = None
+        # Reentrant: append() flushes and the readers call len(self).
+        self._lock = threading.RLock()
+        self._refresh()
+
+    # --- Writing ---
+
+    def append(self, expression, result=None, error=None):
+        """Records one evaluation and returns its entry number."""
+        entry = {'time': self._clock(), 'expression': expression, 'result': result, 'error': error}
+        with self._lock:
+            if not self._pending:
+                self._pending_since = entry['time']
+            self._pending.append(entry)
+            number = self._count + len(self._pending) - 1
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+            else:
+                self.flush_if_due()
+        return number
+
+    def flush_if_due(self):
+        """Flushes if the oldest buffered entry is at least max_delay seconds old."""
+        with self._lock:
+            if self._pending and self._clock() - self._pending_since >= self.max_delay:
+                self.flush()
+
+    def flush(self):
+        """Writes buffered entries to the journal and the index."""
+        with self._lock:
+            if not self._pending:
+                return
+            with self._locked():
+                self._sync() # Another process may have written since
+                lines = []
+                offsets = []
+                size = self._size
+                for entry in self._pending:
+                    line = _encode(entry)
+                    offsets.append(_OFFSET.pack(size))
+                    lines.append(line)
+                    size += len(line)
+                self._journal.write(b''.join(lines))
+                self._journal.flush()
+                self._index.write(b''.join(offsets))
+                self._index.flush()
+                self._size = size
+                self._count += len(self._pending)
+            self._pending.clear()
+            self._pending_since = None
+            self._close_views()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._close_views()
+            self._journal.close()
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    # --- Reading ---
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return self._count + len(self._pending)
+
+    def __getitem__(self, number):
+        with self._lock:
+            length = len(self)
+            if number < 0:
+                number += length
+            if not 0 <= number < length:
+                raise IndexError("history entry out of range")
+            if number >= self._count:
+                return dict(self._pending[number - self._count])
+            return self._read(number)
+
+    def recent(self, n=10):
+        """Returns the last n entries, newest first."""
+        with self._lock:
+            length = len(self)
+            return [self[number] for number in range(length - 1, max(length - n, 0) - 1, -1)]
+
+    def search(self, text, limit=10):
+        """Returns up to `limit` (number, entry) pairs whose expression contains text, newest first."""
+        with self._lock:
+            length = len(self)
+            if not text: # Every entry matches
+                return [(number, self[number]) for number in range(length - 1, max(length - limit, 0) - 1, -1)]
+            found = []
+            for offset in range(len(self._pending) - 1, -1, -1):
+                entry = self._pending[offset]
+                if text in entry['expression']:
+                    found.append((self._count + offset, dict(entry)))
+                    if len(found) >= limit:
+                        return found
+            view = self._views()[0]
+            if view is None:
+                return found
+            # Expressions are stored JSON-escaped (ASCII), so search for the escaped form.
+            needle = json.dumps(text)[1:-1].encode('ascii')
+            end = self._size
+            while len(found) < limit:
+                position = view.rfind(needle, 0, end)
+                if position < 0:
+                    break
+                start = view.rfind(b'\n', 0, position) + 1
+                entry = json.loads(view[start:view.find(b'\n', position)])
+                if text in entry['expression']: # Not a match in the result or a key
+                    found.append((self._number_at(start), entry))
+                end = start
+            return found
+
+    def __iter__(self):
+        """Yields every entry, oldest first (the journal is streamed, not loaded)."""
+        with self._lock:
+            self._refresh()
+            count = self._count
+            pending = [dict(entry) for entry in self._pending]
+        if count:
+            with open(self.path, 'rb') as f:
+                for _, line in zip(range(count), f):
+                    yield json.loads(line)
+        yield from pending
+
+    def replay(self, evaluator=None, context=None):
+        """Re-evaluates every entry; yields (number, entry, result, error) where they differ.
+
+        `evaluator` is an optional guard.GuardedEvaluator or numeric backend
+        (backends.py), `result` the new formatted result and `error` the new
+        exception type name (or None).
+        """
+        if context is None:
+            context = expr_engine.default_context()
+        for number, entry in enumerate(self):
+            result, error = _evaluate(entry['expression'], context, evaluator)
+            if result != entry['result'] or error != entry['error']:
+                yield number, entry, result, error
+
+    # --- Internals ---
+
+    @contextmanager
+    def _locked(self):
+        """Holds an exclusive lock on the journal, shared with other processes."""
+        fd = self._journal.fileno()
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            return
+        self._journal.seek(_WINDOWS_LOCK_OFFSET) # pragma: no cover - Windows
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            self._journal.seek(_WINDOWS_LOCK_OFFSET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def _refresh(self):
+        """Picks up entries written by other processes sharing the files."""
+        with self._locked():
+            self._sync()
+
+    def _sync(self):
+        """Re-reads the real sizes of both files (the lock must be held)."""
+        size = os.fstat(self._journal.fileno()).st_size
+        index_size = os.fstat(self._index.fileno()).st_size
+        if size == self._size and index_size == self._count * _OFFSET.size:
+            return
+        self._close_views()
+        self._size = size
+        self._count = index_size // _OFFSET.size
+        if index_size % _OFFSET.size: # Torn index write
+            self._index.truncate(self._count * _OFFSET.size)
+        self._recover()
+
+    def _read(self, number):
+        journal_view, index_view = self._views()
+        start = _OFFSET.unpack_from(index_view, number * _OFFSET.size)[0]
+        return json.loads(journal_view[start:journal_view.find(b'\n', start)])
+
+    def _number_at(self, offset):
+        """Returns the entry number of the journal line starting at offset (binary search)."""
+        index_view = self._views()[1]
+        low, high = 0, self._count - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if _OFFSET.unpack_from(index_view, middle * _OFFSET.size)[0] <= offset:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _views(self):
+        if self._journal_view is None and self._count:
+            with open(self.path, 'rb') as f:
+                self._journal_view = mmap.mmap(f.fileno(), self._size, access=mmap.ACCESS_READ)
+            with open(self.index_path, 'rb') as f:
+                self._index_view = mmap.mmap(f.fileno(), self._count * _OFFSET.size,
+                                             access=mmap.ACCESS_READ)
+        return self._journal_view, self._index_view
+
+    def _close_views(self):
+        if self._journal_view is not None:
+            self._journal_view.close()
+            self._index_view.close()
+            self._journal_view = self._index_view = None
+
+    def _recover(self):
+        """Indexes journal lines written after the last index entry (after a crash)."""
+        if self._count:
+            with open(self.index_path, 'rb') as f:
+                f.seek((self._count - 1) * _OFFSET.size)
+                start = _OFFSET.unpack(f.read(_OFFSET.size))[0]
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                indexed_end = start + len(f.readline())
+        else:
+            indexed_end = 0
+        if indexed_end >= self._size:
+            return
+        offsets = []
+        with open(self.path, 'rb') as f:
+            f.seek(indexed_end)
+            position = indexed_end
+            for line in f:
+                if not line.endswith(b'\n'): # Torn journal write: drop the partial line
+                    self._journal.truncate(position)
+                    self._size = position
+                    break
+                offsets.append(_OFFSET.pack(position))
+                position += len(line)
+        self._index.write(b''.join(offsets))
+        self._index.flush()
+        self._count += len(offsets)
+
+
+def _encode(entry):
+    # ensure_ascii keeps every line free of raw newlines and multi-byte characters
+    return (json.dumps(entry, ensure_ascii=True, separators=(',', ':')) + '\n').encode('ascii')
+
+def _evaluate(source, context, evaluator):
+    """Returns (result_str, error_type_name) for one expression."""
+    try:
+        if evaluator is not None:
+            return evaluator.format_result(evaluator.evaluate(source, context)), None
+        return expr_engine.format_result(expr_engine.evaluate(source, context)), None
+    except Exception as e:
+        return None, type(e).__name__
+
+
+def _format_entry(number, entry):
+    outcome = entry['result'] if entry['error'] is None else entry['error']
+    stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['time']))
+    return f"{number:>8}  {stamp}  {entry['expression']} = {outcome}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show, search or replay a calculation history.")
+    parser.add_argument("path", help="history journal file")
+    parser.add_argument("--recent", type=int, default=10, help="show the last N entries (default 10)")
+    parser.add_argument("--search", metavar="TEXT", default=None,
+                        help="show the newest entries whose expression contains TEXT")
+    parser.add_argument("--replay", action="store_true",
+                        help="re-evaluate every entry and report results that changed")
+    args = parser.parse_args(argv)
+    with HistoryJournal(args.path) as history:
+        if args.replay:
+            changed = 0
+            for number, entry, result, error in history.replay():
+                changed += 1
+                print(f"{_format_entry(number, entry)}  ->  {result if error is None else error}")
+            print(f"{changed} of {len(history)} entries changed")
+            return 1 if changed else 0
+        if args.search is not None:
+            entries = history.search(args.search, args.recent)
+        else:
+            length = len(history)
+            entries = [(length - 1 - i, entry) for i, entry in enumerate(history.recent(args.recent))]
+        for number, entry in entries:
+            print(_format_entry(number, entry))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
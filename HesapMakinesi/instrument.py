@@ -0,0 +1,226 @@
+# This is the instrument.py file.
+# It contains optional instrumentation and profiling of the evaluation pipeline.
+
+# --- Instrumentation ---
+# InstrumentedEvaluator has the same interface as the other evaluators
+# (evaluate(source, context), format_result(result), zero) and records into a
+# Metrics object:
+#   stage timers      - seconds and call counts for normalize, parse (incl.
+#                       compile, only on a compile-cache miss), evaluate and
+#                       format
+#   function counters - calls of every calculator.py primitive (operators and
+#                       context functions such as sqrt)
+#   error counters    - failed evaluations per exception type
+# Instrumentation is switched on by passing an InstrumentedEvaluator where an
+# evaluator is accepted (CalculatorSession, cli.run, the GUI). When it is not
+# installed none of this code runs, so the disabled cost is zero.
+# When wrapping another evaluator (guard.GuardedEvaluator or a backend from
+# backends.py) only the evaluate/format stages and error counters are
+# recorded, since those evaluators compile with their own operator tables.
+#
+# ProfileCapture is a context manager around cProfile and tracemalloc for
+# one-off captures of where time and memory go.
+#
+# Metrics can be exported as JSON (to_json) or in the Prometheus text
+# exposition format (to_prometheus).
+
+import io
+import json
+import time
+from functools import lru_cache
+
+import expression as expr_engine
+
+STAGES = ('normalize', 'parse', 'evaluate', 'format')
+
+
+class Metrics:
+    """Counters and stage timings collected by an InstrumentedEvaluator."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.evaluations = 0
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.stage_calls = dict.fromkeys(STAGES, 0)
+        self.function_calls = {}
+        self.errors = {}
+
+    def add_time(self, stage, seconds):
+        self.stage_seconds[stage] += seconds
+        self.stage_calls[stage] += 1
+
+    def count_error(self, exc):
+        name = type(exc).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def to_dict(self):
+        return {
+            'evaluations': self.evaluations,
+            'stages': {stage: {'seconds': self.stage_seconds[stage], 'calls': self.stage_calls[stage]}
+                       for stage in STAGES},
+            'function_calls': dict(sorted(self.function_calls.items())),
+            'errors': dict(sorted(self.errors.items())),
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, prefix='hesap'):
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {prefix}_evaluations_total Expressions evaluated.",
+            f"# TYPE {prefix}_evaluations_total counter",
+            f"{prefix}_evaluations_total {self.evaluations}",
+            f"# HELP {prefix}_stage_seconds_total Time spent per pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{stage}"}} {self.stage_seconds[stage]!r}'
+                  for stage in STAGES]
+        lines += [f"# HELP {prefix}_stage_calls_total Calls per pipeline stage.",
+                  f"# TYPE {prefix}_stage_calls_total counter"]
+        lines += [f'{prefix}_stage_calls_total{{stage="{stage}"}} {self.stage_calls[stage]}'
+                  for stage in STAGES]
+        lines += [f"# HELP {prefix}_function_calls_total Calls of calculator functions.",
+                  f"# TYPE {prefix}_function_calls_total counter"]
+        lines += [f'{prefix}_function_calls_total{{function="{name}"}} {count}'
+                  for name, count in sorted(self.function_calls.items())]
+        lines += [f"# HELP {prefix}_errors_total Failed evaluations per exception type.",
+                  f"# TYPE {prefix}_errors_total counter"]
+        lines += [f'{prefix}_errors_total{{type="{name}"}} {count}'
+                  for name, count in sorted(self.errors.items())]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes the metrics to a file: Prometheus text for *.prom, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith('.prom') else self.to_json() + "\n"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+class InstrumentedEvaluator:
+    """Evaluator recording stage timings, function calls and errors into a Metrics object."""
+
+    def __init__(self, inner=None, metrics=None, clock=time.perf_counter,
+                 cache_size=expr_engine.CACHE_SIZE):
+        self.inner = inner
+        self.metrics = Metrics() if metrics is None else metrics
+        self.zero = inner.zero if inner is not None else 0.0
+        self._clock = clock
+        self._wrappers = {}
+        self._functions = {op: self._counted(func)
+                           for op, func in expr_engine.BINARY_FUNCTIONS.items()}
+        self._compile = lru_cache(maxsize=cache_size)(self._compile_normalized)
+
+    def _counted(self, func):
+        """Returns func wrapped to count its calls (one wrapper per function)."""
+        wrapper = self._wrappers.get(func)
+        if wrapper is None:
+            calls = self.metrics.function_calls
+            name = getattr(func, '__name__', repr(func))
+            def wrapper(*args):
+                calls[name] = calls.get(name, 0) + 1
+                return func(*args)
+            self._wrappers[func] = wrapper
+        return wrapper
+
+    def _compile_normalized(self, key):
+        started = self._clock()
+        tree = expr_engine.parse(key)
+        func = expr_engine.compile_tree(tree, self._functions)
+        names = expr_engine.free_names(tree)
+        self.metrics.add_time('parse', self._clock() - started)
+        return func, names
+
+    def evaluate(self, source, context):
+        metrics = self.metrics
+        clock = self._clock
+        metrics.evaluations += 1
+        try:
+            if self.inner is not None:
+                started = clock()
+                try:
+                    return self.inner.evaluate(source, context)
+                finally:
+                    metrics.add_time('evaluate', clock() - started)
+            started = clock()
+            key = expr_engine.normalize(source)
+            metrics.add_time('normalize', clock() - started)
+            func, names = self._compile(key)
+            started = clock()
+            ns = {}
+            for name in names:
+                if name in context:
+                    value = context[name]
+                    ns[name] = self._counted(value) if callable(value) else value
+            try:
+                return func(ns)
+            finally:
+                metrics.add_time('evaluate', clock() - started)
+        except Exception as e:
+            metrics.count_error(e)
+            raise
+
+    def format_result(self, result):
+        started = self._clock()
+        try:
+            if self.inner is not None:
+                return self.inner.format_result(result)
+            return expr_engine.format_result(result)
+        finally:
+            self.metrics.add_time('format', self._clock() - started)
+
+
+# --- Profiling ---
+
+class ProfileCapture:
+    """Context manager capturing a cProfile and/or tracemalloc profile of its body."""
+
+    def __init__(self, cpu=True, memory=False, limit=20):
+        self.cpu = cpu
+        self.memory = memory
+        self.limit = limit
+        self.cpu_report = None
+        self.memory_top = None
+        self._profiler = None
+
+    def __enter__(self):
+        # The profilers are imported on use so importing this module stays cheap.
+        import cProfile
+        import tracemalloc
+        if self.memory:
+            tracemalloc.start()
+        if self.cpu:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        import pstats
+        import tracemalloc
+        if self._profiler is not None:
+            self._profiler.disable()
+            stream = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=stream)
+            stats.sort_stats('cumulative').print_stats(self.limit)
+            self.cpu_report = stream.getvalue()
+            self._profiler = None
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self.memory_top = [
+                {'location': str(stat.traceback), 'bytes': stat.size, 'blocks': stat.count}
+                for stat in snapshot.statistics('lineno')[:self.limit]]
+        return False
+
+    def report(self):
+        """Returns the captured profile as readable text."""
+        parts = []
+        if self.cpu_report is not None:
+            parts.append(self.cpu_report)
+        if self.memory_top is not None:
+            parts.append("Top allocations:")
+            parts += [f"  {item['location']}: {item['bytes']} bytes in {item['blocks']} blocks"
+                      for item in self.memory_top]
+        return "\n".join(parts) + "\n"
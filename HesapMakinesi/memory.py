@@ -0,0 +1,192 @@
+# This is the memory.py file.
+# It contains the calculator's memory bank and the workspace snapshot format.
+
+# --- Memory Bank ---
+# MemoryBank holds a fixed number of registers addressed by index or by a
+# name given to a register on first use. With the float backend (the default)
+# the registers live in one array('d'), 8 bytes per register; other numeric
+# backends (Decimal, Fraction) keep their values in a list. Register 0 is the
+# classic single memory (MC, MR, MS, M+, M- act on the session's active
+# register, which is 0 unless another one is selected).
+#
+# --- Workspace Snapshots ---
+# pack_workspace(session) captures a CalculatorSession's registers, register
+# names, active register, expression, display, just_calculated flag and
+# history position as bytes; unpack_workspace(session, data) restores them.
+# The format is little-endian struct fields and length-prefixed UTF-8:
+#   header     magic b'HSWS', version, register kind (0 float / 1 text), count
+#   registers  count doubles (kind 0) or count strings (kind 1, str(value))
+#   state      active register, history position (-1 for none), flags
+#   strings    expression, display
+#   names      name count, then (name, register index) pairs
+# Float registers are copied as one block, so snapshots of large banks cost
+# little more than a memory copy.
+
+import struct
+import sys
+from array import array
+
+DEFAULT_REGISTERS = 10
+
+_MAGIC = b'HSWS'
+_VERSION = 1
+_FLOAT_KIND = 0
+_TEXT_KIND = 1
+_HEADER = struct.Struct('<4sBBI')
+_STATE = struct.Struct('<IqB')
+_LENGTH = struct.Struct('<I')
+_INDEX = struct.Struct('<I')
+
+
+class MemoryBank:
+    """Fixed-size bank of memory registers addressed by index or name."""
+
+    def __init__(self, size=DEFAULT_REGISTERS, zero=0.0):
+        if size < 1:
+            raise ValueError("A memory bank needs at least one register")
+        self.zero = zero
+        if isinstance(zero, float):
+            self._values = array('d', bytes(8 * size))
+        else:
+            self._values = [zero] * size
+        self.names = {} # name -> register index
+
+    def __len__(self):
+        return len(self._values)
+
+    def index(self, register):
+        """Returns the index of a register given by index or name (a new name takes a free register)."""
+        if isinstance(register, int):
+            if not 0 <= register < len(self._values):
+                raise ValueError(f"No memory register {register}")
+            return register
+        index = self.names.get(register)
+        if index is None:
+            used = set(self.names.values())
+            # Register 0 is the unnamed classic memory; names take the others.
+            free = [i for i in range(1, len(self._values)) if i not in used]
+            if not free:
+                raise ValueError(f"No free memory register for {register!r}")
+            index = self.names[register] = free[0]
+        return index
+
+    def __getitem__(self, register):
+        return self._values[self.index(register)]
+
+    def __setitem__(self, register, value):
+        self._values[self.index(register)] = value
+
+    def add(self, register, value):
+        index = self.index(register)
+        self._values[index] += value
+
+    def clear(self, register=None):
+        """Clears one register, or all registers and names."""
+        if register is None:
+            if isinstance(self._values, array):
+                self._values = array('d', bytes(8 * len(self._values)))
+            else:
+                self._values = [self.zero] * len(self._values)
+            self.names.clear()
+        else:
+            self._values[self.index(register)] = self.zero
+
+    def values(self):
+        return list(self._values)
+
+
+def _pack_text(text):
+    data = text.encode('utf-8')
+    return _LENGTH.pack(len(data)) + data
+
+def _unpack_text(data, offset):
+    (length,), offset = _LENGTH.unpack_from(data, offset), offset + _LENGTH.size
+    if offset + length > len(data):
+        raise ValueError("Truncated workspace snapshot")
+    return data[offset:offset + length].decode('utf-8'), offset + length
+
+
+def pack_workspace(session):
+    """Returns the session's memory bank and input state as bytes."""
+    bank = session.memory_bank
+    values = bank._values
+    parts = []
+    if isinstance(values, array):
+        parts.append(_HEADER.pack(_MAGIC, _VERSION, _FLOAT_KIND, len(values)))
+        if sys.byteorder == 'big':
+            values = array('d', values)
+            values.byteswap()
+        parts.append(values.tobytes())
+    else:
+        parts.append(_HEADER.pack(_MAGIC, _VERSION, _TEXT_KIND, len(values)))
+        parts.extend(_pack_text(str(value)) for value in values)
+    position = session.history_position
+    parts.append(_STATE.pack(session.active_register, -1 if position is None else position,
+                             1 if session.just_calculated else 0))
+    parts.append(_pack_text(session.expression))
+    parts.append(_pack_text(session.display))
+    parts.append(_LENGTH.pack(len(bank.names)))
+    for name, index in bank.names.items():
+        parts.append(_pack_text(name) + _INDEX.pack(index))
+    return b''.join(parts)
+
+def unpack_workspace(session, data):
+    """Restores state saved by pack_workspace into session (which must use the same number type).
+
+    Raises ValueError for data that is not a complete, consistent snapshot;
+    the session is left unchanged then.
+    """
+    try:
+        bank, state = _read_workspace(data, session.memory_bank.zero)
+    except struct.error:
+        raise ValueError("Truncated workspace snapshot") from None
+    active, position, flags, expression, display = state
+    session.memory_bank = bank
+    session.active_register = active
+    session.history_position = None if position < 0 else position
+    session.just_calculated = bool(flags & 1)
+    session.expression = expression
+    session.display = display
+
+def _read_workspace(data, zero):
+    magic, version, kind, count = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != _VERSION or kind not in (_FLOAT_KIND, _TEXT_KIND):
+        raise ValueError("Not a workspace snapshot")
+    offset = _HEADER.size
+    # Check the count against the data before allocating the bank.
+    register_size = 8 if kind == _FLOAT_KIND else _LENGTH.size
+    if count * register_size > len(data) - offset:
+        raise ValueError(f"Snapshot claims {count} registers but is only {len(data)} bytes long")
+    bank = MemoryBank(count, zero)
+    if kind == _FLOAT_KIND:
+        if not isinstance(zero, float):
+            raise ValueError("Snapshot holds float registers; the session uses another number type")
+        values = array('d')
+        values.frombytes(data[offset:offset + 8 * count])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        bank._values = values
+        offset += 8 * count
+    else:
+        convert = type(zero)
+        for i in range(count):
+            text, offset = _unpack_text(data, offset)
+            try:
+                bank._values[i] = convert(text)
+            except (ValueError, ArithmeticError): # decimal.InvalidOperation is an ArithmeticError
+                raise ValueError(f"Snapshot register {i} holds {text!r}, not a number") from None
+    active, position, flags = _STATE.unpack_from(data, offset)
+    offset += _STATE.size
+    if active >= count:
+        raise ValueError(f"Snapshot selects register {active} of {count}")
+    expression, offset = _unpack_text(data, offset)
+    display, offset = _unpack_text(data, offset)
+    (name_count,), offset = _LENGTH.unpack_from(data, offset), offset + _LENGTH.size
+    for _ in range(name_count):
+        name, offset = _unpack_text(data, offset)
+        index = _INDEX.unpack_from(data, offset)[0]
+        if index >= count:
+            raise ValueError(f"Snapshot names register {index} of {count}")
+        bank.names[name] = index
+        offset += _INDEX.size
+    return bank, (active, position, flags, expression, display)
@@ -0,0 +1,267 @@
+# This is the optimize.py file.
+# It contains an optimization pass over parsed expression trees.
+
+# --- Expression Optimizer ---
+# optimize_tree() rewrites a parsed tree (see expression.py) with:
+#   constant folding     - literal arithmetic, constants such as `pi` and
+#                          calls of calculator.py functions on constants,
+#                          e.g. `c_light * c_light` or `log10(100)`
+#   identity elimination - `x * 1`, `1 * x`, `x + 0`, `0 + x` and `x - 0`
+#   common subexpressions - repeated subtrees such as the two `x * y` in
+#                          `x * y + sqrt(x * y)` are evaluated once per run
+# Folding uses the same calculator.py functions as evaluation, so results are
+# identical. When folding raises (e.g. `divide(1, 0)`), the subtree becomes an
+# ERROR node that raises the same exception every time the expression is
+# evaluated, so errors are deferred exactly as before instead of surfacing
+# at compile time.
+#
+# Names are only folded when their value is given in `constants`. An
+# OptimizedExpression remembers which names it folded and checks at every
+# evaluation that the context still holds the same objects; otherwise it
+# falls back to the unoptimized compiled expression.
+
+from functools import lru_cache
+
+import calculator as calc_logic
+import expression as expr_engine
+
+NUM, NAME, NEG, POS, BINOP, CALL, ERROR = (
+    expr_engine.NUM, expr_engine.NAME, expr_engine.NEG, expr_engine.POS,
+    expr_engine.BINOP, expr_engine.CALL, expr_engine.ERROR)
+
+# Functions without side effects that may be called at compile time.
+PURE_FUNCTIONS = frozenset((
+    calc_logic.add, calc_logic.subtract, calc_logic.multiply, calc_logic.divide,
+    calc_logic.power, calc_logic.square_root, calc_logic.log_natural,
+    calc_logic.log_base10, calc_logic.sine, calc_logic.cosine, calc_logic.tangent,
+))
+
+# Exceptions a folded computation may raise; they are deferred to evaluation.
+DEFERRED_ERRORS = (ArithmeticError, ValueError, TypeError)
+
+# Node kinds worth sharing when they occur more than once.
+_SHAREABLE = (NEG, BINOP, CALL)
+
+_MISSING = object()
+
+
+# --- Folding and Identities ---
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _is_constant(node):
+    return node[0] in (NUM, ERROR)
+
+def _fold(func, operands):
+    """Calls func on constant operands; returns a NUM node or a deferred ERROR node."""
+    for operand in operands:
+        if operand[0] == ERROR: # Operands are evaluated left to right.
+            return operand
+    try:
+        return (NUM, func(*[operand[1] for operand in operands]))
+    except DEFERRED_ERRORS as e:
+        return (ERROR, type(e), e.args)
+
+def _numeric_identity(node):
+    """Keeps the type check a calculator.py operator would do on an eliminated operand."""
+    if node[0] in (NUM, BINOP):
+        return node # Always a number (or already raising)
+    return (POS, node)
+
+def _is_int(node, value):
+    """Checks for an int literal; 1.0, 0.0 or True as operand could change the result's type."""
+    return node[0] == NUM and type(node[1]) is int and node[1] == value
+
+def _simplify_binop(op, left, right):
+    if op == '*':
+        if _is_int(right, 1):
+            return _numeric_identity(left)
+        if _is_int(left, 1):
+            return _numeric_identity(right)
+    elif op == '+':
+        if _is_int(right, 0):
+            return _numeric_identity(left)
+        if _is_int(left, 0):
+            return _numeric_identity(right)
+    elif op == '-':
+        if _is_int(right, 0):
+            return _numeric_identity(left)
+    # `x / 1` and `x ** 1` are left alone: they turn ints into floats and
+    # can overflow, so removing them would change results.
+    return None
+
+def _optimize_node(node, constants, functions, used):
+    kind = node[0]
+    if kind == NUM or kind == ERROR:
+        return node
+    if kind == NAME:
+        value = constants.get(node[1], _MISSING)
+        if _is_number(value):
+            used[node[1]] = value
+            return (NUM, value)
+        return node
+    if kind in (NEG, POS):
+        operand = _optimize_node(node[1], constants, functions, used)
+        if _is_constant(operand):
+            return _fold((lambda x: -x) if kind == NEG else (lambda x: +x), (operand,))
+        if kind == NEG and operand[0] == NEG:
+            return _numeric_identity(operand[1]) # --x
+        return (kind, operand)
+    if kind == BINOP:
+        op = node[1]
+        left = _optimize_node(node[2], constants, functions, used)
+        right = _optimize_node(node[3], constants, functions, used)
+        if _is_constant(left) and _is_constant(right):
+            return _fold(functions[op], (left, right))
+        if left[0] == ERROR:
+            return left # Raises before the right operand is looked at.
+        return _simplify_binop(op, left, right) or (BINOP, op, left, right)
+    if kind == CALL:
+        args = tuple(_optimize_node(arg, constants, functions, used) for arg in node[2])
+        func = constants.get(node[1], _MISSING)
+        if callable(func) and func in PURE_FUNCTIONS and all(map(_is_constant, args)):
+            used[node[1]] = func
+            return _fold(func, args)
+        return (CALL, node[1], args)
+    return node
+
+def optimize_tree(tree, constants=None, binary_functions=None):
+    """Returns (optimized_tree, folded) where folded maps each folded name to its value.
+
+    `constants` maps names to the values they are assumed to have at
+    evaluation time; names not in it are left alone.
+    """
+    used = {}
+    functions = expr_engine.BINARY_FUNCTIONS if binary_functions is None else binary_functions
+    optimized = _optimize_node(tree, constants or {}, functions, used)
+    return optimized, used
+
+
+# --- Common Subexpressions ---
+
+def subtree_key(node):
+    """Returns a hashable key of a subtree in which every number carries its type.
+
+    Tuples compare 2 == 2.0 == True and 0.0 == -0.0, so the nodes
+    themselves would let `x * 2` and `x * 2.0` share one result.
+    """
+    kind = node[0]
+    if kind == NUM:
+        value = node[1]
+        return (NUM, type(value), value if type(value) is int else repr(value))
+    if kind in (NEG, POS):
+        return (kind, subtree_key(node[1]))
+    if kind == BINOP:
+        return (BINOP, node[1], subtree_key(node[2]), subtree_key(node[3]))
+    if kind == CALL:
+        return (CALL, node[1], tuple(map(subtree_key, node[2])))
+    return node
+
+def shared_subtrees(tree):
+    """Returns the keys (see subtree_key) of non-trivial subtrees that are evaluated more than once."""
+    counts = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        kind = node[0]
+        if kind in _SHAREABLE:
+            key = subtree_key(node)
+            counts[key] = counts.get(key, 0) + 1
+            if counts[key] > 1:
+                continue # Its own subtrees are shared along with it.
+        if kind in (NEG, POS):
+            stack.append(node[1])
+        elif kind == BINOP:
+            stack.extend((node[2], node[3]))
+        elif kind == CALL:
+            stack.extend(node[2])
+    return {key for key, count in counts.items() if count > 1}
+
+def _compile_shared(node, functions, shared, slots):
+    """Like expression._compile_node, but the functions take (ns, values) and shared subtrees use a slot."""
+    key = subtree_key(node) if node[0] in _SHAREABLE else None
+    if key in shared:
+        if key in slots:
+            index = slots[key]
+            return lambda ns, values: values[index]
+        index = slots[key] = len(slots)
+        compute = _compile_unshared(node, functions, shared, slots)
+        def store(ns, values):
+            value = values[index] = compute(ns, values)
+            return value
+        return store
+    return _compile_unshared(node, functions, shared, slots)
+
+def _compile_unshared(node, functions, shared, slots):
+    kind = node[0]
+    if kind in (NEG, POS):
+        operand = _compile_shared(node[1], functions, shared, slots)
+        if kind == NEG:
+            return lambda ns, values: -operand(ns, values)
+        return lambda ns, values: +operand(ns, values)
+    if kind == BINOP:
+        func = functions[node[1]]
+        left = _compile_shared(node[2], functions, shared, slots)
+        right = _compile_shared(node[3], functions, shared, slots)
+        return lambda ns, values: func(left(ns, values), right(ns, values))
+    if kind == CALL:
+        load = expr_engine.compile_tree((NAME, node[1]))
+        args = tuple(_compile_shared(arg, functions, shared, slots) for arg in node[2])
+        return lambda ns, values: load(ns)(*[arg(ns, values) for arg in args])
+    if kind == NUM:
+        value = node[1]
+        return lambda ns, values: value
+    leaf = expr_engine.compile_tree(node, functions) # NAME and ERROR
+    return lambda ns, values: leaf(ns)
+
+def compile_optimized(tree, binary_functions=None):
+    """Compiles an optimized tree into a function of the context, sharing repeated subtrees."""
+    functions = expr_engine.BINARY_FUNCTIONS if binary_functions is None else binary_functions
+    shared = shared_subtrees(tree)
+    if not shared:
+        return expr_engine.compile_tree(tree, functions)
+    slots = {}
+    body = _compile_shared(tree, functions, shared, slots)
+    size = len(slots)
+    return lambda ns: body(ns, [None] * size)
+
+
+# --- Optimized Expressions ---
+
+class OptimizedExpression:
+    """A compiled expression whose constant parts were computed ahead of time."""
+
+    __slots__ = ('source', 'compiled', 'tree', 'folded', 'function', '_checks')
+
+    def __init__(self, source, constants=None):
+        self.source = source
+        self.compiled = expr_engine.compile_expression(source)
+        self.tree, self.folded = optimize_tree(self.compiled.tree, constants)
+        # Evaluates the optimized tree without checking the folded names.
+        self.function = compile_optimized(self.tree)
+        self._checks = tuple(self.folded.items())
+
+    def evaluate(self, context):
+        """Evaluates the expression; uses the unoptimized form if a folded name has changed."""
+        for name, value in self._checks:
+            if context.get(name, _MISSING) is not value:
+                return self.compiled.evaluate(context)
+        return self.function(context)
+
+    __call__ = evaluate
+
+    def __repr__(self):
+        return f"OptimizedExpression({self.source!r})"
+
+@lru_cache(maxsize=expr_engine.CACHE_SIZE)
+def _optimize_normalized(key):
+    return OptimizedExpression(key, expr_engine.default_context())
+
+def optimize_expression(source):
+    """Returns the optimized form of an expression, folding the default context's constants."""
+    return _optimize_normalized(expr_engine.normalize(source))
+
+def evaluate(source, context):
+    """Evaluates an expression through its (cached) optimized form."""
+    return optimize_expression(source).evaluate(context)
@@ -0,0 +1,114 @@
+# This is the parallel.py file.
+# It contains a process-pool evaluator for large expression workloads.
+
+# --- Parallel Batch Evaluation ---
+# Expressions (a list or any iterable, e.g. an open file) are cut into chunks
+# and evaluated by a ProcessPoolExecutor. Each worker builds its evaluation
+# context once in the pool initializer and keeps its own compiled-expression
+# cache, so per-item cost is only the evaluation itself. Only a bounded number
+# of chunks is in flight at a time, so streams of any length can be processed.
+
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+import expression as expr_engine
+from cli import evaluate_line
+from result_cache import ResultCache
+from guard import GuardedEvaluator
+import backends
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Evaluation context, optional result cache and optional guarded evaluator of
+# the current worker process, set by _init_worker.
+_worker_context = None
+_worker_cache = None
+_worker_evaluator = None
+
+
+def _init_worker(cache_size=None, limits=None, backend=None):
+    global _worker_context, _worker_cache, _worker_evaluator
+    _worker_context = expr_engine.default_context()
+    _worker_cache = ResultCache(cache_size) if cache_size else None
+    if backend is not None:
+        _worker_evaluator = backends.get_backend(*backend)
+    elif limits is not None:
+        _worker_evaluator = GuardedEvaluator(limits)
+    else:
+        _worker_evaluator = None
+
+def _evaluate_chunk(lines):
+    """Runs in a worker: evaluates a chunk and returns [(result_str, error), ...]."""
+    context = _worker_context
+    cache = _worker_cache
+    evaluator = _worker_evaluator
+    return [evaluate_line(line, context, cache, evaluator) for line in lines]
+
+def _chunks(expressions, chunk_size):
+    iterator = iter(expressions)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+def _flatten(start, chunk, future):
+    results = future.result()
+    for offset, (line, (result_str, error)) in enumerate(zip(chunk, results)):
+        yield start + offset, line, result_str, error
+
+def evaluate_parallel(expressions, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                      ordered=True, max_pending=None, cache_size=None, limits=None,
+                      backend=None):
+    """Evaluates expressions across worker processes.
+
+    Yields (index, line, result_str, error) for every input expression, where
+    `error` is the exception raised for that expression or None. With
+    ordered=True results come back in input order; otherwise each chunk is
+    yielded as soon as it finishes. `max_pending` limits the number of
+    chunks in flight (default: twice the worker count). With `cache_size`
+    set, every worker keeps a ResultCache of that size; with `limits` (a
+    guard.Limits) every evaluation is resource-limited; `backend` is a
+    (name, precision) pair selecting a numeric backend from backends.py.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * workers
+    chunks = _chunks(expressions, chunk_size)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_size, limits, backend)) as pool:
+        if ordered:
+            pending = deque()
+            for start, chunk in chunks:
+                pending.append((start, chunk, pool.submit(_evaluate_chunk, chunk)))
+                if len(pending) >= max_pending:
+                    yield from _flatten(*pending.popleft())
+            while pending:
+                yield from _flatten(*pending.popleft())
+        else:
+            # The chunk (and its start index) is kept in the parent, so only
+            # the results travel back from the workers.
+            pending = {}
+            for start, chunk in chunks:
+                pending[pool.submit(_evaluate_chunk, chunk)] = (start, chunk)
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        start, chunk = pending.pop(future)
+                        yield from _flatten(start, chunk, future)
+            for future in as_completed(pending):
+                start, chunk = pending[future]
+                yield from _flatten(start, chunk, future)
+
+def evaluate_all(expressions, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Evaluates expressions in parallel and returns a list of (result_str, error) in input order."""
+    return [(result_str, error) for _, _, result_str, error
+            in evaluate_parallel(expressions, workers=workers, chunk_size=chunk_size)]
@@ -0,0 +1,377 @@
+# This is the plot.py file.
+# It contains tabulation and plotting of one-variable expressions.
+
+# --- Sampling ---
+# sample() evaluates an expression of x (a formula.Formula) over a range in
+# one vectorized pass (NumPy, see vector.py), then refines where the uniform
+# grid cannot be trusted, each round again in one vectorized pass:
+#   - at the edges of the domain, where the values turn into NaN (log and
+#     sqrt near zero, the poles tangent guards against)
+#   - where the curve bends sharply compared to its values (poles such as
+#     1/x or tan near pi/2, and undersampled oscillation)
+# Sign changes that stay sharp after refinement are poles; a NaN is
+# inserted there so the plot does not join +inf and -inf with a line.
+#
+# --- Drawing and Export ---
+# downsample() reduces the samples in view to the lowest and highest value
+# per pixel column, so drawing costs the same for 10^3 or 10^6 points and no
+# peak is lost. PlotWindow draws on a Tk canvas: the mouse wheel zooms around
+# the pointer, dragging pans, 'r' resets the view. Redraws are coalesced in
+# after_idle, and the visible range is sampled again when zooming in runs
+# out of samples. tabulate() yields (x, y) rows of a uniform grid one chunk
+# at a time and write_csv() streams rows to a file, so tables of any size
+# are written in constant memory (NumPy is optional there).
+#
+# Usage:
+#   xs, ys = sample("tan(x)", -5, 5, points=1000000)
+#   write_csv("tablo.csv", tabulate("sin(x) / x", 1, 100, points=10**7))
+#   python HesapMakinesi/plot.py "tan(x)" --range -5 5 --plot
+#   python HesapMakinesi/plot.py "log(x)" --range 0 2 --points 11
+
+import argparse
+import csv
+import sys
+from itertools import islice
+
+from formula import Formula
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+DEFAULT_RANGE = (-10.0, 10.0)
+DEFAULT_POINTS = 2000
+REFINE_ROUNDS = 6
+SUBDIVISIONS = 8 # Points added inside each interval that is refined
+BEND_THRESHOLD = 0.5 # |second difference| relative to the values around it
+CHUNK_SIZE = 65536
+
+
+def _formula(source, variable, context):
+    if isinstance(source, Formula):
+        return source
+    return Formula(source, [variable], context)
+
+
+# --- Sampling ---
+
+def _bend(ys):
+    """Returns |y[i-1] - 2 y[i] + y[i+1]| / (|y[i-1]| + |y[i]| + |y[i+1]|) for the inner points."""
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        second = np.abs(ys[:-2] - 2 * ys[1:-1] + ys[2:])
+        scale = np.abs(ys[:-2]) + np.abs(ys[1:-1]) + np.abs(ys[2:])
+        bend = second / scale
+    bend[~np.isfinite(bend)] = 0
+    return bend
+
+def _refine_scores(xs, ys):
+    """Returns a score per interval (xs[i], xs[i + 1]); intervals scoring above 0 need more samples."""
+    finite = np.isfinite(ys)
+    scores = np.where(finite[:-1] != finite[1:], np.inf, 0.0)
+    bend = _bend(ys)
+    sharp = np.where(bend > BEND_THRESHOLD, bend, 0.0)
+    # A sharp bend at point i is refined on both sides of it
+    scores[:-1] = np.maximum(scores[:-1], sharp)
+    scores[1:] = np.maximum(scores[1:], sharp)
+    # Intervals at the resolution of floats cannot be split any more
+    resolution = 4 * np.finfo(np.float64).eps * np.maximum(np.abs(xs[:-1]), 1.0)
+    scores[np.diff(xs) <= resolution] = 0
+    return scores
+
+def _break_poles(xs, ys):
+    """Inserts a NaN inside the sign changes that are still sharp bends (poles)."""
+    if ys.size < 3:
+        return xs, ys
+    sharp = np.zeros(ys.shape, dtype=bool)
+    sharp[1:-1] = _bend(ys) > BEND_THRESHOLD
+    with np.errstate(invalid='ignore'):
+        flips = np.flatnonzero((np.sign(ys[:-1]) * np.sign(ys[1:]) < 0) & sharp[:-1] & sharp[1:])
+    if not flips.size:
+        return xs, ys
+    middle = (xs[flips] + xs[flips + 1]) / 2
+    return np.insert(xs, flips + 1, middle), np.insert(ys, flips + 1, np.nan)
+
+def sample(source, start, stop, points=DEFAULT_POINTS, variable='x', context=None,
+           refine=REFINE_ROUNDS):
+    """Samples an expression of one variable over [start, stop]; returns (xs, ys) arrays.
+
+    The uniform grid of `points` samples is refined near singularities with
+    at most `points` extra samples. Invalid values are NaN.
+    """
+    if np is None:
+        raise ImportError("Sampling requires NumPy (pip install numpy)")
+    formula = _formula(source, variable, context)
+    xs = np.linspace(float(start), float(stop), int(points))
+    ys = formula.evaluate_columns(xs, errors='nan')
+    budget = int(points)
+    fractions = np.arange(1, SUBDIVISIONS + 1) / (SUBDIVISIONS + 1)
+    for _ in range(refine):
+        if xs.size < 2:
+            break
+        scores = _refine_scores(xs, ys)
+        candidates = np.flatnonzero(scores > 0)
+        limit = budget // SUBDIVISIONS
+        if not candidates.size or not limit:
+            break
+        if candidates.size > limit: # Keep the worst intervals
+            candidates = np.sort(candidates[np.argsort(scores[candidates])[-limit:]])
+        left = xs[candidates]
+        new_xs = (left[:, None] + (xs[candidates + 1] - left)[:, None] * fractions).ravel()
+        new_ys = formula.evaluate_columns(new_xs, errors='nan')
+        positions = np.repeat(candidates + 1, SUBDIVISIONS)
+        xs = np.insert(xs, positions, new_xs)
+        ys = np.insert(ys, positions, new_ys)
+        budget -= new_xs.size
+    return _break_poles(xs, ys)
+
+
+# --- Downsampling ---
+
+def downsample(xs, ys, start, stop, width):
+    """Reduces the samples in [start, stop] to pixel columns 0..width-1.
+
+    Returns (columns, low, high, gap) arrays with one entry per run of valid
+    samples in a column: its column, lowest and highest value, and whether
+    the curve breaks before it (invalid samples lie in between). A column
+    holding a pole or a domain edge therefore gives one entry per side.
+    """
+    first, last = np.searchsorted(xs, [start, stop], side='left')
+    last = min(last + 1, xs.size) # Include the sample at (or just after) stop
+    xs, ys = xs[first:last], ys[first:last]
+    if not xs.size or stop <= start:
+        empty = np.empty(0)
+        return empty.astype(np.intp), empty, empty, empty.astype(bool)
+    columns = ((xs - start) * (width / (stop - start))).astype(np.intp)
+    np.clip(columns, 0, width - 1, out=columns)
+    invalid = ~np.isfinite(ys)
+    segments = np.cumsum(invalid) # Changes after every invalid sample
+    valid = ~invalid
+    columns, segments, ys = columns[valid], segments[valid], ys[valid]
+    if not ys.size:
+        empty = np.empty(0)
+        return empty.astype(np.intp), empty, empty, empty.astype(bool)
+    starts = np.flatnonzero(np.r_[True, (columns[1:] != columns[:-1])
+                                  | (segments[1:] != segments[:-1])])
+    low = np.minimum.reduceat(ys, starts)
+    high = np.maximum.reduceat(ys, starts)
+    segments = segments[starts]
+    gap = np.r_[False, segments[1:] != segments[:-1]]
+    return columns[starts], low, high, gap
+
+def polylines(columns, low, high, gap):
+    """Groups downsampled columns into lines of (column, value) points, split at gaps."""
+    lines = []
+    line = []
+    for column, lo, hi, broken in zip(columns.tolist(), low.tolist(), high.tolist(), gap.tolist()):
+        if broken and line:
+            lines.append(line)
+            line = []
+        # Enter the column at the end nearer to where the line comes from
+        if line and abs(line[-1][1] - hi) < abs(line[-1][1] - lo):
+            lo, hi = hi, lo
+        line.append((column, lo))
+        if hi != lo:
+            line.append((column, hi))
+    if line:
+        lines.append(line)
+    return lines
+
+def value_range(xs, ys, start, stop, probes=4096):
+    """Returns the (bottom, top) of the view of [start, stop], ignoring the spikes at poles.
+
+    The values are read at evenly spaced x, so the extra samples the
+    refinement puts next to poles do not widen the range.
+    """
+    if not xs.size:
+        return -1.0, 1.0
+    indexes = np.searchsorted(xs, np.linspace(start, stop, probes))
+    values = ys[np.clip(indexes, 0, xs.size - 1)]
+    values = values[np.isfinite(values)]
+    if not values.size:
+        return -1.0, 1.0
+    if values.size > 50:
+        bottom, top = np.percentile(values, [2, 98])
+    else:
+        bottom, top = values.min(), values.max()
+    if top - bottom < 1e-12:
+        return float(bottom - 1), float(top + 1)
+    margin = (top - bottom) * 0.05
+    return float(bottom - margin), float(top + margin)
+
+
+# --- Tables and CSV ---
+
+def tabulate(source, start, stop, points=DEFAULT_POINTS, variable='x', context=None,
+             chunk_size=CHUNK_SIZE):
+    """Lazily yields (x, y) for `points` evenly spaced x; failing values are NaN.
+
+    Each chunk is evaluated in one vectorized pass when NumPy is installed.
+    """
+    formula = _formula(source, variable, context)
+    points = int(points)
+    step = (stop - start) / (points - 1) if points > 1 else 0.0
+    for offset in range(0, points, chunk_size):
+        count = min(chunk_size, points - offset)
+        if np is not None:
+            xs = start + step * np.arange(offset, offset + count, dtype=np.float64)
+            yield from zip(xs.tolist(), formula.evaluate_columns(xs, errors='nan').tolist())
+        else:
+            xs = [start + step * i for i in range(offset, offset + count)]
+            yield from zip(xs, formula.map(xs, errors='nan'))
+
+def write_csv(target, rows, header=('x', 'y')):
+    """Writes rows of numbers to a CSV file (path or open text file) as they are produced.
+
+    Returns the number of rows written. Rows are formatted a chunk at a
+    time with repr(), so values read back exactly.
+    """
+    if isinstance(target, str):
+        with open(target, 'w', newline='', encoding='utf-8') as f:
+            return write_csv(f, rows, header)
+    if header:
+        csv.writer(target, lineterminator='\n').writerow(header)
+    rows = iter(rows)
+    count = 0
+    template = None
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return count
+        if template is None:
+            template = ",".join(["%r"] * len(chunk[0])) + "\n"
+        target.write("".join(map(template.__mod__, map(tuple, chunk))))
+        count += len(chunk)
+
+
+# --- Tk Plot Window ---
+
+class PlotWindow:
+    """Plots an expression of x on a Tk canvas (mouse wheel zooms, dragging pans, 'r' resets)."""
+
+    WIDTH = 640
+    HEIGHT = 420
+    LINE_COLOR = '#2196F3'
+    AXIS_COLOR = '#b0b0b0'
+    ZOOM_STEP = 1.25
+
+    def __init__(self, master, source, start=DEFAULT_RANGE[0], stop=DEFAULT_RANGE[1],
+                 points=DEFAULT_POINTS, variable='x', context=None):
+        import tkinter as tk # Imported lazily: plotting is opened on demand
+        self.formula = _formula(source, variable, context)
+        self.points = points
+        self.home = (float(start), float(stop))
+        self.view = self.home
+        self.xs, self.ys = sample(self.formula, start, stop, points)
+        self.redraw_pending = False
+        self.drag_x = None
+
+        self.window = tk.Toplevel(master) if master is not None else tk.Tk()
+        self.window.title(f"y = {self.formula.source}")
+        self.canvas = tk.Canvas(self.window, width=self.WIDTH, height=self.HEIGHT, bg='white',
+                                highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.canvas.bind('<Configure>', lambda event: self.schedule_redraw())
+        self.canvas.bind('<MouseWheel>', lambda event: self.zoom(event.x, event.delta > 0))
+        self.canvas.bind('<Button-4>', lambda event: self.zoom(event.x, True)) # X11 wheel
+        self.canvas.bind('<Button-5>', lambda event: self.zoom(event.x, False))
+        self.canvas.bind('<ButtonPress-1>', self._start_drag)
+        self.canvas.bind('<B1-Motion>', self._drag)
+        self.window.bind('r', lambda event: self.set_view(*self.home))
+        self.schedule_redraw()
+
+    def schedule_redraw(self):
+        """Redraws once the pending events are handled (many requests cause one redraw)."""
+        if not self.redraw_pending:
+            self.redraw_pending = True
+            self.window.after_idle(self.redraw)
+
+    def set_view(self, start, stop):
+        self.view = (start, stop)
+        first, last = np.searchsorted(self.xs, [start, stop])
+        if start < self.xs[0] or stop > self.xs[-1] or last - first < self.canvas.winfo_width():
+            self.xs, self.ys = sample(self.formula, start, stop, self.points)
+        self.schedule_redraw()
+
+    def zoom(self, pixel, zoom_in):
+        start, stop = self.view
+        width = max(self.canvas.winfo_width(), 1)
+        center = start + (stop - start) * pixel / width
+        factor = 1 / self.ZOOM_STEP if zoom_in else self.ZOOM_STEP
+        self.set_view(center - (center - start) * factor, center + (stop - center) * factor)
+
+    def _start_drag(self, event):
+        self.drag_x = event.x
+
+    def _drag(self, event):
+        start, stop = self.view
+        shift = (self.drag_x - event.x) * (stop - start) / max(self.canvas.winfo_width(), 1)
+        self.drag_x = event.x
+        self.set_view(start + shift, stop + shift)
+
+    def redraw(self):
+        self.redraw_pending = False
+        canvas = self.canvas
+        width, height = max(canvas.winfo_width(), 2), max(canvas.winfo_height(), 2)
+        start, stop = self.view
+        columns, low, high, gap = downsample(self.xs, self.ys, start, stop, width)
+        bottom, top = value_range(self.xs, self.ys, start, stop)
+        scale = (height - 1) / (top - bottom)
+        canvas.delete('all')
+        if bottom < 0 < top: # x axis
+            y0 = (top - 0) * scale
+            canvas.create_line(0, y0, width, y0, fill=self.AXIS_COLOR)
+        if start < 0 < stop: # y axis
+            x0 = -start * width / (stop - start)
+            canvas.create_line(x0, 0, x0, height, fill=self.AXIS_COLOR)
+        for line in polylines(columns, low, high, gap):
+            coords = []
+            for column, value in line:
+                # Clamp far outside values (pole spikes) so Tk gets sane coordinates
+                y = min(max((top - value) * scale, -height), 2 * height)
+                coords.extend((column, y))
+            if len(coords) == 2:
+                coords.extend((coords[0] + 1, coords[1]))
+            canvas.create_line(*coords, fill=self.LINE_COLOR)
+        canvas.create_text(4, 4, anchor='nw', fill='#808080',
+                           text=f"x: {start:.4g} .. {stop:.4g}   y: {bottom:.4g} .. {top:.4g}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tabulate or plot an expression of x.")
+    parser.add_argument("expression", help="expression of x, e.g. \"tan(x)\"")
+    parser.add_argument("--range", nargs=2, type=float, default=DEFAULT_RANGE,
+                        metavar=("START", "STOP"), help="range of x (default: -10 10)")
+    parser.add_argument("--points", type=float, default=DEFAULT_POINTS,
+                        help="number of samples (default: %(default)s)")
+    parser.add_argument("--variable", default='x', help="name of the variable (default: x)")
+    parser.add_argument("-o", "--output", help="write the CSV table to this file instead of stdout")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="tabulate the adaptive samples (refined near singularities; needs NumPy)")
+    parser.add_argument("--plot", action="store_true", help="show the plot in a window")
+    args = parser.parse_args(argv)
+    start, stop = args.range
+    points = int(args.points)
+    try:
+        formula = Formula(args.expression, [args.variable])
+    except (SyntaxError, NameError) as e:
+        parser.error(str(e))
+    if args.plot:
+        window = PlotWindow(None, formula, start, stop, points)
+        window.window.mainloop()
+        return 0
+    if args.adaptive:
+        xs, ys = sample(formula, start, stop, points)
+        rows = zip(xs.tolist(), ys.tolist())
+    else:
+        rows = tabulate(formula, start, stop, points)
+    header = (args.variable, 'y')
+    if args.output:
+        write_csv(args.output, rows, header)
+    else:
+        write_csv(sys.stdout, rows, header)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
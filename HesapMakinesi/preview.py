@@ -0,0 +1,332 @@
+# This is the preview.py file.
+# It contains an incremental evaluator for live previews of a growing expression.
+
+# --- Incremental Evaluation ---
+# IncrementalEvaluator keeps its parse state between updates. The state is an
+# operator-precedence (shift-reduce) parser whose stacks are immutable linked
+# lists, and every sub-expression is reduced to its value as soon as the
+# precedence rules allow. Appending text therefore only touches the
+# right-hand edge of the expression: the text is re-tokenized from the start
+# of the last token before the change (so "12" -> "123" works), using the
+# state saved at that token, and only the new tokens are fed in.
+#
+# preview() returns the value of the input as if it ended at the last
+# complete operand: a trailing operator is ignored and open parentheses and
+# function calls are closed, e.g. "2 * (3 + 4" previews as 14. value() is
+# strict and behaves like expression.evaluate() on the full text, including
+# which error is raised first.
+#
+# update(text, deadline) stops feeding tokens once time.perf_counter() passes
+# the deadline and returns False; calling resume() later continues where it
+# stopped. The GUI uses this to stay inside one frame (~16 ms) even when a
+# very long expression is pasted in.
+#
+# Usage outside the GUI (streaming appends):
+#   incremental = IncrementalEvaluator()
+#   for chunk in chunks:
+#       incremental.append(chunk)
+#       print(incremental.preview())
+
+import operator
+import time
+from bisect import bisect_left
+
+import expression as expr_engine
+
+FRAME_BUDGET = 0.016 # seconds; one frame at 60 Hz
+
+# Binary operator precedence; unary +/- sit between '*' and '**'.
+_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '**': 4}
+_UNARY_PRECEDENCE = 3
+_UNARY_FUNCTIONS = {'-': operator.neg, '+': operator.pos}
+
+# Frame kinds
+_TOP = 'top'
+_GROUP = 'group' # ( ... )
+_CALL = 'call'   # name( ... , ... )
+
+# Characters the tokenizer may look at past the end of a token: a number
+# followed by "e+" only ends there if no digit follows ("1e+" vs "1e+5").
+_TOKEN_LOOKAHEAD = 3
+
+# Tokens fed between two deadline checks.
+_CHECK_EVERY = 64
+
+
+class _Failed:
+    """A value whose computation raised; the error surfaces when the value is used."""
+
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _invoke(func, args):
+    """Calls func(*args), propagating the first failed value (callee first, then arguments)."""
+    if isinstance(func, _Failed):
+        return func
+    for arg in args:
+        if isinstance(arg, _Failed):
+            return arg
+    try:
+        return func(*args)
+    except Exception as e:
+        return _Failed(e)
+
+def _lookup(context, name):
+    try:
+        return context[name]
+    except KeyError:
+        return _Failed(NameError(f"name '{name}' is not defined"))
+
+
+class _Frame:
+    """One nesting level of the parse state. Frames are never modified after creation.
+
+    operands and operators are linked lists of (head, tail) pairs, args holds
+    the finished arguments of a call (newest first) in the same form.
+    """
+
+    __slots__ = ('kind', 'func', 'args', 'operands', 'operators',
+                 'expect_operand', 'last_name', 'parent')
+
+    def __init__(self, kind, func=None, args=None, operands=None, operators=None,
+                 expect_operand=True, last_name=None, parent=None):
+        self.kind = kind
+        self.func = func
+        self.args = args
+        self.operands = operands
+        self.operators = operators
+        self.expect_operand = expect_operand
+        self.last_name = last_name
+        self.parent = parent
+
+    def replace(self, **changes):
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return _Frame(**fields)
+
+    # The two hot paths build the new frame directly instead of via replace().
+    def with_operand(self, value, last_name=None):
+        return _Frame(self.kind, self.func, self.args, (value, self.operands), self.operators,
+                      False, last_name, self.parent)
+
+    def with_operator(self, op):
+        return _Frame(self.kind, self.func, self.args, self.operands, (op, self.operators),
+                      True, None, self.parent)
+
+    def reduced(self, above, functions):
+        """Applies pending operators with a precedence higher than `above`."""
+        operands, operators = self.operands, self.operators
+        if operators is None or operators[0][1] <= above:
+            return self
+        while operators is not None and operators[0][1] > above:
+            (op, _, unary), operators = operators
+            if unary:
+                value, operands = operands
+                operands = (_invoke(_UNARY_FUNCTIONS[op], (value,)), operands)
+            else:
+                right, (left, operands) = operands
+                operands = (_invoke(functions[op], (left, right)), operands)
+        return self.replace(operands=operands, operators=operators)
+
+    def drop_dangling(self):
+        """Removes trailing operators that are still waiting for their operand."""
+        operators = self.operators
+        while operators is not None and operators[0][2]: # unary, e.g. the '-' in "2 * -"
+            operators = operators[1]
+        if operators is not None and self.operands is not None:
+            # Unary operators only follow a binary one (or the start of the
+            # frame), so the binary operator now on top lacks its right operand.
+            operators = operators[1]
+        return self.replace(operators=operators, expect_operand=False)
+
+    def arguments(self, last=None):
+        args = list(_walk(self.args))
+        args.reverse()
+        if last is not None:
+            args.append(last)
+        return tuple(args)
+
+
+def _walk(linked):
+    while linked is not None:
+        head, linked = linked
+        yield head
+
+def _frame_value(frame, functions):
+    """Returns the single value of a complete frame."""
+    return frame.reduced(0, functions).operands[0]
+
+
+def _feed(frame, kind, value, context, functions):
+    """Returns the state after one more token; raises SyntaxError if the token cannot follow."""
+    if kind == 'num' or kind == 'name':
+        if not frame.expect_operand:
+            raise SyntaxError(f"Unexpected token {str(value)!r}")
+        if kind == 'num':
+            return frame.with_operand(value)
+        return frame.with_operand(_lookup(context, value), last_name=value)
+    if value == '(':
+        if frame.expect_operand:
+            return _Frame(_GROUP, parent=frame)
+        if frame.last_name is None:
+            raise SyntaxError("Unexpected token '('")
+        func, operands = frame.operands
+        parent = frame.replace(operands=operands, expect_operand=True, last_name=None)
+        return _Frame(_CALL, func=func, parent=parent)
+    if frame.expect_operand:
+        if value in _UNARY_FUNCTIONS:
+            return frame.with_operator((value, _UNARY_PRECEDENCE, True))
+        if not (value == ')' and frame.kind == _CALL and frame.args is None
+                and frame.operands is None and frame.operators is None):
+            raise SyntaxError(f"Unexpected token {value!r}")
+        return frame.parent.with_operand(_invoke(frame.func, ())) # name()
+    precedence = _PRECEDENCE.get(value)
+    if precedence is not None:
+        # '**' is right associative: it does not reduce an earlier '**'.
+        frame = frame.reduced(precedence if value == '**' else precedence - 1, functions)
+        return frame.with_operator((value, precedence, False))
+    if value == ',':
+        if frame.kind != _CALL:
+            raise SyntaxError("Unexpected token ','")
+        return _Frame(_CALL, func=frame.func, parent=frame.parent,
+                      args=(_frame_value(frame, functions), frame.args))
+    if value == ')':
+        if frame.kind == _TOP:
+            raise SyntaxError("Unexpected token ')'")
+        result = _frame_value(frame, functions)
+        if frame.kind == _CALL:
+            result = _invoke(frame.func, frame.arguments(result))
+        return frame.parent.with_operand(result)
+    raise SyntaxError(f"Unexpected token {value!r}")
+
+
+class IncrementalEvaluator:
+    """Evaluates an expression that changes a little at a time (typically at the end)."""
+
+    def __init__(self, context=None, binary_functions=None):
+        self.context = expr_engine.default_context() if context is None else context
+        self.functions = expr_engine.BINARY_FUNCTIONS if binary_functions is None else binary_functions
+        self.text = ""
+        self._top = _Frame(_TOP)
+        self._frame = self._top
+        self._checkpoints = [] # (token start, state before the token), in text order
+        self._tokens = None    # token iterator while feeding is unfinished
+        self._error = None     # SyntaxError of the current text, if any
+        self._error_end = None # end of the token that caused it
+
+    def update(self, text, deadline=None):
+        """Moves to a new text. Returns False if the deadline stopped feeding early (see resume)."""
+        if text == self.text and self._tokens is None:
+            return True
+        prefix = _common_prefix_length(self.text, text)
+        self.text = text
+        stable = prefix - _TOKEN_LOOKAHEAD
+        if self._error is not None and self._error_end is not None and self._error_end <= stable:
+            return True # The failing token and the text after it are unchanged.
+        # Restart at a token that the change cannot affect; it and the tokens
+        # after it are fed again (the last one may have grown, e.g. "12" -> "123").
+        index = bisect_left(self._checkpoints, stable + 1, key=_position) - 1
+        if index < 0:
+            start, self._frame = 0, self._top
+            self._checkpoints.clear()
+        else:
+            start, self._frame = self._checkpoints[index]
+            del self._checkpoints[index:]
+        self._error = self._error_end = None
+        self._tokens = expr_engine.iter_tokens(text, start)
+        return self.resume(deadline)
+
+    def append(self, text, deadline=None):
+        """Appends text to the expression (see update)."""
+        return self.update(self.text + text, deadline)
+
+    def resume(self, deadline=None):
+        """Continues feeding tokens after a deadline stop; returns True when the whole text is fed."""
+        tokens = self._tokens
+        if tokens is None:
+            return True
+        frame = self._frame
+        checkpoints = self._checkpoints
+        context, functions = self.context, self.functions
+        fed = 0
+        try:
+            for kind, value, start, end in tokens:
+                checkpoints.append((start, frame))
+                try:
+                    frame = _feed(frame, kind, value, context, functions)
+                except SyntaxError as e:
+                    self._error, self._error_end = e, end
+                    break
+                fed += 1
+                if deadline is not None and fed % _CHECK_EVERY == 0 and time.perf_counter() > deadline:
+                    self._frame = frame
+                    return False
+        except SyntaxError as e: # Raised by the tokenizer
+            self._error = e
+        self._frame = frame
+        self._tokens = None
+        return True
+
+    @property
+    def pending(self):
+        """True while a deadline stop left part of the text unfed."""
+        return self._tokens is not None
+
+    def value(self):
+        """Evaluates the whole text; raises like expression.evaluate() would."""
+        if self._tokens is not None:
+            self.resume()
+        if self._error is not None:
+            raise self._error
+        frame = self._frame
+        if frame.kind != _TOP or frame.expect_operand:
+            raise SyntaxError("Empty expression" if frame is self._top else "Unexpected end of expression")
+        result = _frame_value(frame, self.functions)
+        if isinstance(result, _Failed):
+            raise result.error
+        return result
+
+    def preview(self):
+        """Returns the value of the text up to its last complete operand, or None if there is none."""
+        if self._tokens is not None or self._error is not None:
+            return None
+        functions = self.functions
+        frame = self._frame
+        value = None
+        while True:
+            if frame.expect_operand:
+                frame = frame.drop_dangling()
+            if frame.operands is not None:
+                value = _frame_value(frame, functions)
+            if frame.kind == _TOP:
+                break
+            parent = frame.parent
+            if frame.kind == _CALL:
+                args = frame.arguments(value)
+                value = _invoke(frame.func, args) if args else None
+            if value is not None:
+                parent = parent.with_operand(value)
+            frame, value = parent, None
+        if value is None or isinstance(value, _Failed):
+            return None
+        return value
+
+
+def _position(checkpoint):
+    return checkpoint[0]
+
+def _common_prefix_length(a, b):
+    if b.startswith(a):
+        return len(a)
+    length = min(len(a), len(b))
+    low, high = 0, length
+    while low < high: # Binary search on slice equality (C-speed compares)
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
@@ -0,0 +1,98 @@
+# This is the result_cache.py file.
+# It contains an opt-in memoization layer for expression results.
+
+# --- Result Cache ---
+# Every function reachable from the evaluation context is pure, so the
+# result of an expression only depends on its text and on the context.
+# ResultCache keeps recent results keyed by the normalized expression string
+# with LRU eviction by size and optional time-to-live. Only successful
+# results are cached; failing expressions are evaluated again each time.
+# Call invalidate() whenever the constants or the function table change.
+
+import time
+from collections import OrderedDict
+
+import expression as expr_engine
+
+_MISSING = object()
+
+
+class ResultCache:
+    """Bounded LRU cache of expression results with optional TTL."""
+
+    def __init__(self, maxsize=4096, ttl=None, clock=time.monotonic):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive or None")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict() # key -> (result, expires_at)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Returns the cached result for a normalized key, or default."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        result, expires_at = entry
+        if expires_at is not None and self._clock() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """Stores a result, evicting the least recently used entry when full."""
+        expires_at = None if self.ttl is None else self._clock() + self.ttl
+        self._entries[key] = (result, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def evaluate(self, source, context, evaluator=None):
+        """Evaluates an expression, answering from the cache when possible.
+
+        `evaluator` (e.g. a guard.GuardedEvaluator) computes misses instead of
+        the plain expression engine.
+        """
+        key = expr_engine.normalize(source)
+        entry = self.get(key, _MISSING)
+        if entry is not _MISSING:
+            return entry
+        if evaluator is not None:
+            result = evaluator.evaluate(key, context)
+        else:
+            result = expr_engine.evaluate(key, context)
+        self.put(key, result)
+        return result
+
+    def invalidate(self, key=None):
+        """Drops one normalized key, or every entry when key is None."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        """Returns the cache counters as a dict."""
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
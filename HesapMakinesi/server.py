@@ -0,0 +1,354 @@
+# This is the server.py file.
+# It contains an asyncio evaluation service reachable over local HTTP.
+
+# --- Evaluation Service ---
+# EvaluationService accepts single expressions or lists of expressions,
+# coalesces concurrent requests into micro-batches (up to max_batch
+# expressions or max_delay seconds) and evaluates every batch in a worker pool
+# with the same evaluation code as parallel.py, so the event loop never runs
+# an evaluation itself. max_pending bounds the number of expressions queued
+# or being evaluated, including those of requests that already timed out
+# (further requests are rejected with Overloaded), every request has a
+# timeout and request latencies are recorded in a histogram.
+#
+# The service speaks a tiny subset of HTTP/1.1 (with keep-alive) on either a
+# localhost TCP port or a Unix socket:
+#   POST /evaluate  {"expression": "1 + 2"}         -> {"result": "3"}
+#   POST /evaluate  {"expressions": ["1", "1 / 0"]} -> {"results": [...]}
+#   GET  /stats     counters and the latency histogram
+#   GET  /health    {"status": "ok"}
+#
+# Usage:
+#   python HesapMakinesi/server.py --port 8765
+#   python HesapMakinesi/server.py --unix /tmp/hesap.sock --workers 4
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import parallel
+from guard import Limits
+
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class Overloaded(Exception):
+    """Raised when accepting a request would exceed the pending-expression limit."""
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (bucket bounds in milliseconds)."""
+
+    BOUNDS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1) # last bucket is +Inf
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def quantile(self, q):
+        """Returns the upper bound (ms) of the bucket holding the q-quantile."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.BOUNDS_MS, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return self.max_ms
+
+    def snapshot(self):
+        buckets = {f"le_{bound}": n for bound, n in zip(self.BOUNDS_MS, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            'count': self.count,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'max_ms': self.max_ms,
+            'p50_ms': self.quantile(0.5),
+            'p99_ms': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+class EvaluationService:
+    """Micro-batching evaluator running batches in a worker pool."""
+
+    def __init__(self, workers=None, use_processes=True, max_batch=512, max_delay=0.002,
+                 max_pending=100000, timeout=5.0, cache_size=None, limits=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.limits = limits # Optional guard.Limits applied in the workers
+        self.latency = LatencyHistogram()
+        self.counters = {'requests': 0, 'expressions': 0, 'batches': 0,
+                         'rejected': 0, 'timeouts': 0}
+        self._pending = 0
+        self._queue = None
+        self._executor = None
+        self._batch_task = None
+
+    async def start(self):
+        if self.use_processes:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=parallel._init_worker,
+                initargs=(self.cache_size, self.limits))
+            # Start the workers now, before start_server() listens: forked
+            # workers would otherwise inherit the listening socket and the
+            # first client's connection and keep them open.
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(self._executor, parallel._evaluate_chunk, [])
+                                   for _ in range(self.workers)])
+        else:
+            # Thread workers share one module-level context; ResultCache is not
+            # thread-safe, so no cache is used in this mode.
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, initializer=parallel._init_worker,
+                initargs=(None, self.limits))
+        self._queue = asyncio.Queue()
+        self._batch_task = asyncio.create_task(self._batch_loop())
+
+    async def close(self):
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            try:
+                await self._batch_task
+            except asyncio.CancelledError:
+                pass
+            self._batch_task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def evaluate(self, expressions):
+        """Evaluates a list of expressions; returns [(result_str, error), ...]."""
+        if self._pending + len(expressions) > self.max_pending:
+            self.counters['rejected'] += 1
+            raise Overloaded(f"More than {self.max_pending} expressions pending")
+        started = time.perf_counter()
+        self.counters['requests'] += 1
+        self.counters['expressions'] += len(expressions)
+        self._pending += len(expressions)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((expressions, future))
+        # The batch loop releases the pending count when it drops or finishes
+        # the request, so a timed-out request keeps counting while it runs.
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_delay
+            while size < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            # Requests whose caller already timed out are dropped here.
+            live = []
+            for expressions, future in batch:
+                if future.done():
+                    self._pending -= len(expressions)
+                else:
+                    live.append((expressions, future))
+            batch = live
+            if not batch:
+                continue
+            lines = [expr for expressions, _ in batch for expr in expressions]
+            self.counters['batches'] += 1
+            work = loop.run_in_executor(self._executor, parallel._evaluate_chunk, lines)
+            work.add_done_callback(lambda done, batch=batch: self._dispatch(batch, done))
+
+    def _dispatch(self, batch, done):
+        self._pending -= sum(len(expressions) for expressions, _ in batch)
+        if done.cancelled():
+            return
+        error = done.exception()
+        results = None if error is not None else done.result()
+        start = 0
+        for expressions, future in batch:
+            end = start + len(expressions)
+            if not future.done():
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[start:end])
+            start = end
+
+    def stats(self):
+        return dict(self.counters, pending=self._pending, latency=self.latency.snapshot())
+
+
+# --- HTTP Front End ---
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+def _result_json(expression, result_str, error):
+    if error is None:
+        return {'expression': expression, 'result': result_str}
+    return {'expression': expression, 'error': result_str, 'message': str(error)}
+
+async def _route(service, method, path, body):
+    if path == '/health':
+        return 200, {'status': 'ok'}
+    if path == '/stats':
+        return 200, service.stats()
+    if path != '/evaluate':
+        return 404, {'error': 'Not found'}
+    if method != 'POST':
+        return 405, {'error': 'Use POST'}
+    try:
+        request = json.loads(body or b'{}')
+        if 'expressions' in request:
+            expressions = request['expressions']
+            single = False
+        else:
+            expressions = [request['expression']]
+            single = True
+        if not isinstance(expressions, list) or not all(isinstance(e, str) for e in expressions):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return 400, {'error': 'Body must be {"expression": str} or {"expressions": [str, ...]}'}
+    try:
+        results = await service.evaluate(expressions)
+    except Overloaded as e:
+        return 503, {'error': str(e)}
+    except asyncio.TimeoutError:
+        return 504, {'error': 'Evaluation timed out'}
+    items = [_result_json(expr, result_str, error)
+             for expr, (result_str, error) in zip(expressions, results)]
+    if single:
+        return 200, items[0]
+    return 200, {'results': items}
+
+def _content_length(headers):
+    """Returns the Content-Length as an int, or None when it is not a non-negative integer."""
+    value = headers.get('content-length', '') or '0'
+    if not (value.isascii() and value.isdigit()):
+        return None
+    return int(value)
+
+async def _handle_connection(service, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, path, version = request_line.decode('latin-1').split()
+            except ValueError:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = _content_length(headers)
+            if length is None:
+                status, payload = 400, {'error': 'Invalid Content-Length'}
+                keep_alive = False
+            elif length > MAX_BODY_BYTES:
+                status, payload = 413, {'error': 'Request body too large'}
+                keep_alive = False
+            else:
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await _route(service, method, path, body)
+                keep_alive = (version == 'HTTP/1.1'
+                              and headers.get('connection', '').lower() != 'close')
+            data = json.dumps(payload).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1')
+                + data)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def start_server(service, host='127.0.0.1', port=DEFAULT_PORT, unix_path=None):
+    """Starts the service and listens on a Unix socket or a TCP port; returns the asyncio server."""
+    await service.start()
+    handler = lambda reader, writer: _handle_connection(service, reader, writer)
+    if unix_path is not None:
+        return await asyncio.start_unix_server(handler, path=unix_path)
+    return await asyncio.start_server(handler, host=host, port=port)
+
+async def _serve(args):
+    service = EvaluationService(workers=args.workers, max_batch=args.max_batch,
+                                max_delay=args.max_delay, max_pending=args.max_pending,
+                                timeout=args.timeout, cache_size=args.cache_size,
+                                limits=Limits() if args.guarded else None)
+    server = await start_server(service, args.host, args.port, args.unix)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"Serving calculator on {where}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve calculator evaluation over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--max-batch", type=int, default=512, help="expressions per micro-batch")
+    parser.add_argument("--max-delay", type=float, default=0.002,
+                        help="seconds to wait while filling a micro-batch")
+    parser.add_argument("--max-pending", type=int, default=100000,
+                        help="queued expressions before requests are rejected (503)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="per-request timeout in seconds")
+    parser.add_argument("--cache-size", type=int, default=None, help="result cache size per worker")
+    parser.add_argument("--guarded", action="store_true",
+                        help="apply resource limits to every evaluation (see guard.py)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,449 @@
+# This is the session.py file.
+# It contains the calculator's input state machine, independent of Tk.
+
+# --- Calculator Session ---
+# CalculatorSession holds everything a button press can change: the
+# expression being built, the display text, the memory register and the
+# just_calculated flag. press(value, btn_type) dispatches through a table of
+# handlers (one per button type) instead of a long if/elif chain, so a
+# session can be driven from code or replayed from recorded key logs without
+# a display server. The GUI is a thin adapter that copies `display` into its
+# Entry widget and shows the returned error, if any, in a message box.
+# With preview=True the session also keeps a live preview of the value of the
+# expression being typed (see preview.py) in `preview`.
+# With a history (history.HistoryJournal) every '=' is recorded, and
+# previous_history()/next_history() step through earlier expressions.
+# Memory lives in a bank of registers (see memory.py); the memory buttons act
+# on the active register and `memory` is the value of that register. With
+# accumulate=True, MS/M+/M- reuse the value last computed for the current
+# expression (including the unrounded result of '=') instead of evaluating
+# it again. snapshot()/restore() save and load the whole workspace as bytes.
+# insert_text() adds typed or pasted text in one step (see its docstring).
+
+import re
+import time
+
+import expression as expr_engine
+from preview import IncrementalEvaluator, FRAME_BUDGET
+from memory import MemoryBank, DEFAULT_REGISTERS, pack_workspace, unpack_workspace
+
+BINARY_OPERATORS = frozenset(('+', '-', '*', '/', '**'))
+
+# The number or name the expression ends with, which inserted text may continue
+_TRAILING_WORD = re.compile(r"[A-Za-z_0-9.]*$")
+
+
+class CalculatorSession:
+    """Tk-free state of one calculator: expression, display and memory registers."""
+
+    # Button types whose presses are not logged (they log their own messages).
+    _QUIET_TYPES = frozenset(('eq', 'memory'))
+
+    def __init__(self, context=None, result_cache=None, log=None, evaluator=None, preview=False,
+                 history=None, registers=DEFAULT_REGISTERS, accumulate=False):
+        self.expression = ""
+        self.display = "0"
+        self.just_calculated = False # Flag to clear expression on new number input after '='
+        self.eval_context = expr_engine.default_context() if context is None else context
+        # Optional result_cache.ResultCache; call its invalidate() if eval_context is changed
+        self.result_cache = result_cache
+        # Optional callable receiving debug messages (e.g. print); None disables logging
+        self.log = log
+        # Optional guard.GuardedEvaluator (resource limits) or numeric backend from
+        # backends.py (Decimal/Fraction arithmetic) used instead of the plain engine
+        self.evaluator = evaluator
+        if evaluator is not None:
+            self._format_result = evaluator.format_result
+        else:
+            self._format_result = expr_engine.format_result
+        self.memory_bank = MemoryBank(registers, evaluator.zero if evaluator is not None else 0.0)
+        self.active_register = 0
+        self.accumulate = accumulate
+        self._last_value = None # (expression, value) reused by memory operations in accumulate mode
+        # Live preview of the expression's value ("" when there is none). It is
+        # computed with float arithmetic by an incremental evaluator that only
+        # re-parses what changed, within preview_budget seconds per press.
+        self.preview = ""
+        self.preview_budget = FRAME_BUDGET
+        self._incremental = IncrementalEvaluator(self.eval_context) if preview else None
+        # Optional history.HistoryJournal recording every evaluation made with '='
+        self.history = history
+        self.history_position = None # entry number shown by previous/next_history
+        self._handlers = {
+            'clr': self._clear,
+            'clr_entry': self._clear_entry,
+            'eq': self._equals,
+            'memory': self._memory,
+            'num': self._number,
+            'op': self._operator,
+            'func': self._function,
+            'char': self._char,
+            'const': self._constant,
+        }
+        self._memory_handlers = {
+            'MC': self._memory_clear,
+            'MR': self._memory_recall,
+            'MS': self._memory_store,
+            'M+': self._memory_add,
+            'M-': self._memory_subtract,
+        }
+
+    def press(self, value, btn_type):
+        """Applies one button press.
+
+        Returns None, or a (title, message) tuple describing an error the
+        user should be told about.
+        """
+        try:
+            handler = self._handlers[btn_type]
+        except KeyError:
+            raise ValueError(f"Unknown button type: {btn_type!r}") from None
+        self.history_position = None
+        error = handler(value)
+        if self.log is not None and btn_type not in self._QUIET_TYPES:
+            self.log(f"Button '{value}' (type: {btn_type}) clicked. Expression: '{self.expression}'")
+        if self._incremental is not None:
+            self.refresh_preview(self.preview_budget)
+        return error
+
+    @property
+    def preview_pending(self):
+        """True if the last refresh_preview() ran out of time before finishing."""
+        return self._incremental is not None and self._incremental.pending
+
+    def refresh_preview(self, budget=None):
+        """Updates `preview` for the current expression.
+
+        Returns False if `budget` seconds were not enough; call it again (e.g.
+        from the GUI's idle loop) to continue where it stopped.
+        """
+        incremental = self._incremental
+        deadline = None if budget is None else time.perf_counter() + budget
+        if not incremental.update(self.expression, deadline):
+            self.preview = ""
+            return False
+        value = None if self.just_calculated else incremental.preview()
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.preview = expr_engine.format_result(value)
+        else:
+            self.preview = ""
+        return True
+
+    @property
+    def memory(self):
+        """Value of the active memory register."""
+        return self.memory_bank[self.active_register]
+
+    @memory.setter
+    def memory(self, value):
+        self.memory_bank[self.active_register] = value
+
+    def select_register(self, register):
+        """Makes the register with this index or name the target of the memory buttons."""
+        self.active_register = self.memory_bank.index(register)
+
+    def snapshot(self):
+        """Returns the workspace (registers, expression, display, history position) as bytes."""
+        return pack_workspace(self)
+
+    def restore(self, data):
+        """Restores a workspace saved by snapshot()."""
+        unpack_workspace(self, data)
+        self._last_value = None
+        if self._incremental is not None:
+            self.refresh_preview(self.preview_budget)
+
+    def previous_history(self):
+        """Shows the expression before the one last recalled; returns False at the oldest entry."""
+        if self.history is None or not len(self.history):
+            return False
+        position = len(self.history) if self.history_position is None else self.history_position
+        if position == 0:
+            return False
+        self._recall(position - 1)
+        return True
+
+    def next_history(self):
+        """Shows the expression after the one last recalled; past the newest entry clears the input."""
+        if self.history_position is None:
+            return False
+        position = self.history_position + 1
+        if position >= len(self.history):
+            self.history_position = None
+            self._clear(None)
+        else:
+            self._recall(position)
+        return True
+
+    def _recall(self, position):
+        self.history_position = position
+        self.expression = self.history[position]['expression']
+        self.display = self.expression
+        self.just_calculated = False
+        if self._incremental is not None:
+            self.refresh_preview(self.preview_budget)
+
+    def replay(self, events):
+        """Applies an iterable of (value, btn_type) presses and returns the number of errors."""
+        press = self.press
+        errors = 0
+        for value, btn_type in events:
+            if press(value, btn_type) is not None:
+                errors += 1
+        return errors
+
+    def insert_text(self, text):
+        """Appends typed or pasted text to the expression in one step.
+
+        The text is tokenized once and written with the spacing the buttons
+        use ("2 + sqrt(4)"); a name after a number or ')' gets the implicit
+        " * " of the function buttons. A paste of thousands of characters
+        thus costs one pass and one preview refresh, not a press per
+        character. '^' is the power operator, like the key. Text starting
+        with an operator continues a result shown after '='; other text
+        starts a new expression. Returns None, or an error tuple like
+        press() if the text has characters the calculator does not
+        understand or two operands with no operator between them ("2 3");
+        the expression is then unchanged.
+        """
+        text = text.replace('^', ' pow ')
+        try:
+            tokens = list(expr_engine.iter_tokens(text))
+        except SyntaxError as e:
+            return ("Input Error", f"Cannot insert the text: {e}")
+        if not tokens:
+            return None
+        expression = self.expression
+        if self.just_calculated and not (tokens[0][0] == 'op' and tokens[0][1] in BINARY_OPERATORS):
+            expression = ""
+        word = _TRAILING_WORD.search(expression).group()
+        # previous: what the expression ends with ('num', 'name', ')' or None for an operator)
+        if word:
+            previous = 'num' if word[0] in '0123456789.' else 'name'
+        else:
+            previous = ')' if expression.rstrip().endswith(')') else None
+        pieces = [expression]
+        for i, (kind, value, start, end) in enumerate(tokens):
+            source = text[start:end]
+            if kind == 'op':
+                if value in BINARY_OPERATORS:
+                    # Binary after an operand, a sign otherwise
+                    pieces.append(f" {source} " if previous is not None else source)
+                    previous = None
+                else:
+                    pieces.append(", " if value == ',' else value)
+                    previous = ')' if value == ')' else None
+            elif i == 0 and start == 0 and word and (kind == 'num' or previous == 'name'):
+                pieces.append(source) # Continues the number or name being typed
+            elif kind == 'name' and previous in ('num', ')'):
+                pieces.append(" * " + source) # "2" + "x" -> "2 * x", like the constant buttons
+                previous = 'name'
+            elif previous == 'name' or (kind == 'num' and previous is not None):
+                # Joining "2 3" into "23" would silently change what was pasted
+                return ("Input Error", f"Cannot insert the text: missing operator before {source!r}")
+            else:
+                pieces.append(source)
+                previous = kind
+        self.history_position = None
+        self.expression = "".join(pieces)
+        self.display = self.expression
+        self.just_calculated = False
+        if self.log is not None:
+            self.log(f"Inserted {len(text)} characters. Expression length: {len(self.expression)}")
+        if self._incremental is not None:
+            self.refresh_preview(self.preview_budget)
+        return None
+
+    def evaluate_expression(self, expression_str):
+        """Evaluates an expression string, returns number or raises exception."""
+        if not expression_str:
+            # Attempting to evaluate an empty string often happens with MS/M+/M- if display is "0" or "Error".
+            # This is relevant if user clears expression then hits MS with "0" in display.
+            if self.display == "Error":
+                raise ValueError("Cannot store/use error message in memory.")
+            try:
+                return float(self.display) # Try to convert display directly if expression is empty
+            except ValueError:
+                raise ValueError("Invalid value in display for memory operation.")
+
+        # The expression is parsed and compiled once per distinct string and cached,
+        # so repeated '=', MS, M+ and M- presses only run the compiled form.
+        # Names (pi, sqrt, ...) are resolved in eval_context; nothing else is reachable.
+        if self.result_cache is not None:
+            return self.result_cache.evaluate(expression_str, self.eval_context, self.evaluator)
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(expression_str, self.eval_context)
+        return expr_engine.evaluate(expression_str, self.eval_context)
+
+    # --- Button Handlers ---
+
+    def _clear(self, value): # 'C'
+        self.expression = ""
+        self.display = "0"
+        self.just_calculated = False
+
+    def _clear_entry(self, value): # 'CE' - Simplified: clear last character
+        if self.expression:
+            self.expression = self.expression[:-1]
+        self.display = self.expression if self.expression else "0"
+        self.just_calculated = False
+
+    def _calculation_error(self, display, message):
+        self.display = display
+        self.expression = ""
+        self.just_calculated = True
+        return ("Calculation Error", message)
+
+    def _equals(self, value):
+        if not self.expression:
+            self.display = "0"
+            return None
+        try:
+            result = self.evaluate_expression(self.expression)
+        except Exception as e:
+            if self.history is not None:
+                self.history.append(self.expression, error=type(e).__name__)
+            if isinstance(e, ZeroDivisionError):
+                return self._calculation_error("Error: Division by zero", "Cannot divide by zero.")
+            if isinstance(e, (SyntaxError, NameError)):
+                return self._calculation_error("Error: Invalid syntax",
+                                               f"Invalid expression syntax or unknown function: {e}")
+            if isinstance(e, (ValueError, TypeError)):
+                return self._calculation_error("Error: Math domain/type", f"Mathematical error: {e}")
+            return self._calculation_error("Error: Unknown", f"An unexpected error occurred: {e}")
+        result_str = self._format_result(result)
+        if self.accumulate:
+            self._last_value = (result_str, result)
+        if self.history is not None:
+            self.history.append(self.expression, result_str)
+        self.display = result_str
+        self.expression = result_str
+        self.just_calculated = True
+        return None
+
+    def _memory(self, value):
+        try:
+            return self._memory_handlers[value]()
+        except ValueError as e:
+            return ("Memory Operation Error", str(e))
+        except Exception as e: # Catch other eval errors for M ops
+            return ("Memory Operation Error", f"Could not perform memory operation: {e}")
+
+    def _memory_clear(self):
+        self.memory_bank.clear(self.active_register)
+        if self.log is not None:
+            self.log("Memory Cleared")
+
+    def _memory_recall(self):
+        # Treat MR like number input
+        mem_str = str(self.memory)
+        if mem_str.endswith(".0"): mem_str = mem_str[:-2] # Clean display for whole numbers
+
+        if self.just_calculated or (self.display == "0" and self.expression == "0"):
+            self.expression = mem_str
+        else:
+            # If last char in expression is a digit or ')', add '*' for implicit multiplication
+            if self.expression and (self.expression[-1].isdigit() or self.expression[-1] == ')'):
+                self.expression += " * " + mem_str
+            else: # Otherwise, just append (e.g. after an operator or '(')
+                self.expression += mem_str
+        self.display = self.expression
+        self.just_calculated = False
+
+    def _current_value(self):
+        return self._memory_value(self.expression if self.expression else self.display)
+
+    def _memory_value(self, source):
+        last = self._last_value
+        if last is not None and last[0] == source:
+            return last[1]
+        value = self.evaluate_expression(source)
+        if self.accumulate:
+            self._last_value = (source, value)
+        return value
+
+    def _memory_store(self):
+        # If display is an error, do not store.
+        if self.display == "Error":
+            return ("Memory Error", "Cannot store error value.")
+        # Store the evaluated value of the current expression, or current number on display
+        val_to_store_str = self.expression if self.expression else self.display
+        if not val_to_store_str and self.display == "0": # Store 0 if expression is empty and display is 0
+            self.memory = self.memory_bank.zero
+        else:
+            self.memory = self._memory_value(val_to_store_str)
+        if self.log is not None:
+            self.log(f"Memory Stored: {self._format_result(self.memory)}")
+        self.just_calculated = True
+
+    def _memory_add(self):
+        self.memory_bank.add(self.active_register, self._current_value())
+        if self.log is not None:
+            self.log(f"Memory Add: {self._format_result(self.memory)}")
+        self.just_calculated = True
+
+    def _memory_subtract(self):
+        self.memory_bank.add(self.active_register, -self._current_value())
+        if self.log is not None:
+            self.log(f"Memory Subtract: {self._format_result(self.memory)}")
+        self.just_calculated = True
+
+    def _number(self, value):
+        if self.just_calculated or self.display == "0" and value != ".":
+            self.expression = value # Start new expression
+            self.just_calculated = False
+        elif value == '.':
+            # Prevent multiple decimal points in the current number segment
+            last_segment = ""
+            for char in reversed(self.expression):
+                if char in " +/-*()": # Stop at operator or parenthesis
+                    break
+                last_segment = char + last_segment
+            if '.' not in last_segment:
+                self.expression += value
+        else:
+            self.expression += value
+        self.display = self.expression
+
+    def _operator(self, value): # Includes 'pow'
+        if self.expression:
+            # Avoid double operators, or operator after opening parenthesis if not '-'
+            if self.expression[-1] not in [' ', '(', '+', '*', '/', 'w']: # 'w' from 'pow'
+                self.expression += f" {value} "
+            elif value == '-' and self.expression.endswith('('): # Allow func(-
+                self.expression += value
+        elif value == '-': # Allow starting expression with a negative number
+            self.expression = value
+        self.display = self.expression if self.expression else "0"
+        self.just_calculated = False
+
+    def _function(self, value): # sqrt, log, log10, sin, cos, tan
+        if self.just_calculated: # Start new expression if after '='
+            self.expression = value + "("
+        elif not self.expression or self.expression.endswith((' ', '(', '+', '-', '*', '/', 'w')):
+            self.expression += value + "("
+        elif not self.expression.endswith(tuple(' +/-*()')):
+            # A number before the function implies multiplication (2sqrt(4) -> 2 * sqrt(4))
+            self.expression += " * " + value + "("
+        else:
+            self.expression += value + "("
+        self.display = self.expression if self.expression else "0"
+        self.just_calculated = False
+
+    def _char(self, value): # Parentheses
+        if self.just_calculated:
+            self.expression = value
+            self.just_calculated = False
+        else:
+            self.expression += value
+        self.display = self.expression if self.expression else "0"
+
+    def _constant(self, value): # 'pi', 'e', 'c_light', ...
+        if self.just_calculated or (self.display == "0" and self.expression == "0"):
+            self.expression = value
+        elif self.expression and not self.expression.endswith(tuple(' +/-*().')):
+            self.expression += " * " + value
+        else:
+            self.expression += value
+        self.display = self.expression
+        self.just_calculated = False
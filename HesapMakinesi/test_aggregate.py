@@ -0,0 +1,181 @@
+import io
+import math
+import os
+import statistics
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+from decimal import Decimal
+from fractions import Fraction
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import aggregate
+from aggregate import Aggregate, aggregate_file, combine
+import expression as expr_engine
+import units
+
+
+class TestAggregate(unittest.TestCase):
+
+    def test_statistics(self):
+        values = [2, 4, 4, 4, 5, 5, 7, 9]
+        result = Aggregate(iter(values))
+        self.assertEqual(result.count, 8)
+        self.assertEqual(result.sum, 40)
+        self.assertEqual(result.mean, 5)
+        self.assertAlmostEqual(result.variance, statistics.variance(values), places=14)
+        self.assertEqual(result.pstdev, 2)
+        self.assertEqual((result.min, result.max), (2, 9))
+        with self.assertRaises(ValueError):
+            Aggregate([1]).variance
+        with self.assertRaises(ValueError):
+            Aggregate().mean
+        with self.assertRaises(TypeError):
+            Aggregate().add("1")
+
+    def test_non_numbers_rejected_with_and_without_numpy(self):
+        for numpy in (aggregate._numpy, lambda: None):
+            with patch.object(aggregate, '_numpy', numpy):
+                for values in ([None, 1], [1.0, None, math.nan], ["x", 2], [[1, 2], [3, 4]]):
+                    with self.assertRaises(TypeError, msg=(values, numpy)):
+                        Aggregate(values)
+                self.assertTrue(math.isnan(Aggregate([1.0, math.nan]).mean)) # A real NaN is a value
+                self.assertEqual(Aggregate(["1.5", 2]).sum, 3.5) # float() conversion, as documented
+        if np is not None:
+            with self.assertRaises(TypeError):
+                Aggregate(np.array([None, 1.0], dtype=object))
+
+    def test_compensated_sum(self):
+        values = [1e16, 1.0, -1e16] * 1000 + [0.1] * 10
+        self.assertEqual(Aggregate(values).sum, math.fsum(values))
+        result = Aggregate()
+        for value in values:
+            result.add(value)
+        self.assertEqual(result.sum, math.fsum(values))
+
+    def test_variance_of_large_offset(self):
+        values = [1e9 + x for x in (0.001, 0.002, 0.003, 0.004)]
+        result = Aggregate()
+        for value in values:
+            result.add(value)
+        self.assertAlmostEqual(result.variance, statistics.variance(values), delta=1e-12)
+
+    def test_merge_equals_single_pass(self):
+        values = [math.sin(i) * 1000 + 5 for i in range(5000)]
+        whole = Aggregate(values)
+        merged = combine(Aggregate(values[i:i + 777]) for i in range(0, len(values), 777))
+        self.assertEqual(merged.count, whole.count)
+        self.assertEqual(merged.sum, whole.sum)
+        self.assertAlmostEqual(merged.variance, whole.variance, delta=1e-9 * whole.variance)
+        self.assertEqual((merged.min, merged.max), (whole.min, whole.max))
+
+    def test_product(self):
+        self.assertEqual(Aggregate([2, -3, 4], product=True).product, -24)
+        self.assertEqual(Aggregate([1e300, 1e300, 1e-300, 1e-300], product=True).product, 1)
+        self.assertEqual(Aggregate([5, 0, 1e300], product=True).product, 0)
+        huge = Aggregate([1e200] * 5, product=True)
+        self.assertAlmostEqual(huge.log_product, 1000 * math.log(10), places=9)
+        with self.assertRaises(OverflowError):
+            huge.product
+        with self.assertRaises(ValueError):
+            Aggregate([1, 2]).product
+
+    def test_nan_is_kept(self):
+        result = Aggregate([1, math.nan, 3])
+        self.assertTrue(math.isnan(result.min))
+        self.assertTrue(math.isnan(result.max))
+        self.assertTrue(math.isnan(result.mean))
+
+    @unittest.skipUnless(np is not None, "NumPy is not installed")
+    def test_arrays(self):
+        values = np.random.default_rng(1).standard_normal(300000) * 1e-3 + 1e9
+        result = Aggregate(values)
+        self.assertEqual(result.sum, math.fsum(values.tolist()))
+        self.assertAlmostEqual(result.variance, np.var(values, ddof=1), delta=1e-7 * result.variance)
+        self.assertEqual(Aggregate(values.reshape(600, 500)).count, 300000)
+        parts = combine(Aggregate(part) for part in np.array_split(values, 7))
+        self.assertAlmostEqual(parts.variance, result.variance, delta=1e-9 * result.variance)
+        logs = Aggregate(np.random.default_rng(2).random(200000), product=True).log_product
+        self.assertLess(logs, -1e5) # The product itself underflows
+
+
+class TestExpressionFunctions(unittest.TestCase):
+
+    def evaluate(self, source, **names):
+        return expr_engine.compile_expression(source).evaluate(dict(expr_engine.default_context(), **names))
+
+    def test_functions(self):
+        self.assertEqual(self.evaluate("mean(1, 2, 3, 4)"), 2.5)
+        self.assertEqual(self.evaluate("sum(0.1, 0.2, 0.3) - 0.6"), 0)
+        self.assertEqual(self.evaluate("max(sqrt(16), 3) * product(2, 3)"), 24)
+        self.assertAlmostEqual(self.evaluate("stdev(2, 4, 4, 4, 5, 5, 7, 9)"), 2.1380899353, places=9)
+        with self.assertRaises(TypeError):
+            self.evaluate("mean()")
+
+    def test_exact_values(self):
+        self.assertEqual(aggregate.EXPRESSION_FUNCTIONS['sum'](Fraction(1, 3), Fraction(1, 6)), Fraction(1, 2))
+        self.assertEqual(aggregate.EXPRESSION_FUNCTIONS['mean'](Decimal('0.1'), Decimal('0.2')), Decimal('0.15'))
+
+    @unittest.skipUnless(np is not None, "NumPy is not installed")
+    def test_columns(self):
+        from formula import Formula
+        centered = Formula("(x - mean(x)) / stdev(x)", ['x']).evaluate_columns(x=np.arange(5.0))
+        np.testing.assert_allclose(centered, (np.arange(5.0) - 2) / math.sqrt(2.5))
+
+    def test_dimensions(self):
+        dimension = units.check_dimensions(expr_engine.parse("variance(a, b)"),
+                                           {'a': units.parse_unit('m')[1], 'b': units.parse_unit('m')[1]},
+                                           expr_engine.default_context())
+        self.assertEqual(dimension, units.parse_unit('m**2')[1])
+        with self.assertRaises(units.DimensionError):
+            units.check_dimensions(expr_engine.parse("sum(a, b)"),
+                                   {'a': units.parse_unit('m')[1], 'b': units.parse_unit('s')[1]},
+                                   expr_engine.default_context())
+
+
+class TestFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_numbers_per_line(self):
+        values = [i * 0.25 - 7 for i in range(1000)]
+        path = self.write("values.txt", "\n".join(map(repr, values)) + "\n\n")
+        self.assertEqual(aggregate_file(path).sum, math.fsum(values))
+        # Byte ranges end mid-line; every line is still read exactly once
+        for workers in (2, 3):
+            result = aggregate_file(path, workers=workers)
+            self.assertEqual(result.count, 1000)
+            self.assertEqual(result.sum, math.fsum(values))
+            self.assertAlmostEqual(result.variance, statistics.variance(values), places=9)
+
+    def test_csv_column(self):
+        path = self.write("table.csv", "name,amount\na,1.5\n\"b,c\",2.5\nd,-1\n")
+        result = aggregate_file(path, column="amount", workers=2)
+        self.assertEqual((result.count, result.sum, result.min), (3, 3.0, -1))
+        with self.assertRaises(KeyError):
+            aggregate_file(path, column="price")
+
+    def test_command_line(self):
+        path = self.write("values.txt", "1\n2\n3\n4\n")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(aggregate.main([path, "--product"]), 0)
+        self.assertEqual(output.getvalue().splitlines(),
+                         ["count = 4", "sum = 10.0", "mean = 2.5", f"stdev = {statistics.stdev([1, 2, 3, 4])!r}",
+                          "min = 1.0", "max = 4.0", "product = 24.0"])
+
+
+if __name__ == '__main__':
+    unittest.main()
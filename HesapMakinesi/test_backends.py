@@ -0,0 +1,147 @@
+import unittest
+import cmath
+import io
+from contextlib import redirect_stderr
+from decimal import Decimal
+from fractions import Fraction
+
+import backends
+import expression as expr_engine
+from backends import get_backend, DecimalBackend, FractionBackend, FloatBackend, ComplexBackend
+from session import CalculatorSession
+from cli import main, run
+
+
+class TestBackends(unittest.TestCase):
+
+    def setUp(self):
+        self.context = expr_engine.default_context()
+
+    def test_float_backend_is_the_plain_engine(self):
+        backend = FloatBackend()
+        self.assertEqual(backend.evaluate("0.1 + 0.2", self.context), 0.1 + 0.2)
+
+    def test_decimal_exact_literals_and_precision(self):
+        backend = DecimalBackend(precision=50)
+        self.assertEqual(backend.evaluate("0.1 + 0.2", self.context), Decimal("0.3"))
+        third = backend.evaluate("1 / 3", self.context)
+        self.assertEqual(len(str(third)), 52) # "0." + 50 digits
+        self.assertEqual(backend.format_result(backend.evaluate("2 pow 10", self.context)), "1024")
+
+    def test_decimal_functions(self):
+        backend = DecimalBackend(precision=40)
+        root = backend.evaluate("sqrt(2)", self.context)
+        self.assertEqual(str(root)[:20], "1.414213562373095048")
+        self.assertAlmostEqual(float(backend.evaluate("sin(pi / 6)", self.context)), 0.5, places=15)
+        self.assertAlmostEqual(float(backend.evaluate("cos(pi)", self.context)), -1, places=15)
+        self.assertAlmostEqual(float(backend.evaluate("tan(pi / 4)", self.context)), 1, places=15)
+        self.assertEqual(backend.evaluate("log10(1000)", self.context), 3)
+
+    def test_decimal_errors(self):
+        backend = DecimalBackend()
+        with self.assertRaises(ZeroDivisionError):
+            backend.evaluate("1 / 0", self.context)
+        with self.assertRaises(ValueError):
+            backend.evaluate("sqrt(-1)", self.context)
+        with self.assertRaises(ValueError):
+            backend.evaluate("log(0)", self.context)
+        with self.assertRaises(ValueError):
+            backend.evaluate("tan(pi / 2)", self.context)
+        with self.assertRaises(ValueError):
+            backend.evaluate("(-8) pow 0.5", self.context)
+
+    def test_fraction_exact_arithmetic(self):
+        backend = FractionBackend()
+        self.assertEqual(backend.evaluate("1 / 3 + 1 / 6", self.context), Fraction(1, 2))
+        self.assertEqual(backend.evaluate("(2 / 3) pow 2", self.context), Fraction(4, 9))
+        self.assertEqual(backend.evaluate("sqrt(16 / 9)", self.context), Fraction(4, 3))
+        self.assertEqual(backend.format_result(backend.evaluate("1 / 3", self.context)), "1/3")
+
+    def test_fraction_float_fallback(self):
+        backend = FractionBackend()
+        self.assertIsInstance(backend.evaluate("sqrt(2)", self.context), float)
+        self.assertAlmostEqual(backend.evaluate("sin(pi / 2)", self.context), 1)
+        with self.assertRaises(ValueError):
+            backend.evaluate("0 pow -1", self.context)
+
+    def test_session_with_backend(self):
+        session = CalculatorSession(evaluator=get_backend('fraction'))
+        session.expression = "1 / 3"
+        session.press('=', 'eq')
+        self.assertEqual(session.display, "1/3")
+        session.press('M+', 'memory')
+        session.press('M+', 'memory')
+        self.assertEqual(session.memory, Fraction(2, 3))
+
+    def test_cli_backend(self):
+        out = io.StringIO()
+        run(io.StringIO("0.1 + 0.2\n1 / 4\n"), out, backend=('fraction', None))
+        self.assertEqual(out.getvalue(), "3/10\n1/4\n")
+
+    def test_complex_domain_extension(self):
+        backend = ComplexBackend()
+        self.assertEqual(backend.evaluate("sqrt(-4)", self.context), 2j)
+        self.assertEqual(backend.evaluate("log(-1)", self.context), cmath.log(-1))
+        self.assertEqual(backend.evaluate("(1 + 2 * j) * (3 - i)", self.context), 5 + 5j)
+        self.assertEqual(backend.evaluate("2 pow 3", self.context), 8)
+        for source in ("1 / 0", "log(0)", "0 pow -1", "tan(pi / 2)"):
+            with self.assertRaises((ZeroDivisionError, ValueError)):
+                backend.evaluate(source, self.context)
+
+    def test_complex_infinite_exponents(self):
+        backend = ComplexBackend()
+        context = dict(self.context, inf=float('inf'), nan=float('nan'))
+        self.assertEqual(backend.evaluate("(-2) pow inf", context), float('inf'))
+        self.assertEqual(backend.evaluate("(-0.5) pow inf", context), 0.0)
+        self.assertEqual(backend.evaluate("(-2) pow -inf", context), 0.0)
+        self.assertTrue(cmath.isnan(backend.evaluate("(-2) pow nan", context)))
+
+    def test_complex_formatting(self):
+        backend = ComplexBackend()
+        cases = {"e ** (pi * j)": "-1", "sqrt(-2)": "1.414213562j",
+                 "3 - 4 * j": "3-4j", "0.5 + j": "0.5+1j", "2": "2"}
+        for source, text in cases.items():
+            self.assertEqual(backend.format_result(backend.evaluate(source, self.context)), text)
+        strict = ComplexBackend(imaginary_tolerance=0)
+        self.assertNotEqual(strict.format_result(strict.evaluate("e ** (pi * j)", self.context)), "-1")
+
+    def test_tangent_tolerance_per_backend(self):
+        source = "tan(pi / 2 + 1e-7)"
+        for name in ('float', 'decimal', 'fraction', 'complex'):
+            with self.assertRaises(ValueError):
+                get_backend(name, tangent_tolerance=1e-6).evaluate(source, self.context)
+            get_backend(name).evaluate(source, self.context) # Outside the default 1e-9
+
+    def test_complex_session_and_cli(self):
+        session = CalculatorSession(evaluator=get_backend('complex'))
+        session.expression = "sqrt(-9)"
+        session.press('=', 'eq')
+        self.assertEqual(session.display, "3j")
+        session.press('M+', 'memory')
+        self.assertEqual(session.memory, 3j)
+        out = io.StringIO()
+        self.assertEqual(run(io.StringIO("sqrt(-1)\nlog10(-100)\n"), out, backend=('complex', None)), 0)
+        self.assertEqual(out.getvalue(), "1j\n2+1.364376354j\n")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_backend('quaternion')
+
+    def test_precision_only_for_decimal(self):
+        self.assertEqual(get_backend('decimal', 50).decimal_context.prec, 50)
+        for name in ('float', 'fraction', 'complex'):
+            with self.assertRaises(ValueError):
+                get_backend(name, precision=50)
+            with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+                main(["-", "--backend", name, "--precision", "50"])
+
+    def test_abstract_backend(self):
+        class Incomplete(backends._ConvertingBackend):
+            def convert(self, value):
+                return value
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+import copy
+
+from benchmark import run_benchmarks, compare, build_benchmarks
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_every_benchmark_runs(self):
+        for name, group, setup in build_benchmarks():
+            func, ops_per_call = setup()
+            func()
+            self.assertGreaterEqual(ops_per_call, 1, name)
+
+    def test_run_and_compare(self):
+        document = run_benchmarks('primitives', repeat=1, number=10)
+        self.assertIn('tangent', document['results'])
+        self.assertNotIn('batch_10', document['results'])
+        entry = document['results']['add']
+        self.assertEqual(entry['group'], 'primitives')
+        self.assertGreater(entry['ns_per_op'], 0)
+
+        slower = copy.deepcopy(document)
+        slower['results']['add']['ns_per_op'] *= 2
+        rows = {row[0]: row for row in compare(slower, document, threshold=0.5)}
+        self.assertTrue(rows['add'][4])
+        self.assertFalse(rows['sine'][4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
 import math
+from decimal import Decimal
+from fractions import Fraction
 
 # Assuming calculator.py is in the same directory or accessible via PYTHONPATH
 # For testing, it's common to adjust sys.path or structure as a package.
@@ -40,6 +42,11 @@ class TestCalculator(unittest.TestCase):
         self.assertEqual(divide(-10, 2), -5)
         self.assertAlmostEqual(divide(1, 3), 1/3)
 
+    def test_decimal_and_fraction_inputs(self):
+        self.assertEqual(add(Decimal("0.1"), Decimal("0.2")), Decimal("0.3"))
+        self.assertEqual(divide(Fraction(1), Fraction(3)), Fraction(1, 3))
+        self.assertEqual(multiply(Fraction(1, 3), 3), 1)
+
     def test_divide_by_zero(self):
         with self.assertRaises(ZeroDivisionError):
             divide(10, 0)
@@ -0,0 +1,112 @@
+import math
+import unittest
+from unittest.mock import patch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import calculus
+from calculus import Equation, ConvergenceError, derivative, derivative_tree, format_tree
+import expression as expr_engine
+
+
+class TestDerivative(unittest.TestCase):
+
+    def test_rules(self):
+        self.assertEqual(derivative("sin(x) * x ** 2"), "cos(x) * x ** 2 + sin(x) * (2 * x)")
+        self.assertEqual(derivative("x ** 3 + 5 * x - 7"), "3 * x ** 2 + 5")
+        self.assertEqual(derivative("tan(x)"), "1 / (cos(x) * cos(x))")
+        self.assertEqual(derivative("2 ** x"), "2 ** x * log(2)")
+        self.assertEqual(derivative("a * x", "a"), "x")
+        self.assertEqual(derivative("y + 1"), "0")
+
+    def test_derivatives_match_difference_quotients(self):
+        h = 1e-6
+        for source in ("sqrt(x * x + 1)", "log(x) / x", "log10(3 * x)", "-cos(3 * x)",
+                       "x ** x", "e ** (x / 2)", "tan(x) ** 2", "sin(cos(x))"):
+            f = Equation(source)
+            df = f.derivative
+            for x in (0.3, 1.1, 2.5):
+                expected = (f.function(x + h) - f.function(x - h)) / (2 * h)
+                self.assertAlmostEqual(df(x), expected, places=5, msg=source)
+
+    def test_format_tree_roundtrip(self):
+        for source in ("-x ** 2", "(-x) ** 2", "x ** -2", "a - (b - c)", "(a + b) * c",
+                       "2 ** 3 ** 2", "(2 ** 3) ** 2", "-(a + b) / c"):
+            tree = expr_engine.parse(source)
+            self.assertEqual(expr_engine.parse(format_tree(tree)), tree, msg=source)
+
+    def test_unknown_function(self):
+        context = dict(expr_engine.default_context(), f=abs)
+        with self.assertRaises(ValueError):
+            derivative_tree(expr_engine.parse("f(x)"), 'x', context)
+        self.assertEqual(derivative_tree(expr_engine.parse("f(2)"), 'x', context), (expr_engine.NUM, 0))
+
+
+class TestSolvers(unittest.TestCase):
+
+    def test_scalar_solvers(self):
+        equation = Equation("cos(x) - x")
+        root = 0.7390851332151607
+        self.assertAlmostEqual(equation.newton(1.0), root, places=12)
+        self.assertAlmostEqual(equation.bisect(0, 1), root, places=10)
+        self.assertAlmostEqual(equation.brent(0, 1), root, places=12)
+        with self.assertRaises(ValueError):
+            equation.brent(1, 2)
+
+    def test_parameters(self):
+        equation = Equation("x ** 2 - a", params=['a'])
+        self.assertAlmostEqual(equation.newton(1.0, a=2.0), math.sqrt(2), places=14)
+        self.assertAlmostEqual(equation.brent(0, 3, a=9), 3, places=12)
+        with self.assertRaises(TypeError):
+            equation.newton(1.0)
+        with self.assertRaises(ConvergenceError): # No real root
+            equation.newton(1.0, a=-1.0)
+
+    def test_integrate(self):
+        self.assertAlmostEqual(Equation("sin(x)").integrate(0, math.pi), 2, places=9)
+        self.assertAlmostEqual(Equation("x ** 3").integrate(0, 2, n=5), 4, places=12)
+        self.assertAlmostEqual(Equation("k / x", params=['k']).integrate(1, math.e, k=3), 3, places=9)
+
+    def test_integrate_errors_with_and_without_numpy(self):
+        cases = (("sqrt(x)", -1, 1, ValueError), ("1 / x", 0, 1, ZeroDivisionError),
+                 ("log(x)", 0, 1, ValueError), ("x pow 500", 0, 10, OverflowError))
+        for numpy in (calculus.np, None):
+            with patch.object(calculus, 'np', numpy):
+                for source, a, b, error in cases:
+                    with self.assertRaises(error, msg=(source, numpy)):
+                        Equation(source).integrate(a, b, n=10)
+                self.assertAlmostEqual(Equation("sqrt(x)").integrate(0, 1), 2 / 3, places=3)
+
+    @unittest.skipUnless(np is not None, "NumPy is not installed")
+    def test_vectorized(self):
+        equation = Equation("x ** 2 - a", params=['a'])
+        a = np.arange(1.0, 100001.0)
+        roots = equation.newton(a, a=a)
+        np.testing.assert_allclose(roots, np.sqrt(a), rtol=1e-14)
+        np.testing.assert_allclose(equation.bisect(0, a + 1, a=a), np.sqrt(a), rtol=1e-11)
+        np.testing.assert_allclose(equation.brent(0, a[:100] + 1, a=a[:100]), np.sqrt(a[:100]))
+        # Rows without a real root become NaN
+        roots = equation.newton(np.array([1.0, 1.0]), a=np.array([4.0, -1.0]))
+        self.assertEqual(roots[0], 2.0)
+        self.assertTrue(math.isnan(roots[1]))
+        self.assertTrue(math.isnan(equation.bisect(0, 1, a=np.array([4.0]))[0]))
+
+    @unittest.skipUnless(np is not None, "NumPy is not installed")
+    def test_vectorized_bisect_matches_scalar(self):
+        # Roots at either endpoint, at the first midpoint and inside the interval
+        equation = Equation("x - c", params=['c'])
+        a = np.array([1.0, -3.0, 0.0, 0.0, 1.0])
+        b = np.array([3.0, 1.0, 4.0, 1.0, 3.0])
+        c = np.array([1.0, 1.0, 2.0, 0.3, 3.0])
+        roots = equation.bisect(a, b, c=c)
+        for i in range(len(a)):
+            self.assertAlmostEqual(roots[i], equation.bisect(a[i], b[i], c=c[i]), places=11)
+        self.assertEqual(roots[[0, 1, 2, 4]].tolist(), [1.0, 1.0, 2.0, 3.0])
+        self.assertEqual(Equation("x - 1").bisect(np.array([1.0]), np.array([3.0])).tolist(), [1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
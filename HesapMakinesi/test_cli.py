@@ -0,0 +1,40 @@
+import unittest
+import io
+import os
+import tempfile
+
+from cli import evaluate_lines, run, main
+
+
+class TestCli(unittest.TestCase):
+
+    def test_evaluate_lines(self):
+        results = list(evaluate_lines(["1 + 1\n", "c_light / 1e8\n", "\n", "1 / 0\n"]))
+        self.assertEqual([r[1] for r in results],
+                         ["2", "2.99792458", "", "Error: Division by zero"])
+        self.assertIsInstance(results[3][2], ZeroDivisionError)
+
+    def test_run_streams_results(self):
+        out = io.StringIO()
+        errors = run(io.StringIO("2 pow 10\nsqrt(-1)\nfoo\n"), out)
+        self.assertEqual(out.getvalue(), "1024\nError: Math domain/type\nError: Invalid syntax\n")
+        self.assertEqual(errors, 2)
+
+    def test_echo_and_fail_fast(self):
+        out = io.StringIO()
+        run(io.StringIO("1 / 0\n2 * 3\n"), out, echo=True, fail_fast=True)
+        self.assertEqual(out.getvalue(), "1 / 0 = Error: Division by zero\n")
+
+    def test_main_with_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            in_path = os.path.join(tmp, "in.txt")
+            out_path = os.path.join(tmp, "out.txt")
+            with open(in_path, "w", encoding="utf-8") as f:
+                f.write("1 / 4\nlog10(1000)\n")
+            self.assertEqual(main([in_path, "-o", out_path]), 0)
+            with open(out_path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "0.25\n3\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import io
+import math
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import columns
+
+
+@unittest.skipUnless(np is not None, "NumPy is not installed")
+class TestColumns(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_raw_and_npy_columns(self):
+        np.arange(5, dtype=np.int64).tofile(self.path("a.i64"))
+        np.save(self.path("b.npy"), np.linspace(0, 1, 5))
+        self.assertEqual(columns.open_column(self.path("a.i64")).tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(columns.open_column(self.path("b.npy"))[-1], 1.0)
+        with open(self.path("bad.f64"), 'wb') as f:
+            f.write(b"\0" * 12)
+        with self.assertRaises(ValueError):
+            columns.open_column(self.path("bad.f64"))
+
+    def test_evaluate_with_error_mask(self):
+        x = np.array([4.0, -1.0, 9.0, 16.0, math.nan, 1.0, 25.0, 36.0, 49.0, -4.0, 1.0])
+        y = np.array([1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1], dtype=np.int64)
+        x.tofile(self.path("x.f64"))
+        y.tofile(self.path("y.i64"))
+        # Chunks of 8 rows: the second chunk ends inside a mask byte
+        failed = columns.evaluate_mapped("sqrt(x) / y", {'x': self.path("x.f64"), 'y': self.path("y.i64")},
+                                         self.path("r.npy"), self.path("r.errors"), chunk_size=8)
+        self.assertEqual(failed, 3)
+        result = np.load(self.path("r.npy"))
+        self.assertEqual(result[[0, 3, 10]].tolist(), [2.0, 4.0, 1.0])
+        self.assertTrue(np.isnan(result[[1, 2, 4, 9]]).all())
+        self.assertEqual(os.path.getsize(self.path("r.errors")), 2)
+        mask = columns.read_error_mask(self.path("r.errors"), len(x))
+        self.assertEqual(np.flatnonzero(mask).tolist(), [1, 2, 9]) # NaN input is not a failure
+
+    def test_preallocated_output(self):
+        output = np.zeros(1000)
+        mask = np.zeros(125, dtype=np.uint8)
+        failed = columns.evaluate_mapped("log10(x)", {'x': np.arange(1000.0) - 10}, output, mask, chunk_size=64)
+        self.assertEqual(failed, 11)
+        self.assertEqual(output[110], 2.0)
+        self.assertEqual(np.flatnonzero(columns.read_error_mask(mask, 1000)).tolist(), list(range(11)))
+
+    def test_rejections(self):
+        data = {'x': np.ones(4)}
+        with self.assertRaises(ValueError):
+            columns.evaluate_mapped("x - mean(x)", data, np.zeros(4))
+        with self.assertRaises(ValueError):
+            columns.evaluate_mapped("x", {'x': np.ones(4), 'y': np.ones(5)}, np.zeros(4))
+        with self.assertRaises(ValueError):
+            columns.evaluate_mapped("x", data, np.zeros(4), chunk_size=10)
+
+    def test_command_line(self):
+        np.array([1.0, 4.0, -9.0]).tofile(self.path("x.f64"))
+        errors = io.StringIO()
+        with redirect_stderr(errors):
+            code = columns.main(["sqrt(x)", f"x={self.path('x.f64')}", "-o", self.path("r.f64"),
+                                 "--errors", self.path("r.errors")])
+        self.assertEqual(code, 0)
+        self.assertEqual(errors.getvalue(), "1 failed rows\n")
+        self.assertEqual(np.fromfile(self.path("r.f64")).tolist()[:2], [1.0, 2.0])
+        self.assertEqual(columns.read_error_mask(self.path("r.errors"), 3).tolist(), [False, False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
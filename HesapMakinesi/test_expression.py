@@ -0,0 +1,94 @@
+import unittest
+import math
+
+from expression import (
+    tokenize, parse, compile_expression, evaluate, clear_cache, cache_info,
+    NUM, NAME, NEG, BINOP, CALL
+)
+import calculator as calc_logic
+
+CONTEXT = {
+    'sqrt': calc_logic.square_root,
+    'log': calc_logic.log_natural,
+    'log10': calc_logic.log_base10,
+    'sin': calc_logic.sine,
+    'cos': calc_logic.cosine,
+    'tan': calc_logic.tangent,
+    'pi': math.pi,
+    'e': math.e,
+}
+
+class TestTokenizer(unittest.TestCase):
+
+    def test_numbers_and_operators(self):
+        self.assertEqual(tokenize("12 + 3.5"), [('num', 12), ('op', '+'), ('num', 3.5)])
+        self.assertEqual(tokenize("1e+20"), [('num', 1e20)])
+        self.assertEqual(tokenize(".5"), [('num', 0.5)])
+
+    def test_pow_becomes_operator(self):
+        self.assertEqual(tokenize("2 pow 3"), [('num', 2), ('op', '**'), ('num', 3)])
+
+    def test_invalid_character(self):
+        with self.assertRaises(SyntaxError):
+            tokenize("2 $ 3")
+
+
+class TestParser(unittest.TestCase):
+
+    def test_precedence(self):
+        self.assertEqual(parse("1 + 2 * 3"),
+                         (BINOP, '+', (NUM, 1), (BINOP, '*', (NUM, 2), (NUM, 3))))
+
+    def test_unary_minus_binds_looser_than_power(self):
+        self.assertEqual(parse("-2 ** 2"), (NEG, (BINOP, '**', (NUM, 2), (NUM, 2))))
+
+    def test_call(self):
+        self.assertEqual(parse("sqrt(pi)"), (CALL, 'sqrt', ((NAME, 'pi'),)))
+
+    def test_syntax_errors(self):
+        for source in ["", "2 +", "sqrt(4", "(1 + 2))", "2 3", "* 2", "()"]:
+            with self.assertRaises(SyntaxError, msg=source):
+                parse(source)
+
+
+class TestEvaluate(unittest.TestCase):
+
+    def test_arithmetic(self):
+        self.assertEqual(evaluate("1 + 2 * 3", CONTEXT), 7)
+        self.assertAlmostEqual(evaluate("(1 + 2) / 4", CONTEXT), 0.75)
+        self.assertEqual(evaluate("2 pow 3 pow 2", CONTEXT), 512)
+        self.assertEqual(evaluate("-2 ** 2", CONTEXT), -4)
+        self.assertEqual(evaluate("2 ** -1", CONTEXT), 0.5)
+
+    def test_functions_and_constants(self):
+        self.assertAlmostEqual(evaluate("sqrt(16) + log10(100)", CONTEXT), 6)
+        self.assertAlmostEqual(evaluate("sin(pi / 2)", CONTEXT), 1)
+        self.assertAlmostEqual(evaluate("2 * pi", CONTEXT), 2 * math.pi)
+
+    def test_calculator_errors_are_preserved(self):
+        with self.assertRaises(ZeroDivisionError):
+            evaluate("1 / 0", CONTEXT)
+        with self.assertRaises(ValueError):
+            evaluate("sqrt(-1)", CONTEXT)
+        with self.assertRaises(ValueError):
+            evaluate("tan(pi / 2)", CONTEXT)
+
+    def test_unknown_name(self):
+        with self.assertRaises(NameError):
+            evaluate("foo + 1", CONTEXT)
+        with self.assertRaises(NameError):
+            evaluate("__import__(1)", CONTEXT)
+
+    def test_compiled_form_is_cached(self):
+        clear_cache()
+        first = compile_expression("1 + 2")
+        second = compile_expression(" 1  +   2 ")
+        self.assertIs(first, second)
+        self.assertEqual(cache_info().hits, 1)
+
+    def test_names(self):
+        self.assertEqual(compile_expression("sqrt(pi) * e").names, {'sqrt', 'pi', 'e'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import io
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import expression as expr_engine
+from formula import Formula
+
+
+class TestFormula(unittest.TestCase):
+
+    def setUp(self):
+        self.hyp = Formula("sqrt(x*x + y*y)", ["x", "y"])
+
+    def test_scalar_call(self):
+        self.assertEqual(self.hyp(3, 4), 5)
+        self.assertEqual(self.hyp(y=12, x=5), 13)
+        with self.assertRaises(TypeError):
+            self.hyp(3)
+        with self.assertRaises(TypeError):
+            self.hyp(3, z=4)
+
+    def test_unknown_names_fail_at_definition(self):
+        with self.assertRaises(NameError):
+            Formula("x + y", ["x"])
+        with self.assertRaises(ValueError):
+            Formula("x + x", ["x", "x"])
+
+    def test_map_and_rows(self):
+        self.assertEqual(list(self.hyp.map([3, 5], [4, 12])), [5, 13])
+        rows = [{"x": 3, "y": 4}, (6, 8)]
+        self.assertEqual(self.hyp.evaluate_rows(rows), [5, 10])
+
+    def test_error_policies(self):
+        inverse = Formula("1 / x", ["x"])
+        with self.assertRaises(ZeroDivisionError):
+            inverse.evaluate_rows([[0]])
+        results = inverse.evaluate_columns([2, 0], errors='nan')
+        self.assertEqual(results[0], 0.5)
+        self.assertTrue(math.isnan(results[1]))
+
+    def test_formula_usable_inside_expressions(self):
+        context = expr_engine.default_context()
+        context["hyp"] = self.hyp
+        self.assertEqual(expr_engine.evaluate("2 * hyp(3, 4)", context), 10)
+
+    def test_csv(self):
+        data = io.StringIO("a,b,label\n3,4,first\n5,12,second\n0,0,origin\n")
+        results = list(self.hyp.evaluate_csv(data, columns={"x": "a", "y": "b"}))
+        self.assertEqual(results, [5, 13, 0])
+        with self.assertRaises(KeyError):
+            list(self.hyp.evaluate_csv(io.StringIO("x,z\n1,2\n")))
+
+    @unittest.skipUnless(np is not None, "NumPy is not installed")
+    def test_vectorized_columns(self):
+        xs = np.array([3.0, 5.0, 8.0])
+        ys = np.array([4.0, 12.0, 15.0])
+        np.testing.assert_allclose(self.hyp.evaluate_columns(x=xs, y=ys), [5, 13, 17])
+        log_ratio = Formula("log(x / y) + pi", ["x", "y"])
+        result = log_ratio.evaluate_columns(np.array([1.0, -1.0]), np.array([1.0, 1.0]), errors='nan')
+        self.assertAlmostEqual(result[0], math.pi)
+        self.assertTrue(math.isnan(result[1]))
+        with self.assertRaises(ValueError): # errors='raise' by default, as without arrays
+            log_ratio.evaluate_columns(np.array([1.0, -1.0]), np.array([1.0, 1.0]))
+        with self.assertRaises(ZeroDivisionError):
+            Formula("1 / x", ["x"]).evaluate_columns(np.array([2.0, 0.0]))
+        root = Formula("sqrt(x)", ["x"])
+        with self.assertRaises(ValueError):
+            root.evaluate_columns(np.array([-1.0, 4.0]))
+        self.assertEqual(root.evaluate_columns(np.array([9.0, 4.0])).tolist(), [3.0, 2.0])
+        self.assertTrue(math.isnan(root.evaluate_columns(np.array([math.nan]))[0])) # NaN input is no failure
+        constant = Formula("2 * pi", ["x"])
+        self.assertEqual(constant.evaluate_columns(np.zeros(4)).shape, (4,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import threading
+
+import expression as expr_engine
+from guard import (
+    GuardedEvaluator, Limits, LimitExceeded, EvaluationTimeout, EvaluationCancelled, tree_depth
+)
+from session import CalculatorSession
+
+
+class TestGuardedEvaluator(unittest.TestCase):
+
+    def setUp(self):
+        self.context = expr_engine.default_context()
+        self.evaluator = GuardedEvaluator()
+
+    def test_normal_expressions(self):
+        self.assertEqual(self.evaluator.evaluate("1 + 2 * 3", self.context), 7)
+        self.assertAlmostEqual(self.evaluator.evaluate("sqrt(2) pow 2", self.context), 2)
+
+    def test_calculator_errors_pass_through(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.evaluator.evaluate("1 / 0", self.context)
+
+    def test_exponent_limit(self):
+        with self.assertRaises(LimitExceeded):
+            self.evaluator.evaluate("9 pow 9 pow 9", self.context)
+
+    def test_magnitude_limit(self):
+        evaluator = GuardedEvaluator(Limits(max_magnitude=1e6))
+        with self.assertRaises(LimitExceeded):
+            evaluator.evaluate("1000 * 1000 * 10", self.context)
+        with self.assertRaises(LimitExceeded):
+            evaluator.evaluate("12345678", self.context)
+        self.assertEqual(evaluator.evaluate("1000 * 1000", self.context), 1000000)
+
+    def test_big_integers_are_limited(self):
+        source = " * ".join(["99999999999999999999"] * 20)
+        with self.assertRaises(LimitExceeded):
+            self.evaluator.evaluate(source, self.context)
+
+    def test_depth_and_length_limits(self):
+        evaluator = GuardedEvaluator(Limits(max_depth=10, max_length=50))
+        with self.assertRaises(LimitExceeded):
+            evaluator.evaluate("(" * 11 + "1" + ")" * 11, self.context)
+        with self.assertRaises(LimitExceeded):
+            evaluator.evaluate("-" * 20 + "1", self.context)
+        with self.assertRaises(LimitExceeded):
+            evaluator.evaluate("1 + " * 20 + "1", self.context)
+
+    def test_deep_nesting_does_not_crash_the_parser(self):
+        evaluator = GuardedEvaluator(Limits(max_depth=100000, max_length=10 ** 6))
+        with self.assertRaises(LimitExceeded):
+            evaluator.evaluate("-" * 100000 + "1", self.context)
+
+    def test_timeout(self):
+        evaluator = GuardedEvaluator(Limits(timeout=0.0))
+        with self.assertRaises(EvaluationTimeout):
+            evaluator.evaluate("1 + 1", self.context)
+
+    def test_cancellation_of_submitted_work(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def work():
+            started.set()
+            release.wait(5)
+            return self.evaluator.evaluate("1 + 1", self.context)
+
+        task = self.evaluator.submit(work)
+        started.wait(5)
+        task.cancel()
+        release.set()
+        with self.assertRaises(EvaluationCancelled):
+            task.result(5)
+        self.evaluator.shutdown()
+
+    def test_session_reports_limit_errors(self):
+        session = CalculatorSession(evaluator=self.evaluator)
+        session.expression = "9 pow 9 pow 9"
+        title, message = session.press('=', 'eq')
+        self.assertEqual(session.display, "Error: Math domain/type")
+        self.assertIn("Exponent", message)
+
+    def test_tree_depth(self):
+        self.assertEqual(tree_depth(expr_engine.parse("1")), 1)
+        self.assertEqual(tree_depth(expr_engine.parse("sqrt(1 + 2)")), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import os
+import subprocess
+import sys
+
+import gui_calculator
+from benchmark import measure_startup, missed_targets
+
+
+class TestGuiStartup(unittest.TestCase):
+
+    def test_import_does_not_load_tk(self):
+        script = ("import sys; sys.path.insert(0, {!r}); import gui_calculator; "
+                  "print('tkinter' in sys.modules)").format(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True,
+                                text=True, check=True).stdout
+        self.assertEqual(output.strip(), "False")
+
+    def test_button_table(self):
+        self.assertEqual(len(gui_calculator.BUTTON_SPECS), len(gui_calculator.BUTTONS))
+        for text, r, c, btn_type, value, bg, fg, font in gui_calculator.BUTTON_SPECS:
+            self.assertIn(btn_type, gui_calculator.BUTTON_STYLES)
+            self.assertLess(r, gui_calculator.BUTTON_ROWS)
+            self.assertLess(c, gui_calculator.BUTTON_COLUMNS)
+        specs = {spec[0]: spec for spec in gui_calculator.BUTTON_SPECS}
+        self.assertEqual(specs['π'][4], 'pi')
+        self.assertEqual(specs['7'][4], '7')
+
+    def test_key_events(self):
+        self.assertEqual(gui_calculator.key_event('7', '7'), ('press', '7', 'num'))
+        self.assertEqual(gui_calculator.key_event('asciicircum', '^'), ('press', 'pow', 'op'))
+        self.assertEqual(gui_calculator.key_event('Return', '\r'), ('press', '=', 'eq'))
+        self.assertEqual(gui_calculator.key_event('BackSpace', '\x08'), ('press', 'CE', 'clr_entry'))
+        self.assertEqual(gui_calculator.key_event('s', 's'), ('text', 's'))
+        self.assertIsNone(gui_calculator.key_event('Shift_L', ''))
+        self.assertIsNone(gui_calculator.key_event('dollar', '$'))
+
+    def test_startup_measurement(self):
+        samples = measure_startup(repeat=1, first_frame=False)
+        self.assertEqual(list(samples), ['startup_import'])
+        self.assertGreater(samples['startup_import'][0], 0)
+        document = {'results': {'startup_import': {'ns_per_op': 5e8, 'target_ms': 100.0}}}
+        self.assertEqual(missed_targets(document), [('startup_import', 500.0, 100.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+import io
+import os
+import tempfile
+import threading
+
+from history import HistoryJournal
+from session import CalculatorSession
+from cli import run
+from backends import get_backend
+
+
+class TestHistoryJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "history")
+
+    def test_append_read_and_reopen(self):
+        with HistoryJournal(self.path, batch_size=3) as history:
+            history.append("1 + 1", "2")
+            history.append("1 / 0", error="ZeroDivisionError")
+            self.assertEqual(os.path.getsize(self.path), 0) # still buffered
+            self.assertEqual(history[-1]['error'], "ZeroDivisionError")
+            for i in range(10):
+                history.append(f"{i} * 2", str(i * 2))
+        with HistoryJournal(self.path) as history:
+            self.assertEqual(len(history), 12)
+            self.assertEqual(history[0]['expression'], "1 + 1")
+            self.assertEqual(history[11]['result'], "18")
+            self.assertEqual([e['expression'] for e in history.recent(2)], ["9 * 2", "8 * 2"])
+            self.assertEqual(len(list(history)), 12)
+            with self.assertRaises(IndexError):
+                history[12]
+
+    def test_search(self):
+        with HistoryJournal(self.path, batch_size=2) as history:
+            for source in ("sqrt(4)", "1 + 2", "sqrt(9) + 1", "π * 2", "3"):
+                history.append(source, "0")
+            history.append("sqrt(16)", "4") # still pending
+            found = history.search("sqrt", limit=10)
+            self.assertEqual([number for number, _ in found], [5, 2, 0])
+            self.assertEqual(history.search("sqrt", limit=2)[1][1]['expression'], "sqrt(9) + 1")
+            self.assertEqual(history.search("π")[0][0], 3)
+            self.assertEqual(history.search("result"), []) # keys do not match
+
+    def test_search_empty_text(self):
+        with HistoryJournal(self.path, batch_size=2) as history:
+            for source in ("1", "2", "3"):
+                history.append(source, source)
+            self.assertEqual([number for number, _ in history.search("", limit=2)], [2, 1])
+
+    def test_append_and_flush_from_two_threads(self):
+        history = HistoryJournal(self.path, batch_size=100)
+        done = threading.Event()
+        def flush():
+            while not done.is_set():
+                history.flush()
+        flusher = threading.Thread(target=flush)
+        flusher.start()
+        try:
+            for i in range(20000):
+                history.append(f"{i} + 1", str(i + 1))
+        finally:
+            done.set()
+            flusher.join()
+        history.close()
+        with open(self.path, 'rb') as f:
+            self.assertEqual(sum(1 for _ in f), 20000)
+        with HistoryJournal(self.path) as reopened:
+            self.assertEqual(len(reopened), 20000)
+            self.assertEqual(reopened[12345]['expression'], "12345 + 1")
+
+    def test_shared_by_two_journals(self):
+        first = HistoryJournal(self.path, batch_size=1)
+        second = HistoryJournal(self.path, batch_size=1)
+        self.addCleanup(first.close)
+        self.addCleanup(second.close)
+        first.append("1+1", "2")
+        second.append("22*3", "66")
+        first.append("5-1", "4")
+        for history in (first, second):
+            self.assertEqual(len(history), 3)
+            self.assertEqual([history[i]['expression'] for i in range(3)], ["1+1", "22*3", "5-1"])
+            self.assertEqual(history.search("22")[0][0], 1)
+
+    def test_flush_if_due(self):
+        now = [0.0]
+        with HistoryJournal(self.path, max_delay=1.0, clock=lambda: now[0]) as history:
+            history.append("1", "1")
+            history.flush_if_due()
+            self.assertEqual(os.path.getsize(self.path), 0)
+            now[0] = 1.5 # Idle: no further append comes
+            history.flush_if_due()
+            self.assertGreater(os.path.getsize(self.path), 0)
+
+    def test_recovers_unindexed_tail(self):
+        with HistoryJournal(self.path, batch_size=1) as history:
+            for i in range(5):
+                history.append(str(i), str(i))
+        with open(self.path + '.idx', 'r+b') as f: # Crash before the index write
+            f.truncate(2 * 8 + 3)
+        with open(self.path, 'ab') as f: # and a torn journal line
+            f.write(b'{"time":')
+        with HistoryJournal(self.path) as history:
+            self.assertEqual(len(history), 5)
+            self.assertEqual(history[4]['expression'], "4")
+            history.append("5", "5")
+        with HistoryJournal(self.path) as history:
+            self.assertEqual([e['expression'] for e in history], ["0", "1", "2", "3", "4", "5"])
+
+    def test_replay(self):
+        with HistoryJournal(self.path) as history:
+            history.append("1 / 3", "0.3333333333")
+            history.append("2 + 2", "4")
+            history.append("1 / 0", error="ZeroDivisionError")
+            self.assertEqual(list(history.replay()), [])
+            changed = list(history.replay(get_backend('fraction')))
+            self.assertEqual([(number, result) for number, _, result, _ in changed], [(0, "1/3")])
+
+    def test_session_and_cli_record(self):
+        with HistoryJournal(self.path) as history:
+            session = CalculatorSession(history=history)
+            session.replay([("2", 'num'), ("+", 'op'), ("3", 'num'), ("=", 'eq'),
+                            ("1", 'num'), ("/", 'op'), ("0", 'num'), ("=", 'eq')])
+            self.assertEqual([(e['expression'], e['result'], e['error']) for e in history],
+                             [("2 + 3", "5", None), ("1 / 0", None, "ZeroDivisionError")])
+            self.assertTrue(session.previous_history())
+            self.assertEqual(session.display, "1 / 0")
+            self.assertTrue(session.previous_history())
+            self.assertFalse(session.previous_history())
+            self.assertEqual(session.expression, "2 + 3")
+            session.next_history()
+            session.next_history()
+            self.assertEqual(session.display, "0")
+            run(io.StringIO("sqrt(16)\n\nlog(0)\n"), io.StringIO(), history=history)
+            self.assertEqual(len(history), 4)
+            self.assertEqual(history[-1]['error'], "ValueError")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+
+import expression as expr_engine
+from instrument import InstrumentedEvaluator, Metrics, ProfileCapture
+from guard import GuardedEvaluator
+from session import CalculatorSession
+from cli import run, main
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.context = expr_engine.default_context()
+        self.evaluator = InstrumentedEvaluator()
+        self.metrics = self.evaluator.metrics
+
+    def test_results_are_unchanged(self):
+        for source in ("1 + 2 * 3", "sqrt(16) + sin(pi / 2)", "2 pow 10"):
+            self.assertEqual(self.evaluator.evaluate(source, self.context),
+                             expr_engine.evaluate(source, self.context))
+
+    def test_stage_timers(self):
+        for _ in range(3):
+            self.evaluator.evaluate("1 + 2", self.context)
+        self.evaluator.format_result(3.0)
+        stages = self.metrics.to_dict()['stages']
+        self.assertEqual(stages['normalize']['calls'], 3)
+        self.assertEqual(stages['parse']['calls'], 1) # compiled once
+        self.assertEqual(stages['evaluate']['calls'], 3)
+        self.assertEqual(stages['format']['calls'], 1)
+        self.assertEqual(self.metrics.evaluations, 3)
+
+    def test_function_and_error_counters(self):
+        self.evaluator.evaluate("sqrt(4) + sqrt(9) * 2", self.context)
+        self.assertEqual(self.metrics.function_calls,
+                         {'square_root': 2, 'multiply': 1, 'add': 1})
+        for source in ("1 / 0", "log(0)", "1 +"):
+            with self.assertRaises(Exception):
+                self.evaluator.evaluate(source, self.context)
+        self.assertEqual(self.metrics.errors,
+                         {'ZeroDivisionError': 1, 'ValueError': 1, 'SyntaxError': 1})
+
+    def test_wrapping_another_evaluator(self):
+        evaluator = InstrumentedEvaluator(GuardedEvaluator())
+        self.assertEqual(evaluator.evaluate("2 * 3", self.context), 6)
+        self.assertEqual(evaluator.metrics.stage_calls['evaluate'], 1)
+        self.assertEqual(evaluator.metrics.stage_calls['parse'], 0)
+
+    def test_exports(self):
+        self.evaluator.evaluate("1 + 1", self.context)
+        data = json.loads(self.metrics.to_json())
+        self.assertEqual(data['function_calls'], {'add': 1})
+        text = self.metrics.to_prometheus()
+        self.assertIn('hesap_function_calls_total{function="add"} 1', text)
+        self.assertIn('# TYPE hesap_stage_seconds_total counter', text)
+        self.metrics.reset()
+        self.assertEqual(self.metrics.evaluations, 0)
+
+    def test_session_and_cli(self):
+        session = CalculatorSession(evaluator=self.evaluator)
+        session.expression = "2 * 3"
+        session.press('=', 'eq')
+        self.assertEqual(session.display, "6")
+        metrics = Metrics()
+        run(io.StringIO("1 + 2\n1 / 0\n"), io.StringIO(), metrics=metrics)
+        self.assertEqual(metrics.evaluations, 2)
+        self.assertEqual(metrics.errors, {'ZeroDivisionError': 1})
+
+    def test_cli_stats_and_profile_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "in.txt")
+            with open(source, "w") as f:
+                f.write("sqrt(2)\n")
+            stats, profile = os.path.join(tmp, "m.prom"), os.path.join(tmp, "p.txt")
+            self.assertEqual(main([source, "-o", os.path.join(tmp, "out.txt"),
+                                   "--stats", stats, "--profile", profile]), 0)
+            with open(stats) as f:
+                self.assertIn('hesap_evaluations_total 1', f.read())
+            with open(profile) as f:
+                self.assertIn("Top allocations", f.read())
+
+    def test_profile_capture(self):
+        with ProfileCapture(cpu=True, memory=True, limit=5) as capture:
+            for i in range(100):
+                expr_engine.evaluate(f"{i} * 2", self.context)
+        self.assertIn("function calls", capture.cpu_report)
+        self.assertLessEqual(len(capture.memory_top), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
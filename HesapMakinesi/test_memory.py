@@ -0,0 +1,132 @@
+import struct
+import unittest
+from array import array
+from fractions import Fraction
+
+import memory
+from memory import MemoryBank
+from session import CalculatorSession
+from backends import get_backend
+
+
+class TestMemoryBank(unittest.TestCase):
+
+    def test_registers_by_index_and_name(self):
+        bank = MemoryBank(4)
+        self.assertIsInstance(bank._values, array)
+        bank[0] = 1.5
+        bank['tax'] = 0.18
+        bank.add('tax', 1)
+        self.assertEqual(bank.names, {'tax': 1})
+        self.assertEqual(bank.values(), [1.5, 1.18, 0.0, 0.0])
+        bank.clear('tax')
+        self.assertEqual(bank[1], 0.0)
+        with self.assertRaises(ValueError):
+            bank[4]
+        bank['a'], bank['b'] = 1, 2
+        with self.assertRaises(ValueError): # All three named registers are taken
+            bank['c'] = 3
+        bank.clear()
+        self.assertEqual((bank.names, bank.values()), ({}, [0.0] * 4))
+
+    def test_other_number_types(self):
+        bank = MemoryBank(2, Fraction(0))
+        bank.add(1, Fraction(1, 3))
+        self.assertEqual(bank[1], Fraction(1, 3))
+
+
+class TestSessionMemory(unittest.TestCase):
+
+    def test_registers(self):
+        session = CalculatorSession()
+        session.expression = "2 + 3"
+        session.press('MS', 'memory')
+        session.select_register('total')
+        session.expression = "10"
+        session.press('M+', 'memory')
+        session.press('M+', 'memory')
+        self.assertEqual(session.memory, 20)
+        session.select_register(0)
+        self.assertEqual(session.memory, 5)
+        self.assertEqual(session.memory_bank['total'], 20)
+
+    def test_accumulate_reuses_last_value(self):
+        evaluations = []
+        session = CalculatorSession(accumulate=True)
+        original = session.evaluate_expression
+        session.evaluate_expression = lambda source: evaluations.append(source) or original(source)
+        session.expression = "1 / 3"
+        session.press('=', 'eq')
+        session.press('M+', 'memory')
+        session.press('M+', 'memory')
+        self.assertEqual(evaluations, ["1 / 3"])
+        self.assertEqual(session.memory, 2 / 3) # unrounded, unlike the display
+        plain = CalculatorSession()
+        plain.expression = "1 / 3"
+        plain.press('=', 'eq')
+        plain.press('M+', 'memory')
+        self.assertEqual(plain.memory, 0.3333333333)
+
+    def test_snapshot_roundtrip(self):
+        session = CalculatorSession(registers=4)
+        session.expression = "7"
+        session.press('MS', 'memory')
+        session.select_register('x')
+        session.memory = 2.5
+        session.press('(', 'char')
+        data = session.snapshot()
+        restored = CalculatorSession(registers=1)
+        restored.restore(data)
+        self.assertEqual(restored.memory_bank.values(), [7.0, 2.5, 0.0, 0.0])
+        self.assertEqual(restored.memory_bank.names, {'x': 1})
+        self.assertEqual((restored.active_register, restored.expression, restored.display),
+                         (1, "(", "("))
+        with self.assertRaises(ValueError):
+            restored.restore(b"XXXX" + data[4:])
+
+    def test_snapshot_validation(self):
+        session = CalculatorSession(registers=4)
+        session.select_register('x')
+        session.expression = "1 + 2"
+        data = session.snapshot()
+        header = memory._HEADER.size
+        state = header + 8 * 4
+        bad = [
+            data[:3], data[:header + 5], data[:state + 2], data[:-3],
+            data[:header - 4] + struct.pack('<I', 1 << 30) + data[header:], # register count
+            data[:state] + struct.pack('<I', 4) + data[state + 4:], # active register
+            data[:-4] + struct.pack('<I', 9), # named register
+        ]
+        for blob in bad:
+            restored = CalculatorSession(registers=2)
+            with self.assertRaises(ValueError):
+                restored.restore(blob)
+            self.assertEqual(len(restored.memory_bank), 2) # left unchanged
+        session.restore(data)
+        self.assertEqual((session.active_register, session.expression), (1, "1 + 2"))
+
+    def test_snapshot_with_fraction_backend(self):
+        session = CalculatorSession(evaluator=get_backend('fraction'))
+        session.expression = "1 / 3"
+        session.press('MS', 'memory')
+        restored = CalculatorSession(evaluator=get_backend('fraction'))
+        restored.restore(session.snapshot())
+        self.assertEqual(restored.memory, Fraction(1, 3))
+        with self.assertRaises(ValueError):
+            CalculatorSession(evaluator=get_backend('fraction')).restore(CalculatorSession().snapshot())
+
+    def test_snapshot_with_corrupt_registers(self):
+        for name, corrupt in (('decimal', b'x'), ('fraction', b'/')):
+            session = CalculatorSession(evaluator=get_backend(name))
+            session.expression = "2"
+            session.press('MS', 'memory')
+            data = session.snapshot()
+            offset = memory._HEADER.size + memory._LENGTH.size # First register's text
+            self.assertEqual(data[offset:offset + 1], b'2')
+            restored = CalculatorSession(evaluator=get_backend(name))
+            with self.assertRaises(ValueError):
+                restored.restore(data[:offset] + corrupt + data[offset + 1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
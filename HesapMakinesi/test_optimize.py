@@ -0,0 +1,87 @@
+import unittest
+import math
+
+import expression as expr_engine
+import optimize
+from optimize import OptimizedExpression, optimize_tree, shared_subtrees
+from formula import Formula
+
+
+class TestOptimizer(unittest.TestCase):
+
+    def setUp(self):
+        self.context = expr_engine.default_context()
+
+    def optimized(self, source):
+        return optimize_tree(expr_engine.parse(source), self.context)[0]
+
+    def test_constant_folding(self):
+        self.assertEqual(self.optimized("2 * pi"), (expr_engine.NUM, 2 * math.pi))
+        self.assertEqual(self.optimized("c_light * c_light"),
+                         (expr_engine.NUM, expr_engine.SPEED_OF_LIGHT ** 2))
+        self.assertEqual(self.optimized("log10(100) + x"),
+                         ('binop', '+', (expr_engine.NUM, 2.0), ('name', 'x')))
+
+    def test_identities(self):
+        self.assertEqual(self.optimized("x * 1"), ('pos', ('name', 'x')))
+        self.assertEqual(self.optimized("0 + (x - y) - 0"), ('binop', '-', ('name', 'x'), ('name', 'y')))
+        self.assertEqual(self.optimized("x / 1")[0], expr_engine.BINOP) # int -> float, not an identity
+
+    def test_float_operands_are_not_identities(self):
+        for source in ("x * 1.0", "1.0 * x", "x + 0.0", "0.0 + x", "x - 0.0"):
+            self.assertEqual(self.optimized(source)[0], expr_engine.BINOP, source)
+        result = Formula("x * 1.0", ["x"])(3)
+        self.assertEqual((result, type(result)), (3.0, float))
+        with self.assertRaises(OverflowError):
+            Formula("x + 0.0", ["x"])(10 ** 400)
+
+    def test_folded_errors_are_deferred(self):
+        for source, error in (("1 / 0 + x", ZeroDivisionError), ("x * log(0)", ValueError),
+                              ("2 pow 5000", OverflowError), ("sqrt(-1)", ValueError)):
+            compiled = OptimizedExpression(source, self.context)
+            context = dict(self.context, x=2)
+            for _ in range(2):
+                with self.assertRaises(error):
+                    compiled.evaluate(context)
+        # The left operand still raises first.
+        with self.assertRaises(NameError):
+            OptimizedExpression("missing + 1 / 0", self.context).evaluate(self.context)
+
+    def test_results_match_the_plain_engine(self):
+        context = dict(self.context, x=1.5, y=-2)
+        for source in ("x * y + sqrt(x * y * -1) - x * y", "sin(pi / 6) * x + 0",
+                       "(x + 1) pow 2 / (x + 1)", "-(-x) * 1 + G_grav * 0"):
+            self.assertEqual(OptimizedExpression(source, self.context).evaluate(context),
+                             expr_engine.evaluate(source, context), source)
+
+    def test_common_subexpressions(self):
+        tree = expr_engine.parse("x * y + sqrt(x * y)")
+        self.assertEqual(shared_subtrees(tree), {('binop', '*', ('name', 'x'), ('name', 'y'))})
+        calls = []
+        context = {'x': 3, 'y': 12, 'sqrt': lambda v: calls.append(v) or math.sqrt(v)}
+        expression = OptimizedExpression("sqrt(x * y) + sqrt(x * y)", {})
+        self.assertEqual(expression.evaluate(context), 12)
+        self.assertEqual(calls, [36])
+
+    def test_numbers_of_different_types_are_not_shared(self):
+        self.assertEqual(shared_subtrees(expr_engine.parse("x * 2 + x * 2.0")), set())
+        self.assertEqual(shared_subtrees(optimize_tree(expr_engine.parse("x * 0.0 + x * -0.0"))[0]), set())
+        result = OptimizedExpression("x * 2 + x * 2.0", {}).evaluate({'x': 3})
+        self.assertEqual((result, type(result)), (12.0, float))
+        with self.assertRaises(OverflowError):
+            OptimizedExpression("x * 2 - x * 2.0", {}).evaluate({'x': 10 ** 400})
+
+    def test_changed_constants_fall_back(self):
+        expression = OptimizedExpression("2 * pi", self.context)
+        self.assertEqual(expression.evaluate(dict(self.context, pi=3)), 6)
+        self.assertEqual(optimize.evaluate("pi * 1", self.context), math.pi)
+
+    def test_formula_is_optimized(self):
+        formula = Formula("x * c_light * c_light / 1 / 0", ["x"])
+        with self.assertRaises(ZeroDivisionError):
+            formula(1)
+        self.assertEqual(Formula("pi * r pow 2", ["r", "pi"])(2, 3), 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
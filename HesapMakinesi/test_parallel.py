@@ -0,0 +1,43 @@
+import unittest
+import io
+
+from parallel import evaluate_parallel, evaluate_all
+from cli import run
+
+
+EXPRESSIONS = [f"{i} * 2 + sqrt({i})" for i in range(50)] + ["1 / 0", "log(0)", "2 +"]
+
+
+class TestParallel(unittest.TestCase):
+
+    def test_ordered_results(self):
+        results = list(evaluate_parallel(EXPRESSIONS, workers=2, chunk_size=7))
+        self.assertEqual([r[0] for r in results], list(range(len(EXPRESSIONS))))
+        self.assertEqual([r[1] for r in results], EXPRESSIONS)
+        self.assertEqual(results[4][2], "10")
+        self.assertIsInstance(results[50][3], ZeroDivisionError)
+        self.assertIsInstance(results[51][3], ValueError)
+        self.assertIsInstance(results[52][3], SyntaxError)
+
+    def test_unordered_results_cover_all_inputs(self):
+        ordered = list(evaluate_parallel(EXPRESSIONS, workers=2, chunk_size=5))
+        unordered = list(evaluate_parallel(iter(EXPRESSIONS), workers=2, chunk_size=5,
+                                           ordered=False, max_pending=2))
+        self.assertEqual(sorted((i, s) for i, _, s, _ in unordered),
+                         [(i, s) for i, _, s, _ in ordered])
+
+    def test_evaluate_all(self):
+        self.assertEqual(evaluate_all(["1 + 1", "2 pow 3"], workers=1), [("2", None), ("8", None)])
+
+    def test_cli_with_workers(self):
+        out = io.StringIO()
+        run(io.StringIO("1 + 1\n1 / 0\n3 * 3\n"), out, echo=True, workers=2, chunk_size=1)
+        self.assertEqual(out.getvalue(), "1 + 1 = 2\n1 / 0 = Error: Division by zero\n3 * 3 = 9\n")
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            list(evaluate_parallel(EXPRESSIONS, chunk_size=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
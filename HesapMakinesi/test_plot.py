@@ -0,0 +1,81 @@
+import io
+import math
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import plot
+
+
+class TestTabulate(unittest.TestCase):
+
+    def test_rows_and_errors(self):
+        rows = list(plot.tabulate("log(x)", 0, 2, points=3))
+        self.assertEqual([x for x, y in rows], [0.0, 1.0, 2.0])
+        self.assertTrue(math.isnan(rows[0][1]))
+        self.assertEqual(rows[2][1], math.log(2))
+
+    def test_streams_in_chunks(self):
+        rows = plot.tabulate("x * 2", 0, 99, points=100, chunk_size=7)
+        self.assertEqual(next(rows), (0.0, 0.0))
+        self.assertEqual(list(rows)[-1], (99.0, 198.0))
+
+    def test_write_csv(self):
+        path = os.path.join(tempfile.mkdtemp(), "table.csv")
+        count = plot.write_csv(path, plot.tabulate("1 / x", -1, 1, points=3))
+        self.assertEqual(count, 3)
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), "x,y\n-1.0,-1.0\n0.0,nan\n1.0,1.0\n")
+
+    def test_command_line(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            plot.main(["sqrt(x)", "--range", "0", "4", "--points", "3"])
+        self.assertEqual(output.getvalue(), "x,y\n0.0,0.0\n2.0,1.4142135623730951\n4.0,2.0\n")
+
+
+@unittest.skipUnless(np is not None, "NumPy is not installed")
+class TestSample(unittest.TestCase):
+
+    def test_refines_near_poles(self):
+        xs, ys = plot.sample("tan(x)", -2, 2, points=200)
+        self.assertTrue(np.all(np.diff(xs) >= 0))
+        self.assertGreater(xs.size, 200)
+        self.assertGreater(np.nanmax(np.abs(ys)), 1e6) # Far closer to pi/2 than the grid step
+        # The pole is broken with NaN instead of joining +inf and -inf
+        gaps = xs[np.isnan(ys)]
+        self.assertTrue(np.any(np.abs(np.abs(gaps) - math.pi / 2) < 1e-6))
+        self.assertEqual(np.isnan(plot.sample("sin(x)", 0, 10, points=200)[1]).sum(), 0)
+
+    def test_refines_domain_edges(self):
+        xs, ys = plot.sample("log(x)", -1, 1, points=100)
+        self.assertLess(np.nanmin(ys), -10)
+        self.assertTrue(np.all(np.isnan(ys[xs < 0])))
+
+    def test_downsample(self):
+        xs, ys = plot.sample("sin(x)", 0, 100, points=10**5)
+        columns, low, high, gap = plot.downsample(xs, ys, 0, 100, 500)
+        self.assertEqual(columns.tolist(), list(range(500)))
+        self.assertAlmostEqual(high.max(), 1, places=6)
+        self.assertFalse(gap.any())
+        self.assertEqual(len(plot.polylines(columns, low, high, gap)), 1)
+        bottom, top = plot.value_range(xs, ys, 0, 100)
+        self.assertLess(bottom, -1)
+        self.assertGreater(top, 1)
+
+    def test_poles_split_lines_and_not_the_range(self):
+        xs, ys = plot.sample("1 / x", -1, 1, points=1000)
+        lines = plot.polylines(*plot.downsample(xs, ys, -1, 1, 300))
+        self.assertEqual(len(lines), 2)
+        bottom, top = plot.value_range(xs, ys, -1, 1)
+        self.assertLess(top, 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
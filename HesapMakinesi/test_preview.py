@@ -0,0 +1,84 @@
+import unittest
+import time
+
+import expression as expr_engine
+from preview import IncrementalEvaluator
+from session import CalculatorSession
+
+
+def _outcome(func):
+    try:
+        return func()
+    except Exception as e:
+        return type(e)
+
+
+class TestIncrementalEvaluator(unittest.TestCase):
+
+    def setUp(self):
+        self.context = expr_engine.default_context()
+
+    def typed(self, text):
+        incremental = IncrementalEvaluator(self.context)
+        for end in range(1, len(text) + 1):
+            incremental.update(text[:end])
+        return incremental
+
+    def test_matches_the_engine_while_typing(self):
+        for source in ("1 + 2 * 3", "-2 ** 2", "2 ** -1 ** 2", "2 * -3 pow 2 + 1",
+                       "sqrt(16) + log10(100)", "(1 + 2) * (3 - 4) / 5", "+3 - -3",
+                       "1 / 0 + x", "x + 1 / 0", "sqrt(-1) * 0", "2 (3)", "1 +", "()",
+                       "sqrt()", "1.5e3 * 2", "cos(pi) * sin(pi / 2)"):
+            self.assertEqual(_outcome(self.typed(source).value),
+                             _outcome(lambda: expr_engine.evaluate(source, self.context)), source)
+
+    def test_preview_ignores_the_incomplete_tail(self):
+        for source, expected in (("2 * (3 + 4", 14), ("1 + 2 *", 3), ("2 * -", 2),
+                                 ("2 * sqrt(16", 8), ("12", 12), ("2 pow", 2)):
+            self.assertEqual(self.typed(source).preview(), expected, source)
+        for source in ("sqrt(", "1 / 0", "2 3"):
+            self.assertIsNone(self.typed(source).preview(), source)
+
+    def test_edits_and_tokens_that_grow(self):
+        incremental = IncrementalEvaluator(self.context)
+        for text, expected in (("12", 12), ("123", 123), ("12", 12), ("1e", SyntaxError),
+                               ("1e+", SyntaxError), ("1e+5", 1e5), ("7 * 1e+5", 7e5),
+                               ("7 * 2", 14), ("", SyntaxError)):
+            incremental.update(text)
+            self.assertEqual(_outcome(incremental.value), expected, text)
+
+    def test_deadline_and_resume(self):
+        text = " + ".join(["1"] * 2000)
+        incremental = IncrementalEvaluator(self.context)
+        self.assertFalse(incremental.update(text, deadline=time.perf_counter()))
+        self.assertTrue(incremental.pending)
+        self.assertIsNone(incremental.preview())
+        while not incremental.resume(deadline=time.perf_counter() + 0.001):
+            pass
+        self.assertEqual(incremental.value(), 2000)
+
+    def test_long_expressions_stay_within_a_frame(self):
+        incremental = IncrementalEvaluator(self.context)
+        incremental.update(" + ".join(f"sqrt({i})" for i in range(3000)))
+        started = time.perf_counter()
+        for char in " * 2 + 5":
+            incremental.append(char)
+            incremental.preview()
+        self.assertLess((time.perf_counter() - started) / 8, 0.016)
+
+    def test_session_preview(self):
+        session = CalculatorSession(preview=True)
+        for value, btn_type in (('2', 'num'), ('*', 'op'), ('sqrt', 'func'), ('9', 'num')):
+            session.press(value, btn_type)
+        self.assertEqual(session.preview, "6") # sqrt( is closed for the preview
+        session.press(')', 'char')
+        session.press('=', 'eq')
+        self.assertEqual((session.display, session.preview), ("6", ""))
+        session.press('+', 'op')
+        session.press('1', 'num')
+        self.assertEqual(session.preview, "7")
+        self.assertEqual(CalculatorSession().preview, "")
+
+
+if __name__ == '__main__':
+    unittest.main()
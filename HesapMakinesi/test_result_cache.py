@@ -0,0 +1,78 @@
+import unittest
+import io
+
+from result_cache import ResultCache
+import expression as expr_engine
+from cli import run
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.context = expr_engine.default_context()
+
+    def test_hits_and_misses(self):
+        cache = ResultCache(maxsize=10)
+        self.assertEqual(cache.evaluate("1 + 2", self.context), 3)
+        self.assertEqual(cache.evaluate(" 1  + 2 ", self.context), 3)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 1))
+
+    def test_lru_eviction(self):
+        cache = ResultCache(maxsize=2)
+        cache.evaluate("1", self.context)
+        cache.evaluate("2", self.context)
+        cache.evaluate("1", self.context) # "1" becomes most recently used
+        cache.evaluate("3", self.context) # evicts "2"
+        self.assertEqual(cache.evictions, 1)
+        self.assertIsNone(cache.get("2"))
+        self.assertEqual(cache.get("1"), 1)
+
+    def test_ttl_expiration(self):
+        clock = FakeClock()
+        cache = ResultCache(maxsize=10, ttl=5, clock=clock)
+        cache.evaluate("2 * 2", self.context)
+        clock.now = 4.9
+        self.assertEqual(cache.get("2 * 2"), 4)
+        clock.now = 5.0
+        self.assertIsNone(cache.get("2 * 2"))
+        self.assertEqual(cache.expirations, 1)
+
+    def test_invalidate_after_context_change(self):
+        cache = ResultCache()
+        self.assertEqual(cache.evaluate("k * 2", {'k': 1}), 2)
+        cache.invalidate()
+        self.assertEqual(cache.evaluate("k * 2", {'k': 5}), 10)
+        cache.put("x", 1)
+        cache.invalidate("x")
+        self.assertEqual(len(cache), 1)
+
+    def test_errors_are_not_cached(self):
+        cache = ResultCache()
+        for _ in range(2):
+            with self.assertRaises(ZeroDivisionError):
+                cache.evaluate("1 / 0", self.context)
+        self.assertEqual(len(cache), 0)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            ResultCache(maxsize=0)
+        with self.assertRaises(ValueError):
+            ResultCache(ttl=0)
+
+    def test_cli_cache_option(self):
+        out = io.StringIO()
+        run(io.StringIO("2 pow 8\n2 pow 8\n1 / 0\n"), out, cache_size=8)
+        self.assertEqual(out.getvalue(), "256\n256\nError: Division by zero\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+import asyncio
+import json
+import os
+import tempfile
+
+from server import EvaluationService, LatencyHistogram, Overloaded, start_server
+
+
+async def http_request(reader, writer, method, path, payload=None):
+    body = b'' if payload is None else json.dumps(payload).encode()
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode().partition(':')
+        headers[name.strip().lower()] = value.strip()
+    data = await reader.readexactly(int(headers['content-length']))
+    return status, json.loads(data)
+
+
+class TestEvaluationService(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.service = EvaluationService(workers=2, use_processes=False, max_delay=0.01)
+        self.server = await start_server(self.service, port=0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', port)
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+        await self.service.close()
+
+    async def test_single_and_batched_requests(self):
+        status, body = await http_request(self.reader, self.writer, 'POST', '/evaluate',
+                                          {'expression': '2 pow 10'})
+        self.assertEqual((status, body['result']), (200, '1024'))
+        status, body = await http_request(self.reader, self.writer, 'POST', '/evaluate',
+                                          {'expressions': ['1 + 1', '1 / 0']})
+        self.assertEqual(status, 200)
+        self.assertEqual(body['results'][0]['result'], '2')
+        self.assertEqual(body['results'][1]['error'], 'Error: Division by zero')
+
+    async def test_concurrent_requests_are_coalesced(self):
+        results = await asyncio.gather(*[self.service.evaluate([f"{i} * 2"]) for i in range(20)])
+        self.assertEqual([r[0][0] for r in results], [str(i * 2) for i in range(20)])
+        self.assertLess(self.service.counters['batches'], 20)
+
+    async def test_bad_request_and_stats(self):
+        status, _ = await http_request(self.reader, self.writer, 'POST', '/evaluate', {'x': 1})
+        self.assertEqual(status, 400)
+        status, _ = await http_request(self.reader, self.writer, 'GET', '/missing')
+        self.assertEqual(status, 404)
+        await http_request(self.reader, self.writer, 'POST', '/evaluate', {'expression': '1'})
+        status, stats = await http_request(self.reader, self.writer, 'GET', '/stats')
+        self.assertEqual(status, 200)
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['latency']['count'], 1)
+
+    async def test_backpressure(self):
+        self.service.max_pending = 2
+        with self.assertRaises(Overloaded):
+            await self.service.evaluate(['1', '2', '3'])
+        self.assertEqual(self.service.counters['rejected'], 1)
+
+    async def test_timed_out_requests_stay_pending_until_dropped(self):
+        self.service.max_pending = 1
+        self.service.timeout = 0.001 # expires while the request waits for its batch
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.service.evaluate(['1'])
+        self.assertEqual(self.service.stats()['pending'], 1)
+        with self.assertRaises(Overloaded):
+            await self.service.evaluate(['2'])
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.service.stats()['pending'], 0)
+        self.service.timeout = 5.0
+        self.assertEqual(await self.service.evaluate(['3']), [('3', None)])
+        self.assertEqual(self.service.stats()['pending'], 0)
+
+    async def test_invalid_content_length(self):
+        port = self.server.sockets[0].getsockname()[1]
+        for value in (b'abc', b'-5'):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b"POST /evaluate HTTP/1.1\r\nContent-Length: " + value + b"\r\n\r\n")
+            await writer.drain()
+            self.assertEqual((await reader.readline()).split()[1], b'400')
+            writer.close()
+
+
+class TestProcessWorkers(unittest.IsolatedAsyncioTestCase):
+
+    async def test_connection_close_reaches_eof(self):
+        service = EvaluationService(workers=2, max_delay=0.001)
+        server = await start_server(service, port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            body = b'{"expression": "6 * 7"}'
+            writer.write(b"POST /evaluate HTTP/1.1\r\nConnection: close\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+            await writer.drain()
+            # The workers must not hold the connection open after the server closes it.
+            response = await asyncio.wait_for(reader.read(), 3)
+            self.assertTrue(response.startswith(b"HTTP/1.1 200"))
+            self.assertTrue(response.endswith(b'"result": "42"}'))
+            writer.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+            await service.close()
+
+
+class TestUnixSocket(unittest.IsolatedAsyncioTestCase):
+
+    @unittest.skipUnless(hasattr(asyncio, 'start_unix_server'), "Unix sockets not supported")
+    async def test_unix_socket(self):
+        service = EvaluationService(workers=1, use_processes=False)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'calc.sock')
+            server = await start_server(service, unix_path=path)
+            reader, writer = await asyncio.open_unix_connection(path)
+            status, body = await http_request(reader, writer, 'POST', '/evaluate',
+                                              {'expression': 'sqrt(81)'})
+            self.assertEqual((status, body['result']), (200, '9'))
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            await service.close()
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_buckets(self):
+        histogram = LatencyHistogram()
+        for seconds in (0.0001, 0.003, 0.003, 10):
+            histogram.observe(seconds)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 4)
+        self.assertEqual(snapshot['buckets']['le_0.5'], 1)
+        self.assertEqual(snapshot['buckets']['le_5'], 2)
+        self.assertEqual(snapshot['buckets']['le_inf'], 1)
+        self.assertEqual(snapshot['p50_ms'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
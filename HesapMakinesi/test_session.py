@@ -0,0 +1,154 @@
+import unittest
+
+from session import CalculatorSession
+
+
+def keys(text):
+    """Turns a compact key string into (value, btn_type) presses for single-character keys."""
+    types = {'+': 'op', '-': 'op', '*': 'op', '/': 'op', '(': 'char', ')': 'char', '=': 'eq', 'C': 'clr'}
+    return [(ch, types.get(ch, 'num')) for ch in text]
+
+
+class TestCalculatorSession(unittest.TestCase):
+
+    def setUp(self):
+        self.session = CalculatorSession()
+
+    def test_initial_state(self):
+        self.assertEqual(self.session.display, "0")
+        self.assertEqual(self.session.expression, "")
+        self.assertEqual(self.session.memory, 0.0)
+
+    def test_simple_calculation(self):
+        self.assertEqual(self.session.replay(keys("12+3*2=")), 0)
+        self.assertEqual(self.session.display, "18")
+        self.assertTrue(self.session.just_calculated)
+
+    def test_new_number_after_equals_starts_over(self):
+        self.session.replay(keys("2+2=5"))
+        self.assertEqual(self.session.expression, "5")
+
+    def test_decimal_point_once_per_number(self):
+        self.session.replay(keys("1..5+2.5"))
+        self.assertEqual(self.session.display, "1.5 + 2.5")
+
+    def test_functions_and_constants(self):
+        self.session.press('2', 'num')
+        self.session.press('sqrt', 'func')
+        self.session.press('4', 'num')
+        self.session.press(')', 'char')
+        self.assertEqual(self.session.expression, "2 * sqrt(4)")
+        self.session.press('*', 'op')
+        self.session.press('pi', 'const')
+        self.assertEqual(self.session.expression, "2 * sqrt(4) * pi")
+        self.session.press('pow', 'op')
+        self.session.press('2', 'num')
+        self.session.press('=', 'eq')
+        self.assertEqual(self.session.display, "39.4784176")
+
+    def test_clear_entry(self):
+        self.session.replay(keys("123"))
+        self.session.press('CE', 'clr_entry')
+        self.assertEqual(self.session.display, "12")
+        self.session.press('CE', 'clr_entry')
+        self.session.press('CE', 'clr_entry')
+        self.assertEqual(self.session.display, "0")
+
+    def test_division_by_zero_reports_error(self):
+        self.session.replay(keys("1/0"))
+        error = self.session.press('=', 'eq')
+        self.assertEqual(error, ("Calculation Error", "Cannot divide by zero."))
+        self.assertEqual(self.session.display, "Error: Division by zero")
+        self.assertEqual(self.session.expression, "")
+
+    def test_invalid_syntax_reports_error(self):
+        self.session.replay(keys("(1+"))
+        title, _ = self.session.press('=', 'eq')
+        self.assertEqual(title, "Calculation Error")
+        self.assertEqual(self.session.display, "Error: Invalid syntax")
+
+    def test_memory_operations(self):
+        self.session.replay(keys("2+3"))
+        self.session.press('MS', 'memory')
+        self.assertEqual(self.session.memory, 5)
+        self.session.press('M+', 'memory')
+        self.assertEqual(self.session.memory, 10)
+        self.session.press('M-', 'memory')
+        self.assertEqual(self.session.memory, 5)
+        self.session.press('MR', 'memory')
+        self.assertEqual(self.session.display, "5")
+        self.session.press('*', 'op')
+        self.session.press('MR', 'memory')
+        self.assertEqual(self.session.expression, "5 * 5")
+        self.session.press('MC', 'memory')
+        self.assertEqual(self.session.memory, 0.0)
+
+    def test_memory_error(self):
+        self.session.replay(keys("1/0"))
+        title, _ = self.session.press('MS', 'memory')
+        self.assertEqual(title, "Memory Operation Error")
+
+    def test_log_callback(self):
+        messages = []
+        session = CalculatorSession(log=messages.append)
+        session.press('7', 'num')
+        session.press('MS', 'memory')
+        self.assertEqual(messages, ["Button '7' (type: num) clicked. Expression: '7'",
+                                    "Memory Stored: 7"])
+
+    def test_unknown_button_type(self):
+        with self.assertRaises(ValueError):
+            self.session.press('x', 'unknown')
+
+    def test_insert_text(self):
+        self.assertIsNone(self.session.insert_text("2+3*sqrt(16)"))
+        self.assertEqual(self.session.display, "2 + 3 * sqrt(16)")
+        self.session.press('=', 'eq')
+        self.session.insert_text("* 2") # An operator continues the result
+        self.assertEqual(self.session.expression, "14 * 2")
+        self.session.press('=', 'eq')
+        self.session.insert_text("7") # Anything else starts over
+        self.assertEqual(self.session.expression, "7")
+
+    def test_insert_text_character_by_character(self):
+        for text in ("2", "s", "i", "n", "(", "x", "2", ")", "-", "1"):
+            self.session.insert_text(text)
+        self.assertEqual(self.session.expression, "2 * sin(x2) - 1")
+        self.session.replay(keys("C"))
+        self.session.insert_text("(1+2)x, -y pow 2")
+        self.assertEqual(self.session.expression, "(1 + 2) * x, -y pow 2")
+
+    def test_insert_text_rejects_unknown_characters(self):
+        self.session.insert_text("1")
+        title, _ = self.session.insert_text("2 $ 3")
+        self.assertEqual(title, "Input Error")
+        self.assertEqual(self.session.expression, "1")
+
+    def test_insert_text_keeps_operands_apart(self):
+        for text in ("2 3", "x y", "x 2", "(1) 2", " 5"):
+            self.session.replay(keys("C1"))
+            title, _ = self.session.insert_text(text)
+            self.assertEqual(title, "Input Error", text)
+            self.assertEqual(self.session.expression, "1")
+        self.session.replay(keys("C"))
+        self.assertIsNone(self.session.insert_text("2 x"))
+        self.assertEqual(self.session.expression, "2 * x")
+
+    def test_insert_text_caret_is_power(self):
+        self.assertIsNone(self.session.insert_text("2^3^2"))
+        self.assertEqual(self.session.expression, "2 pow 3 pow 2")
+        self.session.press('=', 'eq')
+        self.assertEqual(self.session.display, "512")
+
+    def test_paste_long_expression(self):
+        session = CalculatorSession(preview=True)
+        text = " + ".join(["sqrt(16) * 2"] * 1000)
+        self.assertIsNone(session.insert_text(text))
+        self.assertEqual(session.expression, text)
+        while session.preview_pending:
+            session.refresh_preview(session.preview_budget)
+        self.assertEqual(session.preview, "8000")
+
+
+if __name__ == '__main__':
+    unittest.main()
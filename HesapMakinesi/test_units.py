@@ -0,0 +1,75 @@
+import unittest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from units import (UnitFormula, DimensionError, DIMENSIONLESS, convert, parse_unit,
+                   format_dimension, check_dimensions)
+import expression as expr_engine
+
+
+class TestUnits(unittest.TestCase):
+
+    def test_parse_and_format(self):
+        scale, dimension = parse_unit("N*m**2/kg**2")
+        self.assertEqual(scale, 1.0)
+        self.assertEqual(dimension, (3, -1, -2, 0, 0, 0, 0))
+        self.assertEqual(format_dimension(dimension), "m**3/(kg*s**2)")
+        self.assertEqual(format_dimension(parse_unit("kg*m**2/s**2")[1]), "J")
+        self.assertEqual(parse_unit("")[1], DIMENSIONLESS)
+        with self.assertRaises(ValueError):
+            parse_unit("furlong")
+
+    def test_convert(self):
+        self.assertAlmostEqual(convert(36, "km/h", "m/s"), 10)
+        self.assertAlmostEqual(convert(1, "kW*h", "J"), 3.6e6)
+        with self.assertRaises(DimensionError):
+            convert(1, "m", "s")
+
+    def test_constants_carry_units(self):
+        photon = UnitFormula("h_planck * c_light / wavelength", {"wavelength": "nm"}, to="eV")
+        self.assertAlmostEqual(photon(500), 2.4796839687, places=9)
+        self.assertEqual(format_dimension(photon.dimension), "J")
+        gravity = UnitFormula("G_grav * M / r ** 2", {"M": "kg", "r": "m"})
+        self.assertEqual(gravity.to, "m/s**2")
+
+    def test_errors_at_compile_time(self):
+        for source, units in (("x + t", {"x": "m", "t": "s"}),
+                              ("sin(x)", {"x": "m"}),
+                              ("x ** y", {"x": "m", "y": ""}),
+                              ("sqrt(x)", {"x": "m"}),
+                              ("c_light + 1", {})):
+            with self.assertRaises(DimensionError, msg=source):
+                UnitFormula(source, units)
+        with self.assertRaises(DimensionError):
+            UnitFormula("x * 2", {"x": "m"}, to="s")
+
+    def test_units_as_values_and_conversion(self):
+        self.assertAlmostEqual(UnitFormula("3 * km + 200 * m", to="km")(), 3.2)
+        speed = UnitFormula("d / t", {"d": "km", "t": "h"}, to="m/s")
+        self.assertAlmostEqual(speed(t=1, d=36), 10)
+        self.assertAlmostEqual(UnitFormula("sqrt(a)", {"a": "m**2"}, to="cm")(4), 200)
+        self.assertAlmostEqual(UnitFormula("e * 1")(), 2.718281828459045) # e stays Euler's number
+
+    def test_si_units_add_no_work(self):
+        formula = UnitFormula("sqrt(x * x + y * y) / t", {"x": "m", "y": "m", "t": "s"})
+        self.assertEqual(formula.compiled.source, "sqrt(x * x + y * y) / t")
+        self.assertEqual(formula(3, 4, 5), 1.0)
+
+    def test_check_dimensions_directly(self):
+        tree = expr_engine.parse("a * b / c")
+        self.assertEqual(check_dimensions(tree, {"a": (1,) + (0,) * 6, "c": (0, 0, 1, 0, 0, 0, 0)}),
+                         (1, 0, -1, 0, 0, 0, 0))
+
+    @unittest.skipUnless(np is not None, "NumPy is not installed")
+    def test_columns(self):
+        speed = UnitFormula("d / t", {"d": "km", "t": "s"}, to="km/h")
+        result = speed.evaluate_columns(d=np.array([1.0, 2.0]), t=np.array([3600.0, 7200.0]))
+        np.testing.assert_allclose(result, [1.0, 1.0])
+        self.assertEqual([round(v, 9) for v in speed.map([1.0], [3600.0])], [1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
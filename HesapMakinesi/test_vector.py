@@ -0,0 +1,112 @@
+import unittest
+import cmath
+import math
+import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import calculator as calc_logic
+import expression as expr_engine
+from backends import ComplexBackend
+if np is not None:
+    import vector
+
+
+@unittest.skipUnless(np is not None, "NumPy is not installed")
+class TestVector(unittest.TestCase):
+
+    def test_matches_scalar_functions(self):
+        xs = [0.5, 1.0, 2.0, 10.0]
+        ys = [1.0, 2.0, 0.5, 3.0]
+        binary = [
+            (vector.add, calc_logic.add), (vector.subtract, calc_logic.subtract),
+            (vector.multiply, calc_logic.multiply), (vector.divide, calc_logic.divide),
+            (vector.power, calc_logic.power),
+        ]
+        for vec_func, scalar_func in binary:
+            expected = [scalar_func(x, y) for x, y in zip(xs, ys)]
+            np.testing.assert_allclose(vec_func(xs, ys), expected)
+        unary = [
+            (vector.square_root, calc_logic.square_root), (vector.log_natural, calc_logic.log_natural),
+            (vector.log_base10, calc_logic.log_base10), (vector.sine, calc_logic.sine),
+            (vector.cosine, calc_logic.cosine), (vector.tangent, calc_logic.tangent),
+        ]
+        for vec_func, scalar_func in unary:
+            np.testing.assert_allclose(vec_func(xs), [scalar_func(x) for x in xs])
+
+    def test_divide_by_zero_policies(self):
+        result = vector.divide([1.0, 2.0], [0.0, 4.0])
+        self.assertTrue(math.isnan(result[0]))
+        self.assertEqual(result[1], 0.5)
+        result, mask = vector.divide([1.0, 2.0], [0.0, 4.0], errors='mask')
+        self.assertEqual(mask.tolist(), [True, False])
+        with self.assertRaises(ZeroDivisionError):
+            vector.divide([1.0, 2.0], [0.0, 4.0], errors='raise')
+
+    def test_broadcast_mask(self):
+        result, mask = vector.divide([1.0, 2.0, 3.0], 0.0, errors='mask')
+        self.assertEqual(mask.tolist(), [True, True, True])
+        self.assertTrue(np.all(np.isnan(result)))
+
+    def test_domain_errors(self):
+        _, mask = vector.square_root([-1.0, 4.0], errors='mask')
+        self.assertEqual(mask.tolist(), [True, False])
+        _, mask = vector.log_natural([0.0, -1.0, 1.0], errors='mask')
+        self.assertEqual(mask.tolist(), [True, True, False])
+        _, mask = vector.tangent([math.pi / 2, 0.0, math.pi / 2 + 1e-10], errors='mask')
+        self.assertEqual(mask.tolist(), [True, False, True])
+        _, mask = vector.power([-8.0, -2.0, 0.0], [1 / 3, 2.0, -1.0], errors='mask')
+        self.assertEqual(mask.tolist(), [True, False, True])
+        with self.assertRaises(ValueError):
+            vector.log_base10([1.0, 0.0], errors='raise')
+
+    def test_scalar_input(self):
+        self.assertTrue(math.isnan(vector.square_root(-4.0)))
+        self.assertEqual(vector.square_root(16.0), 4.0)
+
+    def test_buffer_input(self):
+        np.testing.assert_allclose(vector.sine(array.array('d', [0.0, math.pi / 2])), [0.0, 1.0], atol=1e-12)
+
+    def test_type_error(self):
+        with self.assertRaisesRegex(TypeError, "Inputs must be numeric"):
+            vector.add(["a"], [1.0])
+        with self.assertRaisesRegex(TypeError, "Input must be numeric"):
+            vector.sine(["a"])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            vector.divide([1.0], [0.0], errors='ignore')
+
+    def test_tangent_tolerance(self):
+        self.assertFalse(np.isnan(vector.tangent(math.pi / 2 + 1e-7)))
+        self.assertTrue(np.isnan(vector.tangent(math.pi / 2 + 1e-7, tolerance=1e-6)))
+
+
+@unittest.skipUnless(np is not None, "NumPy is not installed")
+class TestComplexVector(unittest.TestCase):
+
+    def test_matches_scalar_backend(self):
+        backend = ComplexBackend()
+        context = expr_engine.default_context()
+        source = "sqrt(x) * e ** (2 * pi * j * x) + log10(x) - tan(x) / cos(x)"
+        samples = np.linspace(-3, 3, 100) # avoids 0, the pole of log10
+        result = backend.evaluate_array(source, context, x=samples)
+        self.assertEqual(result.dtype, np.complex128)
+        for value, expected in zip(samples, result):
+            scalar = backend.evaluate(source, dict(context, x=float(value)))
+            self.assertTrue(cmath.isclose(scalar, expected, rel_tol=1e-9, abs_tol=1e-12))
+
+    def test_poles_become_nan(self):
+        self.assertTrue(np.isnan(vector.complex_log_natural([0.0, -1.0])[0]))
+        self.assertEqual(vector.complex_square_root([-4.0])[0], 2j)
+        result, mask = vector.complex_divide([1, 1j], [0, 1j], errors='mask')
+        self.assertEqual(mask.tolist(), [True, False])
+        with self.assertRaises(ZeroDivisionError):
+            vector.complex_divide([1], [0], errors='raise')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+
+from worksheet import Worksheet, CycleError, format_cell, load_worksheet, read_cells, main
+
+
+class TestWorksheet(unittest.TestCase):
+
+    def test_dependencies_and_update(self):
+        sheet = Worksheet()
+        changed = sheet.update({'price': 120, 'tax': 'price * 0.18', 'total': 'price + tax'})
+        self.assertEqual(changed, ['price', 'tax', 'total'])
+        self.assertAlmostEqual(sheet['total'], 141.6)
+        self.assertEqual(sheet.dependencies('total'), {'price', 'tax'})
+        self.assertEqual(sheet.dependents('price'), {'tax', 'total'})
+        sheet['price'] = 200
+        self.assertAlmostEqual(sheet['total'], 236)
+
+    def test_only_downstream_cells_are_evaluated(self):
+        sheet = Worksheet()
+        sheet.update({'a': 1, 'b': 2, 'x': 'a * 10', 'y': 'b * 10', 'z': 'x + y'})
+        before = sheet.evaluations
+        self.assertEqual(sheet.update({'a': 3}), ['a', 'x', 'z'])
+        self.assertEqual(sheet.evaluations - before, 3)
+        # A value that does not change stops the update
+        sheet.update({'p': 'a - a', 'q': 'p + 1'})
+        before = sheet.evaluations
+        self.assertEqual(sheet.update({'a': 4}), ['a', 'x', 'z'])
+        self.assertEqual(sheet.evaluations - before, 4) # a, x, z and p (still 0)
+        self.assertEqual(sheet.update({'a': 4}), []) # Same source: nothing to do
+
+    def test_cycles_are_rejected(self):
+        sheet = Worksheet()
+        sheet.update({'a': 1, 'b': 'a + 1', 'c': 'b + 1'})
+        with self.assertRaises(CycleError):
+            sheet['a'] = 'c * 2'
+        with self.assertRaises(CycleError):
+            sheet['d'] = 'd + 1'
+        self.assertEqual((sheet.source('a'), sheet['c']), ('1', 3))
+        self.assertNotIn('d', sheet)
+        self.assertEqual(sheet.dependents('c'), set())
+
+    def test_errors_propagate_and_recover(self):
+        sheet = Worksheet()
+        sheet.update({'d': '1 / 0', 'q': 'd + 1', 'r': 'missing * 2'})
+        with self.assertRaises(ZeroDivisionError):
+            sheet['q']
+        self.assertEqual(format_cell(sheet, 'q'), "Error: Division by zero")
+        self.assertEqual(format_cell(sheet, 'r'), "Error: name 'missing' is not defined")
+        sheet.update({'d': 4, 'missing': 5})
+        self.assertEqual((sheet['q'], sheet['r']), (5, 10))
+        del sheet['missing']
+        self.assertIsInstance(sheet.error('r'), NameError)
+        with self.assertRaises(ValueError):
+            sheet['pi'] = 3
+        with self.assertRaises(SyntaxError):
+            sheet['s'] = '1 +'
+        self.assertNotIn('s', sheet)
+
+    def test_local_edits_in_a_large_sheet(self):
+        cells = {f'b{i}': i for i in range(100)}
+        cells.update({f'a{i}': f'b{i % 100} * 2 + {i}' for i in range(20000)})
+        sheet = Worksheet()
+        sheet.update(cells)
+        self.assertEqual(sheet['a12345'], 45 * 2 + 12345)
+        started = time.perf_counter()
+        for i in range(100):
+            sheet[f'a{i}'] = f'b{(i + 1) % 100} + 1'
+        self.assertLess((time.perf_counter() - started) / 100, 0.005)
+        self.assertEqual(sheet['a5'], 7)
+
+    def test_files_and_command_line(self):
+        self.assertEqual(read_cells(["# comment", "a = 2", "", "b = a * 3  # six"]),
+                         {'a': '2', 'b': 'a * 3'})
+        path = os.path.join(tempfile.mkdtemp(), "sheet.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("price = 100\ntotal = price * 1.18\n")
+        self.assertAlmostEqual(load_worksheet(path)['total'], 118)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(main([path, "--set", "price=200", "--save"]), 0)
+        self.assertEqual(output.getvalue(), "price = 200\ntotal = 236\n")
+        self.assertEqual(load_worksheet(path).source('price'), '200')
+
+
+if __name__ == '__main__':
+    unittest.main()
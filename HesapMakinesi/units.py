@@ -0,0 +1,297 @@
+# This is the units.py file.
+# It contains dimensional analysis and unit conversion for formulas.
+
+# --- Units and Dimensions ---
+# A dimension is a tuple of integer exponents of the SI base quantities
+# (m, kg, s, A, K, mol, cd), e.g. velocity is (1, 0, -1, 0, 0, 0, 0). A unit
+# is a (scale, dimension) pair: its size in SI base units and its dimension,
+# so km is (1000.0, length) and eV is (1.602176634e-19, energy). Unit strings
+# are written like expressions and parsed with the expression parser:
+# "N*m**2/kg**2", "m/s", "J*s".
+#
+# Dimensions are only checked when a formula is compiled: check_dimensions()
+# walks the parsed tree once and either returns the result's dimension or
+# raises DimensionError (adding metres to seconds, sin of a length, ...).
+# A UnitFormula is a formula.Formula whose source is rewritten so inputs are
+# multiplied by their unit's scale and the result divided by the output
+# unit's scale (skipped for factors of 1). Values are plain floats in SI
+# units at run time, so evaluation costs the same as a Formula plus those
+# multiplications inside the compiled expression.
+#
+# Usage:
+#   photon = UnitFormula("h_planck * c_light / wavelength", {"wavelength": "nm"}, to="eV")
+#   photon(500)                        -> 2.479683969...
+#   photon.evaluate_columns(wavelength=wavelengths)
+#   UnitFormula("3 * km + 200 * m", to="mi")
+#   convert(100, "km/h", "m/s")        -> 27.777...
+# Unit names (km, s, J, ...) can be used in formulas as values; parameters and
+# context entries with the same name take precedence (e.g. 'e' stays Euler's
+# number, not a unit).
+
+from fractions import Fraction
+
+import aggregate
+import calculator as calc_logic
+import expression as expr_engine
+from formula import Formula
+
+BASE_UNITS = ('m', 'kg', 's', 'A', 'K', 'mol', 'cd')
+DIMENSIONLESS = (0,) * len(BASE_UNITS)
+
+# Units of the constants in expression.default_context() (pi and e are dimensionless).
+CONSTANT_UNITS = {
+    'c_light': 'm/s',
+    'h_planck': 'J*s',
+    'G_grav': 'N*m**2/kg**2',
+}
+
+
+class DimensionError(ValueError):
+    """Raised when quantities with incompatible dimensions are combined."""
+
+
+def _base(index):
+    return tuple(1 if i == index else 0 for i in range(len(BASE_UNITS)))
+
+def _multiply(a, b):
+    return tuple(x + y for x, y in zip(a, b))
+
+def _divide(a, b):
+    return tuple(x - y for x, y in zip(a, b))
+
+def _power(dimension, exponent):
+    exponent = Fraction(exponent).limit_denominator(1000)
+    result = tuple(x * exponent for x in dimension)
+    if any(x.denominator != 1 for x in result):
+        raise DimensionError(f"{format_dimension(dimension)} ** {exponent} is not a whole dimension")
+    return tuple(int(x) for x in result)
+
+
+UNITS = {name: (1.0, _base(i)) for i, name in enumerate(BASE_UNITS)}
+
+def define_unit(name, scale, definition):
+    """Adds a unit: `scale` times the unit string `definition`, e.g. define_unit('km', 1000, 'm')."""
+    base_scale, dimension = parse_unit(definition)
+    UNITS[name] = (scale * base_scale, dimension)
+
+def parse_unit(text):
+    """Returns (scale, dimension) for a unit string such as "N*m**2/kg**2" ("" or "1" is dimensionless)."""
+    if not text.strip():
+        return 1.0, DIMENSIONLESS
+    return _unit_of(expr_engine.parse(text), text)
+
+def _unit_of(node, text):
+    kind = node[0]
+    if kind == expr_engine.NUM:
+        return float(node[1]), DIMENSIONLESS
+    if kind == expr_engine.NAME:
+        try:
+            return UNITS[node[1]]
+        except KeyError:
+            raise ValueError(f"Unknown unit {node[1]!r} in {text!r}") from None
+    if kind == expr_engine.BINOP:
+        left_scale, left = _unit_of(node[2], text)
+        if node[1] == '**':
+            exponent = _constant_exponent(node[3])
+            if exponent is None:
+                raise ValueError(f"Unit exponents must be numbers in {text!r}")
+            return left_scale ** exponent, _power(left, exponent)
+        right_scale, right = _unit_of(node[3], text)
+        if node[1] == '*':
+            return left_scale * right_scale, _multiply(left, right)
+        if node[1] == '/':
+            return left_scale / right_scale, _divide(left, right)
+    raise ValueError(f"Invalid unit {text!r}")
+
+def _constant_exponent(node):
+    """Returns the value of a literal exponent (e.g. 2, -1, 0.5), or None."""
+    kind = node[0]
+    if kind == expr_engine.NUM and isinstance(node[1], (int, float)):
+        return node[1]
+    if kind in (expr_engine.NEG, expr_engine.POS):
+        value = _constant_exponent(node[1])
+        if value is not None and kind == expr_engine.NEG:
+            return -value
+        return value
+    return None
+
+for _name, _scale, _definition in (
+        ('km', 1e3, 'm'), ('cm', 1e-2, 'm'), ('mm', 1e-3, 'm'), ('um', 1e-6, 'm'),
+        ('nm', 1e-9, 'm'), ('mi', 1609.344, 'm'), ('g', 1e-3, 'kg'), ('t', 1e3, 'kg'),
+        ('ms', 1e-3, 's'), ('min', 60, 's'), ('h', 3600, 's'), ('Hz', 1, '1/s'),
+        ('N', 1, 'kg*m/s**2'), ('J', 1, 'N*m'), ('kJ', 1e3, 'J'), ('W', 1, 'J/s'),
+        ('kW', 1e3, 'W'), ('Pa', 1, 'N/m**2'), ('bar', 1e5, 'Pa'), ('C', 1, 'A*s'),
+        ('V', 1, 'W/A'), ('ohm', 1, 'V/A'), ('eV', 1.602176634e-19, 'J')):
+    define_unit(_name, _scale, _definition)
+
+# Named units tried, in order, when a result dimension is displayed.
+_DISPLAY_UNITS = ('N', 'J', 'W', 'Pa', 'Hz', 'C', 'V', 'ohm')
+
+
+def format_dimension(dimension):
+    """Returns the SI unit string of a dimension, e.g. "J" or "m/s**2" ("1" when dimensionless)."""
+    if dimension == DIMENSIONLESS:
+        return "1"
+    for name in _DISPLAY_UNITS:
+        if UNITS[name][1] == dimension:
+            return name
+    def factor(name, exponent):
+        return name if exponent == 1 else f"{name}**{exponent}"
+    numerator = [factor(name, x) for name, x in zip(BASE_UNITS, dimension) if x > 0]
+    denominator = [factor(name, -x) for name, x in zip(BASE_UNITS, dimension) if x < 0]
+    text = "*".join(numerator) or "1"
+    if denominator:
+        text += "/" + (denominator[0] if len(denominator) == 1 else f"({'*'.join(denominator)})")
+    return text
+
+def convert(value, from_unit, to_unit):
+    """Converts a value (or NumPy array) between two units of the same dimension."""
+    from_scale, from_dimension = parse_unit(from_unit)
+    to_scale, to_dimension = parse_unit(to_unit)
+    if from_dimension != to_dimension:
+        raise DimensionError(f"Cannot convert {from_unit} ({format_dimension(from_dimension)}) "
+                             f"to {to_unit} ({format_dimension(to_dimension)})")
+    return value * (from_scale / to_scale)
+
+
+# --- Compile-Time Checking ---
+
+def _dimensionless_function(name, args):
+    for arg in args:
+        if arg != DIMENSIONLESS:
+            raise DimensionError(f"{name}() needs a dimensionless argument, got {format_dimension(arg)}")
+    return DIMENSIONLESS
+
+def _sqrt_dimension(name, args):
+    if len(args) != 1:
+        return _dimensionless_function(name, args)
+    return _power(args[0], Fraction(1, 2))
+
+def _same_dimension(name, args):
+    for arg in args[1:]:
+        if arg != args[0]:
+            raise DimensionError(f"{name}() needs arguments of one dimension, got "
+                                 f"{format_dimension(args[0])} and {format_dimension(arg)}")
+    return args[0] if args else DIMENSIONLESS
+
+def _variance_dimension(name, args):
+    return _power(_same_dimension(name, args), 2)
+
+def _product_dimension(name, args):
+    result = DIMENSIONLESS
+    for arg in args:
+        result = _multiply(result, arg)
+    return result
+
+# Dimension rules of the calculator functions; other callables must be given
+# dimensionless arguments and return a dimensionless value.
+FUNCTION_DIMENSIONS = {
+    calc_logic.square_root: _sqrt_dimension,
+    aggregate.EXPRESSION_FUNCTIONS['variance']: _variance_dimension,
+    aggregate.EXPRESSION_FUNCTIONS['product']: _product_dimension,
+    **{aggregate.EXPRESSION_FUNCTIONS[name]: _same_dimension
+       for name in ('sum', 'mean', 'stdev', 'min', 'max')},
+}
+
+def check_dimensions(tree, dimensions, functions=None):
+    """Returns the dimension of a parsed tree; raises DimensionError if it is inconsistent.
+
+    `dimensions` maps names to dimensions and `functions` maps function
+    names to their callables (to find their rule in FUNCTION_DIMENSIONS).
+    """
+    functions = {} if functions is None else functions
+    def walk(node):
+        kind = node[0]
+        if kind == expr_engine.NAME:
+            return dimensions.get(node[1], DIMENSIONLESS)
+        if kind in (expr_engine.NEG, expr_engine.POS):
+            return walk(node[1])
+        if kind == expr_engine.BINOP:
+            op = node[1]
+            left = walk(node[2])
+            if op == '**':
+                right = walk(node[3])
+                if right != DIMENSIONLESS:
+                    raise DimensionError(f"Exponent must be dimensionless, got {format_dimension(right)}")
+                if left == DIMENSIONLESS:
+                    return left
+                exponent = _constant_exponent(node[3])
+                if exponent is None:
+                    raise DimensionError(f"A quantity in {format_dimension(left)} can only be "
+                                         "raised to a constant power")
+                return _power(left, exponent)
+            right = walk(node[3])
+            if op == '*':
+                return _multiply(left, right)
+            if op == '/':
+                return _divide(left, right)
+            if left != right:
+                raise DimensionError(f"Cannot {'add' if op == '+' else 'subtract'} "
+                                     f"{format_dimension(left)} and {format_dimension(right)}")
+            return left
+        if kind == expr_engine.CALL:
+            rule = FUNCTION_DIMENSIONS.get(functions.get(node[1]), _dimensionless_function)
+            return rule(node[1], [walk(arg) for arg in node[2]])
+        return DIMENSIONLESS # Numbers (and deferred errors) are dimensionless
+    return walk(tree)
+
+
+# --- Unit-Aware Formulas ---
+
+def _scaled_source(source, scales, output_scale):
+    """Rewrites source so inputs are converted to SI units and the result to the output unit.
+
+    The factors become number literals of the expression, so the optimizer
+    folds them like any other constant.
+    """
+    parts = []
+    last = 0
+    for kind, value, start, end in expr_engine.iter_tokens(source):
+        if kind == 'name' and scales.get(value, 1.0) != 1.0:
+            parts.append(source[last:start])
+            parts.append(f"({value} * {scales[value]!r})")
+            last = end
+    parts.append(source[last:])
+    text = "".join(parts)
+    return text if output_scale == 1.0 else f"({text}) * {output_scale!r}"
+
+
+class UnitFormula(Formula):
+    """A Formula whose parameters and result carry units, checked when it is created.
+
+    Parameter values are given in the units of `units` and the result is
+    returned in `to` (by default the SI unit of the result's dimension).
+    """
+
+    def __init__(self, source, units=None, to=None, context=None, constant_units=None, optimize=True):
+        units = dict(units or {})
+        context = expr_engine.default_context() if context is None else context
+        constant_units = CONSTANT_UNITS if constant_units is None else constant_units
+        compiled = expr_engine.compile_expression(source)
+        dimensions = {}
+        functions = {}
+        scales = {}
+        formula_context = dict(context)
+        for name in compiled.names:
+            if name in units:
+                scales[name], dimensions[name] = parse_unit(units[name])
+            elif name in context:
+                value = context[name]
+                if callable(value):
+                    functions[name] = value
+                elif name in constant_units:
+                    dimensions[name] = parse_unit(constant_units[name])[1]
+            elif name in UNITS: # A unit used as a value, e.g. "3 * km"
+                formula_context[name], dimensions[name] = UNITS[name]
+        self.dimension = check_dimensions(compiled.tree, dimensions, functions)
+        to_scale, to_dimension = parse_unit(to) if to is not None else (1.0, self.dimension)
+        if to_dimension != self.dimension:
+            raise DimensionError(f"Cannot express {format_dimension(self.dimension)} in {to}")
+        self.units = units
+        self.to = to if to is not None else format_dimension(self.dimension)
+        super().__init__(_scaled_source(source, scales, 1.0 / to_scale), tuple(units),
+                         formula_context, optimize=optimize)
+        self.source = source
+
+    def __repr__(self):
+        return f"UnitFormula({self.source!r}, {self.units!r}, to={self.to!r})"
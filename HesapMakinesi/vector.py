@@ -0,0 +1,332 @@
+# This is the vector.py file.
+# It contains batch (NumPy array) counterparts of the calculator.py functions.
+
+# --- Vectorized Calculator Logic ---
+# Each function takes array-likes (NumPy arrays, lists or objects exposing the
+# buffer protocol), converts them to float64 arrays once and computes the
+# whole batch in a single vectorized pass. Inputs that would make the scalar
+# function in calculator.py raise are handled by the `errors` policy instead
+# of aborting the batch:
+#   'nan'   - invalid positions are set to NaN (default)
+#   'mask'  - like 'nan', but returns a (result, invalid_mask) tuple
+#   'raise' - raise the same exception the scalar function would raise
+# The complex_* functions are the complex128 counterparts used by the complex
+# mode (backends.ComplexBackend); negative square roots and logarithms are
+# valid there, only the poles stay invalid.
+# NumPy is optional for the rest of the project; it is only needed here.
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+import calculator as calc_logic
+import expression as expr_engine
+
+ERROR_POLICIES = ('nan', 'mask', 'raise')
+
+# Same default tolerance as calculator.tangent uses for "cosine is effectively zero".
+TANGENT_COS_TOLERANCE = calc_logic.TANGENT_COS_TOLERANCE
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("The vector module requires NumPy (pip install numpy)")
+
+def _as_array(value, message="Inputs must be numeric"):
+    """Converts an array-like to a float64 array without copying when possible."""
+    _require_numpy()
+    try:
+        arr = np.asarray(value, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise TypeError(message) from None
+    return arr
+
+def _finish(result, invalid, errors, exc_type, message):
+    """Applies the error policy to a computed batch."""
+    if errors not in ERROR_POLICIES:
+        raise ValueError(f"errors must be one of {ERROR_POLICIES}, got {errors!r}")
+    if invalid is None:
+        if errors == 'mask':
+            return result, np.zeros(np.shape(result), dtype=bool)
+        return result
+    if errors == 'raise':
+        if np.any(invalid):
+            raise exc_type(message)
+        return result
+    # The mask may come from only one operand; give it the result's shape.
+    invalid = np.array(np.broadcast_to(invalid, np.shape(result)))
+    if np.ndim(result) == 0:
+        result = np.float64(np.nan) if invalid else result
+    else:
+        result[invalid] = np.nan
+    if errors == 'mask':
+        return result, invalid
+    return result
+
+def _binary_inputs(x, y):
+    return _as_array(x), _as_array(y)
+
+def _unary_input(x):
+    return _as_array(x, "Input must be numeric")
+
+
+def add(x, y, errors='nan'):
+    """Adds two arrays element-wise."""
+    x, y = _binary_inputs(x, y)
+    return _finish(np.add(x, y), None, errors, None, None)
+
+def subtract(x, y, errors='nan'):
+    """Subtracts two arrays element-wise."""
+    x, y = _binary_inputs(x, y)
+    return _finish(np.subtract(x, y), None, errors, None, None)
+
+def multiply(x, y, errors='nan'):
+    """Multiplies two arrays element-wise."""
+    x, y = _binary_inputs(x, y)
+    return _finish(np.multiply(x, y), None, errors, None, None)
+
+def divide(x, y, errors='nan'):
+    """Divides two arrays element-wise; division by zero is invalid."""
+    x, y = _binary_inputs(x, y)
+    invalid = y == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.divide(x, y)
+    return _finish(result, invalid, errors, ZeroDivisionError, "Cannot divide by zero")
+
+def power(x, y, errors='nan'):
+    """Raises x to the power of y element-wise, following math.pow's domain."""
+    x, y = _binary_inputs(x, y)
+    with np.errstate(all='ignore'):
+        result = np.power(x, y)
+    # math.pow raises for a negative base with a fractional exponent, for
+    # zero to a negative power and on overflow.
+    invalid = ((x < 0) & (np.floor(y) != y)) | ((x == 0) & (y < 0))
+    invalid |= np.isinf(result) & np.isfinite(x) & np.isfinite(y)
+    return _finish(result, invalid, errors, ValueError, "math domain error")
+
+def square_root(x, errors='nan'):
+    """Calculates the square root element-wise; negative input is invalid."""
+    x = _unary_input(x)
+    invalid = x < 0
+    with np.errstate(invalid='ignore'):
+        result = np.sqrt(x)
+    return _finish(result, invalid, errors, ValueError,
+                   "Cannot calculate square root of a negative number")
+
+def log_natural(x, errors='nan'):
+    """Calculates the natural logarithm element-wise; non-positive input is invalid."""
+    x = _unary_input(x)
+    invalid = x <= 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.log(x)
+    return _finish(result, invalid, errors, ValueError,
+                   "Cannot calculate logarithm of a non-positive number")
+
+def log_base10(x, errors='nan'):
+    """Calculates the base-10 logarithm element-wise; non-positive input is invalid."""
+    x = _unary_input(x)
+    invalid = x <= 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.log10(x)
+    return _finish(result, invalid, errors, ValueError,
+                   "Cannot calculate logarithm of a non-positive number")
+
+def sine(x, errors='nan'):
+    """Calculates the sine element-wise (x in radians)."""
+    x = _unary_input(x)
+    return _finish(np.sin(x), None, errors, None, None)
+
+def cosine(x, errors='nan'):
+    """Calculates the cosine element-wise (x in radians)."""
+    x = _unary_input(x)
+    return _finish(np.cos(x), None, errors, None, None)
+
+def tangent(x, errors='nan', tolerance=TANGENT_COS_TOLERANCE):
+    """Calculates the tangent element-wise; angles where cosine is ~0 are invalid."""
+    x = _unary_input(x)
+    invalid = np.abs(np.cos(x)) <= tolerance
+    result = np.tan(x)
+    return _finish(result, invalid, errors, ValueError,
+                   "Tangent is undefined for angles where cosine is zero (e.g., pi/2 + k*pi)")
+
+
+# --- Vectorized Expression Evaluation ---
+# Parsed expressions can be compiled against the functions above, so a whole
+# column is evaluated with one NumPy pass per operator. Rows that hit a
+# domain error come back as NaN.
+
+BINARY_FUNCTIONS = {
+    '+': add,
+    '-': subtract,
+    '*': multiply,
+    '/': divide,
+    '**': power,
+}
+
+# calculator.py functions and their vectorized counterparts.
+SCALAR_TO_VECTOR = {
+    calc_logic.add: add,
+    calc_logic.subtract: subtract,
+    calc_logic.multiply: multiply,
+    calc_logic.divide: divide,
+    calc_logic.power: power,
+    calc_logic.square_root: square_root,
+    calc_logic.log_natural: log_natural,
+    calc_logic.log_base10: log_base10,
+    calc_logic.sine: sine,
+    calc_logic.cosine: cosine,
+    calc_logic.tangent: tangent,
+}
+
+def compile_tree(tree, complex_mode=False):
+    """Compiles a parsed tree into a function evaluating it over arrays."""
+    _require_numpy()
+    return expr_engine.compile_tree(tree, COMPLEX_BINARY_FUNCTIONS if complex_mode else BINARY_FUNCTIONS)
+
+def namespace(context, complex_mode=False):
+    """Returns a copy of an evaluation context with calculator functions replaced by vector ones."""
+    table = COMPLEX_SCALAR_TO_VECTOR if complex_mode else SCALAR_TO_VECTOR
+    return {name: table.get(value, value) if callable(value) else value
+            for name, value in context.items()}
+
+# Functions that can reject an input (the others never add to an error mask).
+PARTIAL_FUNCTIONS = frozenset((divide, power, square_root, log_natural, log_base10, tangent))
+
+class MaskedEvaluator:
+    """Evaluates a parsed tree over arrays and reports which rows failed.
+
+    A row fails where any calculator function on its way would have raised
+    in calculator.py (its result is NaN). NaN inputs are not failures.
+    """
+
+    def __init__(self, tree, context):
+        _require_numpy()
+        self._masks = []
+        self._func = expr_engine.compile_tree(
+            tree, {op: self._masking(function) for op, function in BINARY_FUNCTIONS.items()})
+        self._ns = {name: self._masking(value) for name, value in namespace(context).items()}
+
+    def _masking(self, function):
+        if function not in PARTIAL_FUNCTIONS:
+            return function
+        masks = self._masks
+        def masked(*args):
+            result, invalid = function(*args, errors='mask')
+            masks.append(invalid)
+            return result
+        return masked
+
+    def evaluate(self, columns, size):
+        """Returns (result, invalid) for a dict of equally long columns, as arrays of `size` rows."""
+        ns = self._ns
+        ns.update(columns)
+        masks = self._masks
+        masks.clear()
+        result = np.broadcast_to(np.asarray(self._func(ns), dtype=np.float64), (size,))
+        invalid = np.zeros(size, dtype=bool)
+        for mask in masks:
+            invalid |= mask
+        return result, invalid
+
+
+# --- Vectorized Complex Logic ---
+
+def _as_complex_array(value, message="Inputs must be numeric"):
+    """Converts an array-like to a complex128 array without copying when possible."""
+    _require_numpy()
+    try:
+        arr = np.asarray(value, dtype=np.complex128)
+    except (TypeError, ValueError):
+        raise TypeError(message) from None
+    return arr
+
+def complex_add(x, y, errors='nan'):
+    """Adds two complex arrays element-wise."""
+    return _finish(np.add(_as_complex_array(x), _as_complex_array(y)), None, errors, None, None)
+
+def complex_subtract(x, y, errors='nan'):
+    """Subtracts two complex arrays element-wise."""
+    return _finish(np.subtract(_as_complex_array(x), _as_complex_array(y)), None, errors, None, None)
+
+def complex_multiply(x, y, errors='nan'):
+    """Multiplies two complex arrays element-wise."""
+    return _finish(np.multiply(_as_complex_array(x), _as_complex_array(y)), None, errors, None, None)
+
+def complex_divide(x, y, errors='nan'):
+    """Divides two complex arrays element-wise; division by zero is invalid."""
+    x, y = _as_complex_array(x), _as_complex_array(y)
+    invalid = y == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.divide(x, y)
+    return _finish(result, invalid, errors, ZeroDivisionError, "Cannot divide by zero")
+
+def complex_power(x, y, errors='nan'):
+    """Raises x to the power of y element-wise; zero to a non-positive real power is invalid."""
+    x, y = _as_complex_array(x), _as_complex_array(y)
+    with np.errstate(all='ignore'):
+        result = np.power(x, y)
+    invalid = (x == 0) & ((y.real < 0) | ((y.real == 0) & (y.imag != 0)))
+    invalid |= ~np.isfinite(result) & np.isfinite(x) & np.isfinite(y)
+    return _finish(result, invalid, errors, ValueError, "math domain error")
+
+def complex_square_root(x, errors='nan'):
+    """Calculates the principal square root element-wise."""
+    return _finish(np.sqrt(_as_complex_array(x, "Input must be numeric")), None, errors, None, None)
+
+def complex_log_natural(x, errors='nan'):
+    """Calculates the principal natural logarithm element-wise; zero is invalid."""
+    x = _as_complex_array(x, "Input must be numeric")
+    invalid = x == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.log(x)
+    return _finish(result, invalid, errors, ValueError, "Cannot calculate logarithm of zero")
+
+def complex_log_base10(x, errors='nan'):
+    """Calculates the principal base-10 logarithm element-wise; zero is invalid."""
+    x = _as_complex_array(x, "Input must be numeric")
+    invalid = x == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.log10(x)
+    return _finish(result, invalid, errors, ValueError, "Cannot calculate logarithm of zero")
+
+def complex_sine(x, errors='nan'):
+    """Calculates the complex sine element-wise."""
+    return _finish(np.sin(_as_complex_array(x, "Input must be numeric")), None, errors, None, None)
+
+def complex_cosine(x, errors='nan'):
+    """Calculates the complex cosine element-wise."""
+    return _finish(np.cos(_as_complex_array(x, "Input must be numeric")), None, errors, None, None)
+
+def complex_tangent(x, errors='nan', tolerance=TANGENT_COS_TOLERANCE):
+    """Calculates the complex tangent element-wise; points where cosine is ~0 are invalid."""
+    x = _as_complex_array(x, "Input must be numeric")
+    invalid = np.abs(np.cos(x)) <= tolerance
+    with np.errstate(all='ignore'):
+        result = np.tan(x)
+    return _finish(result, invalid, errors, ValueError,
+                   "Tangent is undefined for angles where cosine is zero (e.g., pi/2 + k*pi)")
+
+COMPLEX_BINARY_FUNCTIONS = {
+    '+': complex_add,
+    '-': complex_subtract,
+    '*': complex_multiply,
+    '/': complex_divide,
+    '**': complex_power,
+}
+
+COMPLEX_SCALAR_TO_VECTOR = {
+    calc_logic.add: complex_add,
+    calc_logic.subtract: complex_subtract,
+    calc_logic.multiply: complex_multiply,
+    calc_logic.divide: complex_divide,
+    calc_logic.power: complex_power,
+    calc_logic.square_root: complex_square_root,
+    calc_logic.log_natural: complex_log_natural,
+    calc_logic.log_base10: complex_log_base10,
+    calc_logic.sine: complex_sine,
+    calc_logic.cosine: complex_cosine,
+    calc_logic.tangent: complex_tangent,
+}
+
+# End of Vectorized Calculator Logic.
@@ -0,0 +1,375 @@
+# This is the worksheet.py file.
+# It contains the worksheet: named cells whose expressions refer to each other.
+
+# --- Dependency Graph ---
+# Every cell holds an expression (compiled once, see expression.py) and its
+# value. The names an expression uses that are not in the context are cells,
+# so the worksheet keeps two maps: the cells each cell depends on and, the
+# other way round, the cells depending on it (also for cells not defined
+# yet, so defining one later updates the cells waiting for it).
+#
+# --- Incremental Recomputation ---
+# A change (one cell or many at once) only touches the cells downstream of
+# it. They are ordered topologically with Kahn's algorithm over that part of
+# the graph alone; cells left over are on a cycle, in which case the change
+# is undone and CycleError is raised. The cells are then evaluated in order,
+# and a cell is only evaluated again if something it depends on changed
+# value: a cell recomputing to the same value stops the update there. Edits
+# near the bottom of a sheet cost microseconds no matter how large the sheet
+# is. Errors (division by zero, unknown cells, ...) are stored per cell and
+# passed on to the cells that use them, like a spreadsheet.
+#
+# Usage:
+#   sheet = Worksheet()
+#   sheet.update({'price': 120, 'tax': 'price * 0.18', 'total': 'price + tax'})
+#   sheet['total']              -> 141.6
+#   sheet['price'] = 200        # recomputes tax and total only
+#   python HesapMakinesi/worksheet.py hesap.txt --set price=200
+# Worksheet files have one "name = expression" per line ('#' starts a comment).
+
+import argparse
+import gc
+import sys
+
+import expression as expr_engine
+
+_MISSING = object()
+
+# Updates of at least this many cells pause the cyclic garbage collector:
+# compiling cells allocates many small objects that all stay alive, and the
+# collector would otherwise scan them again and again while they are built.
+BULK_SIZE = 1000
+
+
+class CycleError(ValueError):
+    """Raised when a change would make cells depend on themselves."""
+
+
+class Worksheet:
+    """Named cells holding expressions that refer to each other, recomputed incrementally."""
+
+    def __init__(self, context=None):
+        self.context = expr_engine.default_context() if context is None else context
+        self._ns = dict(self.context) # The context plus the value of every cell without error
+        self._sources = {}      # name -> source text
+        self._compiled = {}     # name -> CompiledExpression
+        self._dependencies = {} # name -> frozenset of the cells it refers to
+        self._dependents = {}   # name -> set of the cells referring to it
+        self._errors = {}       # name -> exception, for cells that failed
+        self.evaluations = 0    # Number of cell evaluations so far
+
+    def __len__(self):
+        return len(self._sources)
+
+    def __iter__(self):
+        return iter(self._sources)
+
+    def __contains__(self, name):
+        return name in self._sources
+
+    def __getitem__(self, name):
+        """Returns the value of a cell, or raises the error the cell failed with."""
+        if name not in self._sources:
+            raise KeyError(name)
+        error = self._errors.get(name)
+        if error is not None:
+            raise error
+        return self._ns[name]
+
+    def __setitem__(self, name, source):
+        self.update({name: source})
+
+    def __delitem__(self, name):
+        if name not in self._sources:
+            raise KeyError(name)
+        self._apply({name: None})
+
+    def get(self, name, default=None):
+        """Returns the value of a cell, or `default` if it has none (missing or failed)."""
+        if name in self._errors:
+            return default
+        return self._ns.get(name, default) if name in self._sources else default
+
+    def error(self, name):
+        """Returns the exception a cell failed with, or None."""
+        return self._errors.get(name)
+
+    def source(self, name):
+        return self._sources[name]
+
+    def dependencies(self, name):
+        """Returns the names of the cells a cell refers to."""
+        return set(self._dependencies.get(name, ()))
+
+    def dependents(self, name):
+        """Returns the names of the cells referring to a cell (directly)."""
+        return set(self._dependents.get(name, ()))
+
+    def update(self, cells):
+        """Sets many cells at once ({name: expression or number}) and recomputes once.
+
+        Returns the names of the cells whose value or error changed, in
+        evaluation order. Raises SyntaxError or CycleError without changing
+        the worksheet.
+        """
+        if len(cells) < BULK_SIZE:
+            return self._apply(cells)
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            return self._apply(cells)
+        finally:
+            if collecting:
+                gc.enable()
+
+    # --- Graph Maintenance ---
+
+    def _check_name(self, name):
+        if not name.isidentifier():
+            raise ValueError(f"Invalid cell name: {name!r}")
+        if name in self.context:
+            raise ValueError(f"Cell name {name!r} is already a function or constant")
+
+    def _apply(self, cells):
+        changes = {}
+        compiled = {}
+        for name, source in cells.items():
+            if source is not None:
+                if not isinstance(source, str):
+                    source = repr(source)
+                if source == self._sources.get(name):
+                    continue # Unchanged
+                self._check_name(name)
+                compiled[name] = (source, expr_engine.compile_expression(source))
+            changes[name] = source
+        previous = {name: (self._sources.get(name), self._compiled.get(name)) for name in changes}
+        for name in changes:
+            self._link(name, *compiled.get(name, (None, None)))
+        try:
+            order = self._order(changes)
+        except CycleError:
+            for name, (source, old) in previous.items():
+                self._link(name, source, old)
+            raise
+        return self._recompute(order, set(changes))
+
+    def _link(self, name, source, compiled):
+        """Replaces a cell's expression and dependency edges (compiled=None removes the cell)."""
+        dependents = self._dependents
+        for dependency in self._dependencies.pop(name, ()):
+            users = dependents[dependency]
+            users.discard(name)
+            if not users:
+                del dependents[dependency]
+        if compiled is None: # Its value is dropped by _recompute
+            self._sources.pop(name, None)
+            self._compiled.pop(name, None)
+            return
+        self._sources[name] = source
+        self._compiled[name] = compiled
+        context = self.context
+        dependencies = frozenset(n for n in compiled.names if n not in context)
+        self._dependencies[name] = dependencies
+        for dependency in dependencies:
+            users = dependents.get(dependency)
+            if users is None:
+                users = dependents[dependency] = set()
+            users.add(name)
+
+    def _order(self, changed):
+        """Returns the changed cells and everything downstream of them in topological order."""
+        dependents = self._dependents
+        affected = set()
+        stack = list(changed)
+        while stack:
+            name = stack.pop()
+            if name not in affected:
+                affected.add(name)
+                stack.extend(dependents.get(name, ()))
+        dependencies = self._dependencies
+        waiting = {name: sum(1 for d in dependencies.get(name, ()) if d in affected)
+                   for name in affected}
+        ready = [name for name, count in waiting.items() if count == 0]
+        order = []
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for user in dependents.get(name, ()):
+                waiting[user] -= 1
+                if not waiting[user]:
+                    ready.append(user)
+        if len(order) < len(affected):
+            cycle = sorted(name for name, count in waiting.items() if count)
+            raise CycleError(f"Circular reference between cells: {', '.join(cycle)}")
+        return order
+
+    def _recompute(self, order, dirty):
+        ns, errors = self._ns, self._errors
+        compiled_cells, dependencies, dependents = self._compiled, self._dependencies, self._dependents
+        changed = []
+        for name in order:
+            if name not in dirty:
+                continue
+            compiled = compiled_cells.get(name)
+            if compiled is None: # Removed: the cells using it change
+                ns.pop(name, None)
+                errors.pop(name, None)
+                dirty.update(dependents.get(name, ()))
+                changed.append(name)
+                continue
+            old_value, old_error = ns.get(name, _MISSING), errors.get(name)
+            value, error = _MISSING, None
+            for dependency in dependencies[name]:
+                error = errors.get(dependency)
+                if error is not None:
+                    break
+            if error is None:
+                try:
+                    value = compiled.evaluate(ns)
+                except (ArithmeticError, ValueError, TypeError, NameError) as e:
+                    error = e
+                self.evaluations += 1
+            if error is None:
+                ns[name] = value
+                errors.pop(name, None)
+            else:
+                ns.pop(name, None)
+                errors[name] = error
+            if error is not old_error or value != old_value or type(value) is not type(old_value):
+                dirty.update(dependents.get(name, ()))
+                changed.append(name)
+        return changed
+
+
+# --- Worksheet Files ---
+
+def parse_cell(line):
+    """Splits "name = expression" into (name, expression)."""
+    name, sep, source = line.partition('=')
+    name, source = name.strip(), source.strip()
+    if not sep or not name or not source:
+        raise SyntaxError(f"Expected 'name = expression', got {line.strip()!r}")
+    return name, source
+
+def read_cells(lines):
+    """Returns {name: expression} for worksheet lines, skipping blank lines and '#' comments."""
+    cells = {}
+    for line in lines:
+        line = line.split('#', 1)[0]
+        if line.strip():
+            name, source = parse_cell(line)
+            cells[name] = source
+    return cells
+
+def load_worksheet(path, context=None):
+    sheet = Worksheet(context)
+    with open(path, encoding='utf-8') as f:
+        sheet.update(read_cells(f))
+    return sheet
+
+def save_worksheet(sheet, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for name in sheet:
+            f.write(f"{name} = {sheet.source(name)}\n")
+
+def format_cell(sheet, name):
+    """Returns the cell's value as the calculator displays it, or its error message."""
+    error = sheet.error(name)
+    if isinstance(error, NameError): # Most often a cell that does not exist (yet)
+        return f"Error: {error}"
+    if error is not None:
+        return expr_engine.describe_error(error)
+    return expr_engine.format_result(sheet[name])
+
+
+# --- Tk Worksheet Window ---
+
+class WorksheetWindow:
+    """Tk window listing the cells of a worksheet; "name = expression" + Enter sets a cell."""
+
+    def __init__(self, master, sheet):
+        import tkinter as tk # Imported lazily: the window is opened on demand
+        self.sheet = sheet
+        self.rows = {} # cell name -> listbox row
+        self.window = tk.Toplevel(master) if master is not None else tk.Tk()
+        self.window.title("Worksheet")
+        self.entry_var = tk.StringVar()
+        entry = tk.Entry(self.window, textvariable=self.entry_var, font=('Arial', 12))
+        entry.pack(fill=tk.X, padx=5, pady=5)
+        entry.bind('<Return>', lambda event: self.submit())
+        entry.focus_set()
+        self.status_var = tk.StringVar()
+        tk.Label(self.window, textvariable=self.status_var, anchor='w', fg="#c62828").pack(fill=tk.X, padx=5)
+        self.listbox = tk.Listbox(self.window, font=('Courier', 11), width=60, height=20)
+        self.listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.listbox.bind('<<ListboxSelect>>', lambda event: self._edit_selected())
+        for name in sheet:
+            self._show(name)
+
+    def _line(self, name):
+        return f"{name} = {self.sheet.source(name)}  ->  {format_cell(self.sheet, name)}"
+
+    def _show(self, name):
+        row = self.rows.get(name)
+        if name not in self.sheet:
+            if row is not None: # Removed: later rows move up
+                self.listbox.delete(row)
+                del self.rows[name]
+                self.rows = {n: r - 1 if r > row else r for n, r in self.rows.items()}
+            return
+        if row is None:
+            row = self.rows[name] = self.listbox.size()
+        else:
+            self.listbox.delete(row)
+        self.listbox.insert(row, self._line(name))
+
+    def _edit_selected(self):
+        selection = self.listbox.curselection()
+        if selection:
+            name = next(n for n, r in self.rows.items() if r == selection[0])
+            self.entry_var.set(f"{name} = {self.sheet.source(name)}")
+
+    def submit(self):
+        """Applies the entry's "name = expression" (an empty expression removes the cell)."""
+        text = self.entry_var.get()
+        try:
+            name, _, source = text.partition('=')
+            name = name.strip()
+            if name in self.sheet and not source.strip():
+                del self.sheet[name]
+                changed = [name]
+            else:
+                changed = self.sheet.update(dict([parse_cell(text)]))
+        except (SyntaxError, ValueError) as e: # CycleError is a ValueError
+            self.status_var.set(str(e))
+            return
+        self.status_var.set("")
+        self.entry_var.set("")
+        # Only the rows of the edited cell and the cells whose value changed are redrawn
+        for cell in [name] + changed:
+            self._show(cell)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a worksheet file of 'name = expression' lines.")
+    parser.add_argument("path", help="worksheet file")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=EXPR",
+                        help="set a cell before printing (repeatable)")
+    parser.add_argument("--save", action="store_true", help="write the changed cells back to the file")
+    args = parser.parse_args(argv)
+    try:
+        sheet = load_worksheet(args.path)
+        if args.set:
+            sheet.update(dict(parse_cell(text) for text in args.set))
+    except (OSError, SyntaxError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    for name in sheet:
+        print(f"{name} = {format_cell(sheet, name)}")
+    if args.save:
+        save_worksheet(sheet, args.path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())